@@ -0,0 +1,57 @@
+"""Évaluation d'une série d'enregistrements sans navigateur.
+
+Exemple :
+    python evaluate_batch.py classe_3B.zip rapport_3B.xlsx --workers 4
+
+L'entrée est un dossier ou une archive .zip de fichiers .wav. Chaque fichier est évalué
+comme dans la page d'évaluation (transcription, fautes, mots parasites, rythme, score) ;
+les fichiers sont répartis sur plusieurs processus. Le rapport (.csv, .xlsx, .json)
+contient une ligne par fichier.
+"""
+import argparse
+import sys
+import time
+from typing import List, Optional
+
+from utils.batch_eval import evaluate_batch, write_report
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Évalue un dossier ou un .zip d'enregistrements .wav.")
+    parser.add_argument("input", help="Dossier ou archive .zip de fichiers .wav")
+    parser.add_argument("output", help="Rapport (.csv, .xlsx, .json)")
+    parser.add_argument("--workers", type=int, help="Nombre de processus (défaut : nombre de cœurs)")
+    return parser.parse_args(argv)
+
+
+def run(input_path: str, output_path: str, workers: Optional[int] = None) -> int:
+    """Évalue ``input_path``, écrit le rapport et renvoie le nombre de fichiers évalués."""
+    started = time.monotonic()
+
+    def on_progress(done: int, total: int, result: dict) -> None:
+        detail = f"score {result['score']}" if result["statut"] == "ok" else result["erreur"]
+        print(f"[{done}/{total}] {result['fichier']} : {detail} ({time.monotonic() - started:.0f} s)", file=sys.stderr)
+
+    report = evaluate_batch(input_path, workers, on_progress)
+    write_report(report, output_path)
+    scored = report[report["statut"] == "ok"]
+    if len(scored):
+        print(
+            f"{len(scored)}/{len(report)} fichiers évalués, score moyen {scored['score'].mean():.1f}",
+            file=sys.stderr,
+        )
+    return len(scored)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    try:
+        run(args.input, args.output, args.workers)
+    except (ValueError, OSError) as exc:
+        print(f"Erreur: {exc}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
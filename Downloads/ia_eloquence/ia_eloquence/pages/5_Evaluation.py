@@ -1,10 +1,10 @@
 
 import tempfile
-import wave
 
-import speech_recognition as sr
 import streamlit as st
-from spellchecker import SpellChecker
+
+from utils.text_analysis import FILLERS_SHORT, get_text_engine
+from utils.transcription import STATUS_UNINTELLIGIBLE, get_transcription_service
 
 st.title("🎤 Évaluation & Entraînement à l'Éloquence")
 
@@ -20,50 +20,45 @@ if uploaded_file is not None:
     st.audio(uploaded_file, format='audio/wav')
     st.success("Fichier chargé avec succès !")
 
-    # Transcription vocale
-    recognizer = sr.Recognizer()
+    # Transcription vocale (mise en cache par contenu du fichier)
     with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as temp_audio:
         temp_audio.write(uploaded_file.read())
         temp_audio_path = temp_audio.name
 
-    with sr.AudioFile(temp_audio_path) as source:
-        audio_data = recognizer.record(source)
-        try:
-            transcription = recognizer.recognize_google(audio_data, language="fr-FR")
-            st.subheader("📝 Transcription brute")
-            st.write(transcription)
-
-            # Analyse IA simplifiée
-            # 1. Mots parasites
-            filler_words = ["euh", "donc", "bah", "hein", "voilà"]
-            found_fillers = [word for word in filler_words if word in transcription.lower()]
-            st.subheader("⚠️ Mots parasites détectés")
-            if found_fillers:
-                st.write(f"Tu as utilisé : {', '.join(found_fillers)}. Essaie de les éviter 🧘")
-            else:
-                st.write("Aucun mot parasite détecté. Clean 🔥")
+    transcript = get_transcription_service().transcribe(temp_audio_path)
+    if transcript.status == STATUS_UNINTELLIGIBLE:
+        st.error("Impossible de reconnaître la parole. Réessaye avec un fichier plus clair.")
+    elif not transcript.ok:
+        st.error("Aucun moteur de transcription disponible (réseau ou modèle local).")
+    else:
+        transcription = transcript.text
+        st.subheader("📝 Transcription brute")
+        st.write(transcription)
 
-            # 2. Correction orthographique
-            spell = SpellChecker(language="fr")
-            words = transcription.split()
-            misspelled = spell.unknown(words)
-            corrected = {word: spell.correction(word) for word in misspelled}
+        # Analyse IA simplifiée
+        # 1. Mots parasites
+        engine = get_text_engine(FILLERS_SHORT)
+        found_fillers = list(engine.filler_counts(transcription))
+        st.subheader("⚠️ Mots parasites détectés")
+        if found_fillers:
+            st.write(f"Tu as utilisé : {', '.join(found_fillers)}. Essaie de les éviter 🧘")
+        else:
+            st.write("Aucun mot parasite détecté. Clean 🔥")
 
-            st.subheader("🧠 Corrections orthographiques proposées")
-            if corrected:
-                for wrong, fix in corrected.items():
-                    st.markdown(f"- **{wrong}** → {fix}")
-            else:
-                st.write("Aucune faute détectée. C’est nickel !")
+        # 2. Correction orthographique
+        words = transcription.split()
+        corrected = engine.corrections(transcription)
 
-            # 3. Score d'élocution (très simple pour commencer)
-            word_count = len(words)
-            filler_count = len(found_fillers)
-            score = max(0, 100 - filler_count * 10 - len(corrected) * 5)
-            st.subheader("🎯 Score d’éloquence (simulé)")
-            st.metric("Score /100", score)
+        st.subheader("🧠 Corrections orthographiques proposées")
+        if corrected:
+            for wrong, fix in corrected.items():
+                st.markdown(f"- **{wrong}** → {fix}")
+        else:
+            st.write("Aucune faute détectée. C’est nickel !")
 
-        except sr.UnknownValueError:
-            st.error("Impossible de reconnaître la parole. Réessaye avec un fichier plus clair.")
-        except sr.RequestError:
-            st.error("Erreur de connexion avec l'API Google Speech Recognition.")
+        # 3. Score d'élocution (très simple pour commencer)
+        word_count = len(words)
+        filler_count = len(found_fillers)
+        score = max(0, 100 - filler_count * 10 - len(corrected) * 5)
+        st.subheader("🎯 Score d’éloquence (simulé)")
+        st.metric("Score /100", score)
@@ -1,26 +1,13 @@
 
-import json
-import os
-import wave
 from datetime import datetime
 
-import av
-import librosa
-import matplotlib.pyplot as plt
-import numpy as np
-import pandas as pd
-import pyaudio
-import speech_recognition as sr
 import streamlit as st
-from spellchecker import SpellChecker
-from streamlit_webrtc import AudioProcessorBase, WebRtcMode, webrtc_streamer
-
-p = pyaudio.PyAudio()
-device_count = p.get_device_count()
-for i in range(device_count):
-    info = p.get_device_info_by_index(i)
-    print(f"Device {i}: {info['name']}")
 
+from utils.audio_analysis import analyze_file
+from utils.history import current_user, get_history_store, save_evaluation
+from utils.live_recorder import LiveRecorder, list_audio_devices
+from utils.text_analysis import FILLERS_SHORT, get_text_engine
+from utils.transcription import STATUS_UNINTELLIGIBLE, get_transcription_service
 
 st.set_page_config(page_title="Évaluation & Entraînement", layout="centered")
 
@@ -40,41 +27,55 @@ if uploaded_file:
 
 st.subheader("🎙️ Ou enregistre en live")
 
-class AudioProcessor(AudioProcessorBase):
-    def __init__(self):
-        self.audio_chunks = []
-
-    def recv(self, frame: av.AudioFrame) -> av.AudioFrame:
-        pcm = frame.to_ndarray().flatten()
-        self.audio_chunks.append(pcm)
-        return frame
-
-ctx = webrtc_streamer(
-    key="audio",
-    mode=WebRtcMode.SENDONLY,
-    audio_receiver_size=1024,
-    rtc_configuration={"iceServers": [{"urls": ["stun:stun.l.google.com:19302"]}]},
-    audio_processor_factory=AudioProcessor
-    # Essaye de spécifier un périphérique par défaut ou un nom spécifique
-    #video_processor_factory=None,  # Si tu n'as pas besoin de vidéo
-    #device="Microphone Array (Realtek(R) Audio)"
-# Essayez spécifier un périphérique audio spécifique, par exemple "default" ou le nom exact de votre périphérique
-)
-
-if ctx.audio_processor and ctx.state.playing:
-    st.info("🎤 Enregistrement en cours... Parle maintenant !")
-elif ctx.audio_processor and not ctx.state.playing and ctx.audio_processor.audio_chunks:
-    st.success("✅ Enregistrement terminé !")
-    audio_np = np.concatenate(ctx.audio_processor.audio_chunks)
-    audio_path = "audio_live.wav"
-
-    with wave.open(audio_path, "wb") as wf:
-        wf.setnchannels(1)
-        wf.setsampwidth(2)
-        wf.setframerate(48000)
-        wf.writeframes(audio_np.astype(np.int16).tobytes())
-
-    st.audio(audio_path)
+# streamlit_webrtc (et avec lui PyAV et aiortc) n'est chargé que si l'enregistrement est activé
+if st.toggle("Activer le micro", key="live_mode"):
+    from streamlit_webrtc import AudioProcessorBase, WebRtcMode, webrtc_streamer
+
+    class AudioProcessor(AudioProcessorBase):
+        def __init__(self):
+            # Tampon borné + détection des pauses au fil de l'eau
+            self.recorder = LiveRecorder()
+
+        def recv(self, frame):
+            self.recorder.push(frame)
+            return frame
+
+    ctx = webrtc_streamer(
+        key="audio",
+        mode=WebRtcMode.SENDONLY,
+        audio_receiver_size=1024,
+        rtc_configuration={"iceServers": [{"urls": ["stun:stun.l.google.com:19302"]}]},
+        audio_processor_factory=AudioProcessor
+        # Essaye de spécifier un périphérique par défaut ou un nom spécifique
+        #video_processor_factory=None,  # Si tu n'as pas besoin de vidéo
+        #device="Microphone Array (Realtek(R) Audio)"
+    # Essayez spécifier un périphérique audio spécifique, par exemple "default" ou le nom exact de votre périphérique
+    )
+
+    if ctx.audio_processor and ctx.state.playing:
+        st.info("🎤 Enregistrement en cours... Parle maintenant !")
+        live = ctx.audio_processor.recorder.stats()
+        if live.duration:
+            st.caption(f"⏱️ {live.duration:.0f} s — 💤 pauses longues : {len(live.long_pauses)}")
+    elif ctx.audio_processor and not ctx.state.playing and ctx.audio_processor.recorder.has_audio:
+        st.success("✅ Enregistrement terminé !")
+        recorder = ctx.audio_processor.recorder
+        live = recorder.stats()
+        st.write(
+            f"🗣️ Temps de parole : {live.speech_seconds:.0f} s sur {live.duration:.0f} s — "
+            f"💤 pauses longues : {len(live.long_pauses)} {live.long_pauses}"
+        )
+        if live.truncated:
+            st.warning(f"Enregistrement trop long : seules les {recorder.max_seconds / 60:.0f} dernières minutes sont analysées.")
+        audio_path = "audio_live.wav"
+        recorder.write_wav(audio_path)
+
+        st.audio(audio_path)
+
+with st.expander("🔧 Périphériques audio du serveur"):
+    # Le micro utilisé est celui du navigateur : cette liste ne sert qu'au diagnostic
+    if st.button("Lister les périphériques"):
+        st.write(list_audio_devices())
 
 # ---------------------------
 # Analyse si fichier dispo
@@ -83,36 +84,33 @@ elif ctx.audio_processor and not ctx.state.playing and ctx.audio_processor.audio
 if audio_path:
     st.markdown("## 🔍 Résultats de l’analyse")
 
-    r = sr.Recognizer()
-    with sr.AudioFile(audio_path) as source:
-        audio = r.record(source)
-        try:
-            transcription = r.recognize_google(audio, language="fr-FR")
-        except sr.UnknownValueError:
-            transcription = "[Erreur : audio inintelligible]"
+    transcript = get_transcription_service().transcribe(audio_path)
+    if transcript.ok:
+        transcription = transcript.text
+    elif transcript.status == STATUS_UNINTELLIGIBLE:
+        transcription = "[Erreur : audio inintelligible]"
+    else:
+        transcription = "[Erreur : transcription indisponible]"
 
     st.markdown("### 📝 Transcription")
     st.write(transcription)
 
-    parasites = ["euh", "bah", "donc", "voilà", "hein"]
-    words = transcription.lower().split()
-    parasite_words_found = [w for w in words if w in parasites]
+    engine = get_text_engine(FILLERS_SHORT)
+    parasite_words_found = [match.expression for match in engine.fillers(transcription)]
 
     st.markdown("### 🚨 Mots parasites")
     st.write(parasite_words_found)
 
-    spell = SpellChecker(language="fr")
-    misspelled = spell.unknown(words)
+    misspelled = engine.unknown(transcription)
 
     st.markdown("### ✍️ Fautes d’orthographe")
     st.write(misspelled)
 
     nb_fautes = len(misspelled)
 
-    y, sr_librosa = librosa.load(audio_path)
-    tempo, _ = librosa.beat.beat_track(y, sr=sr_librosa)
-    intervals = librosa.effects.split(y, top_db=30)
-    pauses = [(i[1] - i[0]) / sr_librosa for i in intervals if (i[1] - i[0]) / sr_librosa > 1.5]
+    features = analyze_file(audio_path)
+    tempo = features.tempo
+    pauses = features.long_pauses
 
     rythme_score = len(pauses) * 2
     if tempo < 70 or tempo > 160:
@@ -131,37 +129,25 @@ if audio_path:
     st.markdown("### 🏆 Score d’éloquence")
     st.metric("Score global", f"{int(eloquence_score)} / 100")
 
-    os.makedirs("data", exist_ok=True)
-    historique_path = "data/historique.json"
-
-    session_result = {
+    save_evaluation({
         "date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
         "transcription": transcription,
         "score": int(eloquence_score),
         "mots_parasites": parasite_words_found,
         "nb_fautes": nb_fautes
-    }
-
-    if os.path.exists(historique_path):
-        with open(historique_path, "r") as f:
-            historique = json.load(f)
-    else:
-        historique = []
-
-    historique.append(session_result)
-
-    with open(historique_path, "w") as f:
-        json.dump(historique, f, indent=4)
+    }, audio_path)
 
 # ---------------------------
 # Historique & graphe
 # ---------------------------
 
+history = get_history_store()
+user = current_user()
+
 st.markdown("## 📜 Historique des évaluations")
-if os.path.exists("data/historique.json"):
-    with open("data/historique.json", "r") as f:
-        historique = json.load(f)
-    for session in reversed(historique[-5:]):
+sessions = history.last(5, user=user)
+if sessions:
+    for session in sessions:
         st.markdown(f"**🕒 {session['date']}**")
         st.markdown(f"- 📝 Transcription : `{session['transcription'][:100]}...`")
         st.markdown(f"- 📊 Score : {session['score']}/100")
@@ -169,7 +155,9 @@ if os.path.exists("data/historique.json"):
         st.markdown(f"- ✍️ Fautes : {session['nb_fautes']}")
         st.markdown("---")
 
-    df = pd.DataFrame(historique)
+    import matplotlib.pyplot as plt
+
+    df = history.scores(user)
     st.subheader("📈 Évolution de ton score")
     fig, ax = plt.subplots()
     ax.plot(df["date"], df["score"], marker="o")
@@ -0,0 +1,172 @@
+"""Temps de démarrage des pages Streamlit : imports, premier affichage et réexécutions.
+
+Exemple :
+    python profile_startup.py --output startup.json
+    python profile_startup.py pages/5_Evaluation_Upgrade.py --runs 5 --compare startup.json
+    python profile_startup.py ../../../app/app.py
+
+Chaque page est exécutée dans un processus neuf (``streamlit.testing``) : la première
+exécution mesure le démarrage à froid, les suivantes une réexécution (ce que coûte
+chaque interaction de l'utilisateur). ``python -X importtime`` donne le détail des
+modules importés par la page, du plus coûteux au moins coûteux. Les résultats sont
+écrits en JSON pour comparer les versions.
+"""
+import argparse
+import glob
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+MARKER = "--- debut de la page ---"
+
+# Exécuté dans le processus mesuré : argv = racine de l'application, page, nombre d'exécutions
+_RUNNER = """
+import json, sys, time
+root, script, runs, timeout = sys.argv[1], sys.argv[2], int(sys.argv[3]), float(sys.argv[4])
+sys.path.insert(0, root)
+from streamlit.testing.v1 import AppTest
+sys.stderr.write(%r + "\\n")
+sys.stderr.flush()
+app = AppTest.from_file(script, default_timeout=timeout)
+timings, errors = [], []
+for _ in range(runs):
+    started = time.perf_counter()
+    try:
+        app.run()
+    except Exception as exc:
+        errors.append(f"{type(exc).__name__}: {exc}")
+        break
+    timings.append(time.perf_counter() - started)
+    errors = [e.message for e in app.exception]
+print(json.dumps({"runs": timings, "errors": errors}))
+""" % MARKER
+
+
+def app_root(script: str) -> str:
+    """Dossier de l'application : celui du script principal (parent de ``pages/``)."""
+    directory = os.path.dirname(os.path.abspath(script))
+    return os.path.dirname(directory) if os.path.basename(directory) == "pages" else directory
+
+
+def parse_importtime(stderr: str) -> List[Dict[str, Any]]:
+    """Modules importés directement par la page (premier niveau), avec leur coût cumulé en ms."""
+    lines = stderr.split(MARKER, 1)[-1].splitlines()
+    imports: Dict[str, float] = {}
+    for line in lines:
+        # "import time: <propre µs> | <cumulé µs> | <module>", indenté selon la profondeur
+        if not line.startswith("import time:") or line.count("|") != 2:
+            continue
+        _, cumulative_us, name = line.split("|")
+        if not cumulative_us.strip().isdigit() or name.startswith("   "):
+            continue
+        # Un import qui échoue peut apparaître plusieurs fois : on garde la plus longue tentative
+        module = name.strip()
+        imports[module] = max(imports.get(module, 0.0), int(cumulative_us) / 1000)
+    ranked = sorted(imports.items(), key=lambda item: item[1], reverse=True)
+    return [{"module": module, "ms": ms} for module, ms in ranked]
+
+
+def profile_script(script: str, runs: int, timeout: float, root: Optional[str] = None) -> Dict[str, Any]:
+    root = root or app_root(script)
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _RUNNER, root, os.path.abspath(script), str(runs), str(timeout)],
+        capture_output=True, text=True, cwd=root, timeout=timeout * runs + 60,
+    )
+    try:
+        outcome = json.loads(process.stdout.strip().splitlines()[-1])
+    except (IndexError, ValueError):
+        outcome = {"runs": [], "errors": [process.stderr.strip().splitlines()[-1] if process.stderr.strip() else "?"]}
+    imports = parse_importtime(process.stderr)
+    timings = outcome["runs"]
+    return {
+        "script": os.path.relpath(os.path.abspath(script), root),
+        "cold_s": round(timings[0], 3) if timings else None,
+        "rerun_s": round(statistics.median(timings[1:]), 3) if len(timings) > 1 else None,
+        "imports_s": round(sum(i["ms"] for i in imports) / 1000, 3),
+        "top_imports": imports[:10],
+        "errors": outcome["errors"],
+    }
+
+
+def print_report(results: List[Dict[str, Any]]) -> None:
+    for r in results:
+        cold = f"{r['cold_s']:.2f} s" if r["cold_s"] is not None else "—"
+        rerun = f"{r['rerun_s']:.3f} s" if r["rerun_s"] is not None else "—"
+        print(f"{r['script']:<36} à froid {cold:>8}  réexécution {rerun:>9}  imports {r['imports_s']:.2f} s", file=sys.stderr)
+        for imp in r["top_imports"][:5]:
+            print(f"    {imp['ms']:>8.1f} ms  {imp['module']}", file=sys.stderr)
+        for error in r["errors"]:
+            print(f"    erreur : {error.splitlines()[0] if error else error}", file=sys.stderr)
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True, cwd=HERE,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: List[Dict[str, Any]], baseline_path: str) -> None:
+    """Affiche l'évolution des temps par rapport à un précédent fichier de résultats."""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {r["script"]: r for r in json.load(f)["results"]}
+    print(f"Comparaison avec {baseline_path} :", file=sys.stderr)
+    for result in results:
+        previous = baseline.get(result["script"])
+        if previous is None:
+            continue
+        deltas = []
+        for key, label in (("cold_s", "à froid"), ("rerun_s", "réexécution"), ("imports_s", "imports")):
+            if result.get(key) is not None and previous.get(key):
+                deltas.append(f"{label} {result[key] / previous[key] - 1:+7.1%}")
+        print(f"{result['script']:<36} {'  '.join(deltas)}", file=sys.stderr)
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Mesure le démarrage et les réexécutions des pages Streamlit.")
+    parser.add_argument("scripts", nargs="*", help="Pages à mesurer (défaut : main.py et pages/*.py)")
+    parser.add_argument("--root", help="Dossier de l'application (défaut : dossier du script principal)")
+    parser.add_argument("--runs", type=int, default=3, help="Exécutions par page, la première à froid (défaut: 3)")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Durée maximale d'une exécution, en secondes")
+    parser.add_argument("--output", default="profil_demarrage.json", help="Fichier JSON des résultats")
+    parser.add_argument("--compare", help="Résultats précédents (JSON) à comparer")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    scripts = args.scripts or [os.path.join(HERE, "main.py")] + sorted(glob.glob(os.path.join(HERE, "pages", "*.py")))
+    results = []
+    for script in scripts:
+        try:
+            results.append(profile_script(script, max(args.runs, 1), args.timeout, args.root))
+        except (OSError, subprocess.TimeoutExpired) as exc:
+            print(f"Erreur sur {script}: {exc}", file=sys.stderr)
+            return 1
+    print_report(results)
+    report = {
+        "revision": git_revision(),
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "parameters": {"runs": args.runs},
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"Résultats écrits dans {args.output}", file=sys.stderr)
+    if args.compare:
+        compare(results, args.compare)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,113 @@
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import List, Tuple
+
+import numpy as np
+
+from utils.transcription import file_digest
+
+# Fréquence fixe de décodage : suffisante pour la voix, et 27 % d'échantillons en moins
+# que la fréquence par défaut de librosa (22 050 Hz)
+SAMPLE_RATE = 16_000
+FRAME_LENGTH = 1024
+HOP_LENGTH = 256
+# Seuil de silence, en dB sous le niveau le plus fort (équivalent de librosa.effects.split)
+TOP_DB = 30.0
+LONG_PAUSE_SECONDS = 1.5
+CACHE_SIZE = 64
+
+
+@dataclass(frozen=True)
+class AudioFeatures:
+    duration: float
+    tempo: float
+    pauses: Tuple[float, ...]
+    speech_ratio: float
+
+    @property
+    def long_pauses(self) -> List[float]:
+        return [p for p in self.pauses if p > LONG_PAUSE_SECONDS]
+
+
+def load_audio(path: str) -> np.ndarray:
+    """Signal mono float32 à ``SAMPLE_RATE``, décodé une seule fois."""
+    import librosa
+
+    y, _ = librosa.load(path, sr=SAMPLE_RATE, mono=True, dtype=np.float32)
+    return y
+
+
+def frame_rms(y: np.ndarray, frame_length: int = FRAME_LENGTH, hop_length: int = HOP_LENGTH) -> np.ndarray:
+    """Énergie RMS par trame glissante (vue sur le tampon, sans copie des trames)."""
+    if len(y) < frame_length:
+        y = np.pad(y, (0, frame_length - len(y)))
+    frames = np.lib.stride_tricks.sliding_window_view(y, frame_length)[::hop_length]
+    return np.sqrt(np.einsum("ij,ij->i", frames, frames, dtype=np.float64) / frame_length)
+
+
+def voiced_frames(rms: np.ndarray, reference: float, top_db: float = TOP_DB) -> np.ndarray:
+    """Trames dont l'énergie dépasse ``reference`` - ``top_db`` dB."""
+    if reference <= 0:
+        return np.zeros(len(rms), dtype=bool)
+    return rms > reference * 10 ** (-top_db / 20)
+
+
+def silent_gaps(voiced: np.ndarray, hop_seconds: float) -> np.ndarray:
+    """Durées (s) des silences situés entre deux passages parlés (début et fin exclus)."""
+    if not voiced.any():
+        return np.empty(0)
+    edges = np.flatnonzero(np.diff(voiced.astype(np.int8)))
+    # Passages parlé -> silence (+1) puis silence -> parlé (-1), bornés par la parole
+    starts = edges[voiced[edges]] + 1
+    ends = edges[~voiced[edges]] + 1
+    first, last = np.flatnonzero(voiced)[[0, -1]]
+    starts = starts[(starts > first) & (starts <= last)]
+    ends = ends[(ends > first) & (ends <= last)]
+    return (ends - starts) * hop_seconds
+
+
+def estimate_tempo(y: np.ndarray, sr: int = SAMPLE_RATE) -> float:
+    """Tempo (BPM) de l'enveloppe d'attaques, sans suivi des temps (``beat_track``)."""
+    import librosa
+
+    if not len(y):
+        return 0.0
+    envelope = librosa.onset.onset_strength(y=y, sr=sr, hop_length=HOP_LENGTH)
+    tempo = getattr(librosa.feature, "tempo", None) or librosa.beat.tempo
+    return float(tempo(onset_envelope=envelope, sr=sr, hop_length=HOP_LENGTH)[0])
+
+
+def analyze_signal(y: np.ndarray, sr: int = SAMPLE_RATE) -> AudioFeatures:
+    rms = frame_rms(y)
+    voiced = voiced_frames(rms, float(rms.max()) if len(rms) else 0.0)
+    gaps = silent_gaps(voiced, HOP_LENGTH / sr)
+    return AudioFeatures(
+        duration=len(y) / sr,
+        tempo=estimate_tempo(y, sr),
+        pauses=tuple(float(g) for g in gaps),
+        speech_ratio=float(voiced.mean()) if len(voiced) else 0.0,
+    )
+
+
+_cache: "OrderedDict[str, AudioFeatures]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def analyze_file(path: str) -> AudioFeatures:
+    """Durée, tempo et pauses d'un fichier audio, mémorisés par empreinte de son contenu.
+
+    Le fichier n'est décodé qu'une fois ; une réexécution de la page (ou le même
+    enregistrement téléversé sous un autre nom) reprend le résultat déjà calculé.
+    """
+    digest = file_digest(path)
+    with _cache_lock:
+        if digest in _cache:
+            _cache.move_to_end(digest)
+            return _cache[digest]
+    features = analyze_signal(load_audio(path))
+    with _cache_lock:
+        _cache[digest] = features
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return features
@@ -11,6 +11,7 @@ def login():
         if users.get(email) == password:
             st.success("Connexion réussie ! Accès au tableau de bord.")
             st.session_state["logged_in"] = True
+            st.session_state["email"] = email
         else:
             st.error("Identifiants incorrects")
 
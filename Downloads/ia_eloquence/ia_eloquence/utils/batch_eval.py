@@ -0,0 +1,120 @@
+import os
+import tempfile
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import pandas as pd
+
+REPORT_COLUMNS = [
+    "fichier", "statut", "score", "durée", "tempo_estimé", "nb_pauses_longues", "rythme_score",
+    "nb_fautes", "nb_parasites", "mots_parasites", "fautes", "transcription", "erreur",
+]
+
+ProgressCallback = Callable[[int, int, Dict[str, Any]], None]
+
+# Ressources d'un processus de calcul, chargées une fois à son démarrage
+_service = None
+
+
+def _init_worker() -> None:
+    global _service
+    from utils.text_analysis import get_text_engine
+    from utils.transcription import TranscriptCache, TranscriptionService, engines_from_env
+
+    _service = TranscriptionService(engines_from_env(), TranscriptCache())
+    try:
+        get_text_engine().warm()
+    except ImportError:
+        # L'erreur sera reportée fichier par fichier au lieu de casser le pool
+        pass
+
+
+def _evaluate(path: str) -> Dict[str, Any]:
+    from utils.evaluation import evaluate_file
+
+    try:
+        result = evaluate_file(path, _service)
+    except Exception as exc:
+        # Un fichier illisible ne doit pas interrompre le lot
+        result = {"fichier": os.path.basename(path), "statut": "erreur", "erreur": f"{type(exc).__name__}: {exc}"}
+    result["chemin"] = path
+    return result
+
+
+def list_recordings(folder: str) -> List[str]:
+    """Fichiers .wav d'un dossier et de ses sous-dossiers, triés."""
+    paths = []
+    for root, _, files in os.walk(folder):
+        paths.extend(os.path.join(root, name) for name in files if name.lower().endswith(".wav"))
+    return sorted(paths)
+
+
+def extract_zip(archive: str, destination: str) -> List[str]:
+    """Extrait les .wav d'une archive zip (sans suivre les chemins de l'archive) et les liste."""
+    paths = []
+    with zipfile.ZipFile(archive) as zf:
+        for index, info in enumerate(zf.infolist()):
+            name = os.path.basename(info.filename)
+            if info.is_dir() or not name.lower().endswith(".wav") or name.startswith("."):
+                continue
+            # Préfixe numérique : deux fichiers de même nom dans des dossiers différents
+            target = os.path.join(destination, f"{index:04d}_{name}")
+            with zf.open(info) as src, open(target, "wb") as dst:
+                while True:
+                    block = src.read(1 << 20)
+                    if not block:
+                        break
+                    dst.write(block)
+            paths.append(target)
+    return paths
+
+
+def iter_evaluations(
+    paths: List[str], workers: Optional[int] = None
+) -> Iterator[Dict[str, Any]]:
+    """Évalue les fichiers en parallèle (un processus par cœur par défaut), dans l'ordre
+    où ils se terminent. Chaque processus garde ses modèles et dictionnaires chargés
+    d'un fichier à l'autre.
+    """
+    workers = min(workers or os.cpu_count() or 1, max(len(paths), 1))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        futures = [pool.submit(_evaluate, path) for path in paths]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def evaluate_batch(
+    source: str, workers: Optional[int] = None, on_progress: Optional[ProgressCallback] = None
+) -> pd.DataFrame:
+    """Rapport (une ligne par fichier, dans l'ordre des noms) d'un dossier ou d'un .zip de .wav."""
+    with tempfile.TemporaryDirectory(prefix="eloquence_lot_") as tmp:
+        if zipfile.is_zipfile(source):
+            paths = extract_zip(source, tmp)
+        elif os.path.isdir(source):
+            paths = list_recordings(source)
+        else:
+            raise ValueError(f"{source} n'est ni un dossier ni une archive .zip")
+        if not paths:
+            raise ValueError(f"Aucun fichier .wav dans {source}")
+        order = {path: i for i, path in enumerate(paths)}
+        results = []
+        for done, result in enumerate(iter_evaluations(paths, workers), start=1):
+            results.append(result)
+            if on_progress is not None:
+                on_progress(done, len(paths), result)
+    results.sort(key=lambda r: order[r.pop("chemin")])
+    return pd.DataFrame(results).reindex(columns=REPORT_COLUMNS)
+
+
+def write_report(report: pd.DataFrame, path: str) -> None:
+    """Écrit le rapport en .csv, .xlsx ou .json selon l'extension."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".csv":
+        report.to_csv(path, index=False)
+    elif ext == ".xlsx":
+        report.astype({"mots_parasites": str, "fautes": str}).to_excel(path, index=False)
+    elif ext == ".json":
+        report.to_json(path, orient="records", force_ascii=False, indent=2)
+    else:
+        raise ValueError(f"Format de rapport non géré : {ext} (.csv, .xlsx, .json)")
@@ -0,0 +1,86 @@
+import os
+from typing import Any, Dict, Optional
+
+from utils.audio_analysis import analyze_file
+from utils.text_analysis import get_text_engine
+from utils.transcription import STATUS_UNINTELLIGIBLE, Transcript, TranscriptionService, get_transcription_service
+
+
+# Fonction : Analyse audio (rythme, pauses longues), calculée une fois par fichier
+def analyze_audio(file_path):
+    features = analyze_file(file_path)
+    pauses = features.long_pauses
+    rythme_score = min(len(pauses) * 5 + abs(features.tempo - 120) * 0.5, 25)  # max 25 pts
+    return {
+        "durée": round(features.duration, 2),
+        "tempo_estimé": round(features.tempo, 2),
+        "nb_pauses_longues": len(pauses),
+        "rythme_score": round(rythme_score, 2),
+        "pauses_en_secondes": [round(p, 2) for p in pauses]
+    }
+
+
+# Fonction : Score final
+def calcul_score(total_fautes, nb_parasites, rythme_score):
+    score = 100
+    score -= total_fautes * 2  # max 30 pts
+    score -= nb_parasites * 1.5  # max 25 pts
+    score -= rythme_score       # max 25 pts
+    return max(round(score), 0)
+
+
+# Fonction : Transcription (mise en cache, moteur en ligne ou local)
+def transcribe_audio(path, service: Optional[TranscriptionService] = None):
+    return transcript_text((service or get_transcription_service()).transcribe(path))
+
+
+def transcript_text(transcript: Transcript) -> str:
+    if transcript.ok:
+        return transcript.text
+    if transcript.status == STATUS_UNINTELLIGIBLE:
+        return "Transcription non comprise."
+    return "Transcription indisponible."
+
+
+# Fonction : Détection fautes
+def correction_orthographe(text):
+    return get_text_engine().unknown(text)
+
+
+# Fonction : Détection parasites (liste de la page d'évaluation complète)
+def detect_parasites(text):
+    return [match.expression for match in get_text_engine().fillers(text)]
+
+
+def evaluate_file(path: str, service: Optional[TranscriptionService] = None) -> Dict[str, Any]:
+    """Évaluation complète d'un enregistrement, comme la page d'évaluation.
+
+    Sans transcription (aucun moteur disponible ou parole incomprise), le fichier n'est
+    pas noté : ``statut`` vaut "erreur" et ``erreur`` donne le statut de la transcription.
+    """
+    transcript = (service or get_transcription_service()).transcribe(path)
+    transcription = transcript_text(transcript)
+    if not transcript.ok:
+        return {
+            "fichier": os.path.basename(path),
+            "statut": "erreur",
+            "erreur": f"transcription {transcript.status}" + (f" ({transcript.text})" if transcript.text else ""),
+            "transcription": transcription,
+        }
+    fautes = correction_orthographe(transcription)
+    parasites = detect_parasites(transcription)
+    rythme = analyze_audio(path)
+    return {
+        "fichier": os.path.basename(path),
+        "statut": "ok",
+        "transcription": transcription,
+        "durée": rythme["durée"],
+        "tempo_estimé": rythme["tempo_estimé"],
+        "nb_pauses_longues": rythme["nb_pauses_longues"],
+        "rythme_score": rythme["rythme_score"],
+        "nb_fautes": len(fautes),
+        "fautes": fautes,
+        "nb_parasites": len(parasites),
+        "mots_parasites": parasites,
+        "score": calcul_score(len(fautes), len(parasites), rythme["rythme_score"]),
+    }
@@ -0,0 +1,171 @@
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import TYPE_CHECKING, Any, Dict, List, Mapping, Optional
+
+import streamlit as st
+
+from utils.transcription import file_digest
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+DEFAULT_HISTORY_PATH = os.environ.get("ELOQUENCE_HISTORY_PATH", os.path.join("data", "historique.sqlite"))
+# Ancien format : tout l'historique dans un seul fichier JSON réécrit à chaque évaluation
+LEGACY_JSON_PATH = os.path.join("data", "historique.json")
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+COLUMNS = ["date", "utilisateur", "transcription", "score", "mots_parasites", "nb_fautes"]
+
+
+class HistoryStore:
+    """Historique des évaluations (SQLite, une ligne par évaluation, jamais réécrit).
+
+    Chaque évaluation est un simple ``INSERT`` : le coût ne dépend pas de la taille de
+    l'historique et plusieurs sessions peuvent écrire en même temps. Les lectures passent
+    par les index (utilisateur, date) et (date) et ne chargent que la page demandée.
+    """
+
+    def __init__(self, path: str = DEFAULT_HISTORY_PATH, legacy_json: Optional[str] = LEGACY_JSON_PATH) -> None:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS evaluations (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                date TEXT NOT NULL,
+                utilisateur TEXT NOT NULL DEFAULT '',
+                transcription TEXT NOT NULL DEFAULT '',
+                score INTEGER,
+                mots_parasites TEXT NOT NULL DEFAULT '[]',
+                nb_fautes INTEGER
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_evaluations_date ON evaluations (date)")
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_evaluations_utilisateur_date ON evaluations (utilisateur, date)"
+        )
+        # Fichiers d'historique déjà importés : une seule migration même si plusieurs sessions démarrent ensemble
+        self._conn.execute("CREATE TABLE IF NOT EXISTS migrations (source TEXT PRIMARY KEY, date TEXT NOT NULL)")
+        if legacy_json and os.path.exists(legacy_json):
+            self.migrate_json(legacy_json)
+
+    @staticmethod
+    def _row(result: Mapping[str, Any], user: str) -> tuple:
+        return (
+            result.get("date") or datetime.now().strftime(DATE_FORMAT),
+            result.get("utilisateur", user) or "",
+            result.get("transcription", "") or "",
+            result.get("score"),
+            json.dumps(list(result.get("mots_parasites") or []), ensure_ascii=False),
+            result.get("nb_fautes"),
+        )
+
+    def add(self, result: Mapping[str, Any], user: str = "") -> None:
+        """Ajoute une évaluation (clés de ``COLUMNS`` ; date du moment si absente)."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO evaluations (date, utilisateur, transcription, score, mots_parasites, nb_fautes) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                self._row(result, user),
+            )
+
+    def migrate_json(self, path: str) -> int:
+        """Importe un ancien ``historique.json`` puis le renomme en ``.migre`` (fait une seule fois).
+
+        L'ancien fichier n'avait pas d'utilisateur : ses évaluations restent sans propriétaire
+        et s'affichent dans l'historique de chacun, comme avant.
+        """
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                sessions = json.load(f)
+        except FileNotFoundError:
+            # Déjà migré par une autre session
+            return 0
+        source = os.path.abspath(path)
+        rows = [self._row(session, "") for session in sessions]
+        with self._lock:
+            # Verrou d'écriture pris d'emblée : la vérification et l'import ne peuvent pas s'entrelacer
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                if self._conn.execute("SELECT 1 FROM migrations WHERE source = ?", (source,)).fetchone():
+                    rows = []
+                else:
+                    self._conn.executemany(
+                        "INSERT INTO evaluations (date, utilisateur, transcription, score, mots_parasites, nb_fautes) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        rows,
+                    )
+                    self._conn.execute(
+                        "INSERT INTO migrations (source, date) VALUES (?, ?)",
+                        (source, datetime.now().strftime(DATE_FORMAT)),
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        try:
+            os.replace(path, path + ".migre")
+        except FileNotFoundError:
+            pass
+        return len(rows)
+
+    def _where(self, user: Optional[str]):
+        # Les évaluations sans propriétaire (ancien historique, sessions anonymes) sont visibles de tous
+        return ("WHERE utilisateur IN (?, '')", (user,)) if user is not None else ("", ())
+
+    def count(self, user: Optional[str] = None) -> int:
+        where, params = self._where(user)
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM evaluations {where}", params).fetchone()[0]
+
+    def last(self, limit: int = 10, offset: int = 0, user: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Évaluations les plus récentes d'abord, ``limit`` à partir de la ``offset``-ième."""
+        where, params = self._where(user)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(COLUMNS)} FROM evaluations {where} ORDER BY date DESC, id DESC LIMIT ? OFFSET ?",
+                params + (limit, offset),
+            ).fetchall()
+        sessions = [dict(zip(COLUMNS, row)) for row in rows]
+        for session in sessions:
+            session["mots_parasites"] = json.loads(session["mots_parasites"])
+        return sessions
+
+    def scores(self, user: Optional[str] = None) -> "pd.DataFrame":
+        """Dates et scores seuls, dans l'ordre chronologique (courbe de progression)."""
+        import pandas as pd
+
+        where, params = self._where(user)
+        with self._lock:
+            rows = self._conn.execute(f"SELECT date, score FROM evaluations {where} ORDER BY date, id", params).fetchall()
+        return pd.DataFrame(rows, columns=["date", "score"])
+
+
+@st.cache_resource
+def get_history_store() -> HistoryStore:
+    return HistoryStore()
+
+
+def current_user() -> Optional[str]:
+    """Utilisateur connecté (``None`` : historique de tous les utilisateurs)."""
+    return st.session_state.get("email") or None
+
+
+def save_evaluation(result: Mapping[str, Any], audio_path: str) -> bool:
+    """Enregistre l'évaluation d'un fichier audio, une seule fois tant qu'il ne change pas :
+    les réexécutions de la page ne créent pas de doublons.
+    """
+    digest = file_digest(audio_path)
+    if st.session_state.get("derniere_evaluation") == digest:
+        return False
+    get_history_store().add(result, current_user() or "")
+    st.session_state["derniere_evaluation"] = digest
+    return True
@@ -0,0 +1,199 @@
+import os
+import threading
+import wave
+from dataclasses import dataclass
+from typing import List, Optional
+
+import numpy as np
+
+from utils.audio_analysis import LONG_PAUSE_SECONDS, SAMPLE_RATE, TOP_DB
+
+# Durée maximale conservée : au-delà, le début de l'enregistrement est écrasé
+MAX_SECONDS = float(os.environ.get("ELOQUENCE_LIVE_MAX_SECONDS", 15 * 60))
+# Taille des blocs d'analyse de la détection de voix
+BLOCK_SECONDS = 0.02
+# Niveau RMS (pleine échelle = 1) sous lequel un bloc est toujours considéré comme silencieux
+NOISE_FLOOR = 1e-3
+
+_SAMPLE_SCALES = {"s16": 32768.0, "s16p": 32768.0, "s32": 2147483648.0, "s32p": 2147483648.0}
+
+
+def frame_to_mono(frame) -> np.ndarray:
+    """Échantillons mono float32 (pleine échelle = 1) d'une trame audio PyAV.
+
+    Tient compte du format réel de la trame : entrelacé (``s16`` : une ligne de
+    ``canaux * n`` valeurs) ou planaire (``fltp`` : une ligne par canal), entier ou flottant.
+    """
+    data = frame.to_ndarray()
+    channels = len(frame.layout.channels)
+    if frame.format.is_planar:
+        samples = data.reshape(channels, -1)
+    else:
+        samples = data.reshape(-1, channels).T
+    samples = samples.astype(np.float32)
+    scale = _SAMPLE_SCALES.get(frame.format.name)
+    if scale:
+        samples /= scale
+    return samples.mean(axis=0) if channels > 1 else samples[0]
+
+
+class RingBuffer:
+    """Tampon circulaire float32 de taille fixe : la mémoire ne dépend pas de la durée de prise."""
+
+    def __init__(self, capacity: int) -> None:
+        self._data = np.zeros(capacity, dtype=np.float32)
+        self._end = 0
+        self.written = 0
+
+    @property
+    def capacity(self) -> int:
+        return len(self._data)
+
+    def write(self, samples: np.ndarray) -> None:
+        if len(samples) >= self.capacity:
+            samples = samples[-self.capacity:]
+        first = min(len(samples), self.capacity - self._end)
+        self._data[self._end:self._end + first] = samples[:first]
+        self._data[:len(samples) - first] = samples[first:]
+        self._end = (self._end + len(samples)) % self.capacity
+        self.written += len(samples)
+
+    def snapshot(self) -> np.ndarray:
+        """Contenu dans l'ordre chronologique (copie)."""
+        if self.written < self.capacity:
+            return self._data[:self._end].copy()
+        return np.concatenate([self._data[self._end:], self._data[:self._end]])
+
+
+@dataclass
+class LiveStats:
+    duration: float
+    speech_seconds: float
+    long_pauses: List[float]
+    speaking: bool
+    truncated: bool
+
+    @property
+    def speech_ratio(self) -> float:
+        return self.speech_seconds / self.duration if self.duration else 0.0
+
+
+class VoiceActivityDetector:
+    """Détection de voix par énergie, bloc par bloc, au fil de l'enregistrement.
+
+    Un bloc est parlé si son niveau dépasse à la fois ``NOISE_FLOOR`` et le niveau le plus
+    fort entendu jusque-là moins ``top_db`` dB (même critère que ``audio_analysis``). Un
+    silence d'au moins ``LONG_PAUSE_SECONDS`` suivi d'une reprise de parole compte comme
+    une pause longue.
+    """
+
+    def __init__(self, sample_rate: int, top_db: float = TOP_DB) -> None:
+        self.block = max(int(sample_rate * BLOCK_SECONDS), 1)
+        self.block_seconds = self.block / sample_rate
+        self.ratio = 10 ** (-top_db / 20)
+        self.peak = 0.0
+        self.speaking = False
+        self.spoken = False
+        self.silence = 0.0
+        self.speech_seconds = 0.0
+        self.long_pauses: List[float] = []
+        self._pending = np.empty(0, dtype=np.float32)
+
+    def feed(self, samples: np.ndarray) -> None:
+        samples = np.concatenate([self._pending, samples]) if len(self._pending) else samples
+        n_blocks = len(samples) // self.block
+        self._pending = samples[n_blocks * self.block:]
+        if not n_blocks:
+            return
+        blocks = samples[:n_blocks * self.block].reshape(n_blocks, self.block)
+        rms = np.sqrt(np.einsum("ij,ij->i", blocks, blocks, dtype=np.float64) / self.block)
+        # Référence cumulée : chaque bloc est jugé par rapport au plus fort entendu jusqu'à lui
+        peaks = np.maximum.accumulate(np.maximum(rms, self.peak))
+        self.peak = float(peaks[-1])
+        voiced = (rms > NOISE_FLOOR) & (rms > peaks * self.ratio)
+        self.speech_seconds += float(voiced.sum()) * self.block_seconds
+        for is_voiced in voiced:
+            if is_voiced:
+                if self.spoken and self.silence >= LONG_PAUSE_SECONDS:
+                    self.long_pauses.append(round(self.silence, 2))
+                self.silence = 0.0
+                self.spoken = True
+            else:
+                self.silence += self.block_seconds
+        self.speaking = bool(voiced[-1])
+
+
+class LiveRecorder:
+    """Enregistrement en direct borné en mémoire, analysé pendant que l'utilisateur parle.
+
+    ``push`` reçoit les trames (thread du flux WebRTC) ; la fréquence d'échantillonnage
+    est celle des trames reçues. Quand elle est un multiple de ``SAMPLE_RATE`` (48 kHz en
+    général), le signal est ramené à ``SAMPLE_RATE`` avant d'être conservé.
+    """
+
+    def __init__(self, max_seconds: float = MAX_SECONDS) -> None:
+        self.max_seconds = max_seconds
+        self.sample_rate: Optional[int] = None
+        self._factor = 1
+        self._buffer: Optional[RingBuffer] = None
+        self._vad: Optional[VoiceActivityDetector] = None
+        self._lock = threading.Lock()
+
+    def _start(self, rate: int) -> None:
+        self._factor = rate // SAMPLE_RATE if rate > SAMPLE_RATE and rate % SAMPLE_RATE == 0 else 1
+        self.sample_rate = rate // self._factor
+        self._buffer = RingBuffer(int(self.max_seconds * self.sample_rate))
+        self._vad = VoiceActivityDetector(self.sample_rate)
+
+    def push(self, frame) -> None:
+        samples = frame_to_mono(frame)
+        with self._lock:
+            if self._buffer is None:
+                self._start(frame.sample_rate)
+            if self._factor > 1:
+                # Moyenne par paquets : filtre passe-bas sommaire avant décimation
+                usable = len(samples) - len(samples) % self._factor
+                samples = samples[:usable].reshape(-1, self._factor).mean(axis=1)
+            self._buffer.write(samples)
+            self._vad.feed(samples)
+
+    @property
+    def has_audio(self) -> bool:
+        return self._buffer is not None and self._buffer.written > 0
+
+    def stats(self) -> LiveStats:
+        with self._lock:
+            if self._buffer is None:
+                return LiveStats(0.0, 0.0, [], False, False)
+            return LiveStats(
+                duration=self._buffer.written / self.sample_rate,
+                speech_seconds=self._vad.speech_seconds,
+                long_pauses=list(self._vad.long_pauses),
+                speaking=self._vad.speaking,
+                truncated=self._buffer.written > self._buffer.capacity,
+            )
+
+    def write_wav(self, path: str) -> None:
+        """WAV mono 16 bits à la fréquence réelle de l'enregistrement."""
+        with self._lock:
+            samples = self._buffer.snapshot()
+            rate = self.sample_rate
+        pcm = (np.clip(samples, -1.0, 1.0) * 32767).astype("<i2")
+        with wave.open(path, "wb") as wf:
+            wf.setnchannels(1)
+            wf.setsampwidth(2)
+            wf.setframerate(rate)
+            wf.writeframes(pcm.tobytes())
+
+
+def list_audio_devices() -> List[str]:
+    """Périphériques audio vus par le serveur (diagnostic). PyAudio n'est chargé et le
+    matériel interrogé qu'à l'appel, jamais à l'import d'une page.
+    """
+    import pyaudio
+
+    pa = pyaudio.PyAudio()
+    try:
+        return [f"{i}: {pa.get_device_info_by_index(i)['name']}" for i in range(pa.get_device_count())]
+    finally:
+        pa.terminate()
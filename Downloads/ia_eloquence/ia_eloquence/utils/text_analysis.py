@@ -0,0 +1,143 @@
+import functools
+import re
+import threading
+from collections import Counter, deque
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Mots parasites comptés dans le score, listes d'origine de chaque page (une expression
+# peut aussi compter plusieurs mots, ex: "du coup")
+FILLERS = ("euh", "bah", "enfin", "donc", "quoi", "voilà")  # évaluation complète et par lots
+FILLERS_SHORT = ("euh", "donc", "bah", "hein", "voilà")  # évaluation simple et en direct
+CORRECTION_CACHE_SIZE = 50_000
+
+# Dictionnaires chargés, par langue : plusieurs secondes et des dizaines de Mo chacun
+_spell_checkers: Dict[str, Any] = {}
+_spell_lock = threading.Lock()
+
+# Mot, éventuellement précédé d'une élision ("l'", "qu'"...) qui n'en fait pas partie
+_WORD_RE = re.compile(r"(?:(?:[cdjlmnst]|qu|jusqu|lorsqu|puisqu)['’])?(\w+(?:['’-]\w+)*)", re.IGNORECASE)
+
+
+def spell_checker(language: str) -> Any:
+    """Correcteur orthographique partagé par tout le processus, chargé une seule fois même
+    si plusieurs sessions Streamlit le demandent en même temps."""
+    with _spell_lock:
+        if language not in _spell_checkers:
+            from spellchecker import SpellChecker
+
+            _spell_checkers[language] = SpellChecker(language=language)
+        return _spell_checkers[language]
+
+
+def tokenize(text: str) -> List[Tuple[str, int, int]]:
+    """Mots en minuscules avec leur position (début, fin) dans ``text`` ("j'ai" -> "ai",
+    "aujourd'hui" et "peut-être" restent entiers).
+    """
+    return [(m.group(1).casefold().replace("’", "'"), m.start(1), m.end(1)) for m in _WORD_RE.finditer(text)]
+
+
+@dataclass(frozen=True)
+class Match:
+    expression: str
+    start: int
+    end: int
+
+
+class PhraseMatcher:
+    """Recherche simultanée d'expressions de un ou plusieurs mots (automate d'Aho-Corasick
+    sur les mots) : un seul passage sur le texte, quel que soit le nombre d'expressions.
+    """
+
+    def __init__(self, expressions: Iterable[str]) -> None:
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        # Expressions reconnues en fin de nœud : (expression, longueur en mots)
+        self._out: List[List[Tuple[str, int]]] = [[]]
+        for expression in expressions:
+            words = [w for w, _, _ in tokenize(expression)]
+            if not words:
+                continue
+            node = 0
+            for word in words:
+                if word not in self._goto[node]:
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                    self._goto[node][word] = len(self._goto) - 1
+                node = self._goto[node][word]
+            self._out[node].append((" ".join(words), len(words)))
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for word, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and word not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(word, 0)
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+    def find(self, text: str) -> List[Match]:
+        """Occurrences dans l'ordre du texte (les expressions imbriquées sont toutes rapportées)."""
+        tokens = tokenize(text)
+        matches = []
+        node = 0
+        for i, (word, _, end) in enumerate(tokens):
+            while node and word not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(word, 0)
+            for expression, length in self._out[node]:
+                matches.append(Match(expression, tokens[i - length + 1][1], end))
+        matches.sort(key=lambda m: (m.start, m.end))
+        return matches
+
+
+class TextEngine:
+    """Analyse de texte partagée par tout le processus : dictionnaire français chargé une
+    fois, vérification et correction mémorisées par mot, repérage des mots parasites.
+    """
+
+    def __init__(self, fillers: Sequence[str] = FILLERS, language: str = "fr") -> None:
+        self.language = language
+        self.matcher = PhraseMatcher(fillers)
+        self.is_known = functools.lru_cache(maxsize=CORRECTION_CACHE_SIZE)(self._is_known)
+        self.correction = functools.lru_cache(maxsize=CORRECTION_CACHE_SIZE)(self._correction)
+
+    @property
+    def spell(self) -> Any:
+        return spell_checker(self.language)
+
+    def warm(self) -> None:
+        """Charge le dictionnaire tout de suite (démarrage d'un processus de calcul)."""
+        self.spell
+
+    def _is_known(self, word: str) -> bool:
+        return bool(self.spell.known([word]))
+
+    def _correction(self, word: str) -> Optional[str]:
+        return self.spell.correction(word)
+
+    def unknown(self, text: str) -> List[str]:
+        """Mots absents du dictionnaire, chacun une fois, dans l'ordre d'apparition."""
+        seen = dict.fromkeys(word for word, _, _ in tokenize(text) if not word.isdigit())
+        return [word for word in seen if not self.is_known(word)]
+
+    def corrections(self, text: str) -> Dict[str, Optional[str]]:
+        return {word: self.correction(word) for word in self.unknown(text)}
+
+    def fillers(self, text: str) -> List[Match]:
+        return self.matcher.find(text)
+
+    def filler_counts(self, text: str) -> Dict[str, int]:
+        return dict(Counter(match.expression for match in self.fillers(text)))
+
+
+def get_text_engine(fillers: Sequence[str] = FILLERS) -> TextEngine:
+    """Moteur partagé pour une liste de mots parasites (le dictionnaire est commun à tous)."""
+    return _text_engine(tuple(fillers))
+
+
+@functools.lru_cache(maxsize=None)
+def _text_engine(fillers: Tuple[str, ...]) -> TextEngine:
+    return TextEngine(fillers)
@@ -0,0 +1,228 @@
+import functools
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import wave
+from dataclasses import dataclass
+from typing import List, Optional, Sequence
+
+import streamlit as st
+
+DEFAULT_LANGUAGE = "fr-FR"
+DEFAULT_CACHE_PATH = os.environ.get("ELOQUENCE_TRANSCRIPTS_PATH", os.path.join("data", "transcriptions.sqlite"))
+# Dossier d'un modèle Vosk (ex: vosk-model-small-fr-0.22), pour transcrire hors ligne
+VOSK_MODEL_PATH = os.environ.get("ELOQUENCE_VOSK_MODEL", "")
+
+STATUS_OK = "ok"
+STATUS_UNINTELLIGIBLE = "incompris"
+STATUS_UNAVAILABLE = "indisponible"
+
+
+class EngineUnavailable(Exception):
+    """Moteur inutilisable pour le moment (réseau, modèle absent...) : on essaie le suivant."""
+
+
+class Unintelligible(Exception):
+    """Le moteur a bien traité l'audio mais n'y a reconnu aucune parole."""
+
+
+@dataclass
+class Transcript:
+    text: str
+    status: str
+    engine: str
+
+    @property
+    def ok(self) -> bool:
+        return self.status == STATUS_OK
+
+
+def file_digest(path: str) -> str:
+    """Empreinte du contenu d'un fichier audio (clé de cache, indépendante de son nom)."""
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class GoogleEngine:
+    """API Google Speech Recognition (en ligne), via ``speech_recognition``."""
+
+    name = "google"
+
+    def transcribe(self, path: str, language: str) -> str:
+        try:
+            import speech_recognition as sr
+        except ImportError:
+            raise EngineUnavailable("Module speech_recognition non installé")
+
+        recognizer = sr.Recognizer()
+        with sr.AudioFile(path) as source:
+            audio = recognizer.record(source)
+        try:
+            return recognizer.recognize_google(audio, language=language)
+        except sr.UnknownValueError:
+            raise Unintelligible()
+        except sr.RequestError as exc:
+            raise EngineUnavailable(f"Erreur API Google : {exc}")
+
+
+@functools.lru_cache(maxsize=2)
+def _vosk_model(path: str):
+    # Chargé une seule fois par processus : plusieurs secondes et des centaines de Mo
+    from vosk import Model
+
+    return Model(path)
+
+
+def _read_mono_pcm16(path: str):
+    """Échantillons PCM 16 bits mono d'un WAV (canaux moyennés) et fréquence d'échantillonnage."""
+    import numpy as np
+
+    with wave.open(path, "rb") as wf:
+        channels, width, rate = wf.getnchannels(), wf.getsampwidth(), wf.getframerate()
+        frames = wf.readframes(wf.getnframes())
+    if width == 2:
+        samples = np.frombuffer(frames, dtype="<i2").astype(np.float32)
+    elif width == 4:
+        samples = np.frombuffer(frames, dtype="<i4").astype(np.float32) / 65536
+    elif width == 1:
+        samples = (np.frombuffer(frames, dtype=np.uint8).astype(np.float32) - 128) * 256
+    else:
+        raise ValueError(f"Format WAV non géré ({8 * width} bits)")
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1)
+    return samples.astype("<i2"), rate
+
+
+class VoskEngine:
+    """Reconnaissance locale sur CPU (Vosk / Kaldi), sans réseau.
+
+    Le modèle français est à télécharger une fois (https://alphacephei.com/vosk/models)
+    et son dossier indiqué dans ``ELOQUENCE_VOSK_MODEL``.
+    """
+
+    name = "vosk"
+    chunk_frames = 8000
+
+    def __init__(self, model_path: str = VOSK_MODEL_PATH) -> None:
+        self.model_path = model_path
+
+    def transcribe(self, path: str, language: str) -> str:
+        if not self.model_path or not os.path.isdir(self.model_path):
+            raise EngineUnavailable("Modèle Vosk introuvable (variable ELOQUENCE_VOSK_MODEL)")
+        try:
+            from vosk import KaldiRecognizer
+        except ImportError:
+            raise EngineUnavailable("Module vosk non installé")
+        samples, rate = _read_mono_pcm16(path)
+        recognizer = KaldiRecognizer(_vosk_model(self.model_path), rate)
+        parts = []
+        for start in range(0, len(samples), self.chunk_frames):
+            if recognizer.AcceptWaveform(samples[start:start + self.chunk_frames].tobytes()):
+                parts.append(json.loads(recognizer.Result()).get("text", ""))
+        parts.append(json.loads(recognizer.FinalResult()).get("text", ""))
+        text = " ".join(p for p in parts if p)
+        if not text:
+            raise Unintelligible()
+        return text
+
+
+ENGINES = {"google": GoogleEngine, "vosk": VoskEngine}
+
+
+class TranscriptCache:
+    """Transcriptions déjà obtenues (SQLite), par empreinte du fichier audio et langue."""
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH) -> None:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS transcriptions (
+                empreinte TEXT NOT NULL,
+                langue TEXT NOT NULL,
+                texte TEXT NOT NULL,
+                statut TEXT NOT NULL,
+                moteur TEXT NOT NULL,
+                cree_le REAL NOT NULL,
+                PRIMARY KEY (empreinte, langue)
+            )
+            """
+        )
+
+    def get(self, digest: str, language: str) -> Optional[Transcript]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT texte, statut, moteur FROM transcriptions WHERE empreinte = ? AND langue = ?",
+                (digest, language),
+            ).fetchone()
+        return Transcript(*row) if row else None
+
+    def put(self, digest: str, language: str, transcript: Transcript) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO transcriptions VALUES (?, ?, ?, ?, ?, ?)",
+                (digest, language, transcript.text, transcript.status, transcript.engine, time.time()),
+            )
+
+
+class TranscriptionService:
+    """Transcription partagée par les pages d'évaluation.
+
+    Un même enregistrement n'est transcrit qu'une fois : le résultat est conservé sous
+    l'empreinte de son contenu, ce qui rend les réexécutions Streamlit instantanées.
+    Les moteurs sont essayés dans l'ordre ; un moteur indisponible (réseau coupé, modèle
+    absent) passe la main au suivant. Les échecs d'indisponibilité ne sont pas mis en cache.
+    """
+
+    def __init__(self, engines: Sequence, cache: Optional[TranscriptCache] = None, language: str = DEFAULT_LANGUAGE):
+        self.engines = list(engines)
+        self.cache = cache
+        self.language = language
+
+    def transcribe(self, path: str) -> Transcript:
+        digest = file_digest(path)
+        if self.cache is not None:
+            cached = self.cache.get(digest, self.language)
+            if cached is not None:
+                return cached
+        errors: List[str] = []
+        for engine in self.engines:
+            try:
+                transcript = Transcript(engine.transcribe(path, self.language), STATUS_OK, engine.name)
+            except Unintelligible:
+                transcript = Transcript("", STATUS_UNINTELLIGIBLE, engine.name)
+            except EngineUnavailable as exc:
+                errors.append(f"{engine.name} : {exc}")
+                continue
+            if self.cache is not None:
+                self.cache.put(digest, self.language, transcript)
+            return transcript
+        return Transcript(" ; ".join(errors), STATUS_UNAVAILABLE, "")
+
+
+def engines_from_env() -> List:
+    """Moteurs dans l'ordre de ``ELOQUENCE_ASR`` (ex: "vosk,google").
+
+    Par défaut, le moteur local passe en premier quand un modèle Vosk est configuré.
+    """
+    default = "vosk,google" if VOSK_MODEL_PATH else "google,vosk"
+    names = [n.strip().lower() for n in os.environ.get("ELOQUENCE_ASR", default).split(",") if n.strip()]
+    unknown = [n for n in names if n not in ENGINES]
+    if unknown:
+        raise ValueError(f"Moteur(s) de transcription inconnu(s) : {', '.join(unknown)}")
+    return [ENGINES[n]() for n in names]
+
+
+@st.cache_resource
+def get_transcription_service() -> TranscriptionService:
+    return TranscriptionService(engines_from_env(), TranscriptCache())
@@ -0,0 +1,207 @@
+import re
+import unicodedata
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Optional
+
+import pandas as pd
+
+_NON_ALNUM_RE = re.compile(r"[^0-9a-z]+")
+# Diacritiques combinants (blocs Unicode dédiés), retirés après décomposition NFKD
+_COMBINING_RE = re.compile("[\u0300-\u036f\u1ab0-\u1aff\u1dc0-\u1dff\u20d0-\u20ff\ufe20-\ufe2f]")
+_SPACES_RE = re.compile(r"\s+")
+
+# Abréviations courantes des voies et titres (forme repliée -> forme développée)
+ABBREVIATIONS = {
+    "all": "allée",
+    "av": "avenue",
+    "ave": "avenue",
+    "bd": "boulevard",
+    "bld": "boulevard",
+    "blvd": "boulevard",
+    "chem": "chemin",
+    "crs": "cours",
+    "fbg": "faubourg",
+    "fg": "faubourg",
+    "gal": "général",
+    "gen": "général",
+    "imp": "impasse",
+    "mal": "maréchal",
+    "pdt": "président",
+    "pl": "place",
+    "prom": "promenade",
+    "r": "rue",
+    "res": "résidence",
+    "rte": "route",
+    "sq": "square",
+    "st": "saint",
+    "ste": "sainte",
+}
+# Indices de répétition : "10B", "10 b" et "10 bis" désignent le même numéro
+NUMBER_SUFFIXES = {"b": "bis", "bis": "bis", "t": "ter", "ter": "ter", "q": "quater", "quater": "quater"}
+
+_LAST_POSTCODE_RE = re.compile(r"(?<!\d)(\d{5})(?!\d)(?!.*(?<!\d)\d{5}(?!\d))")
+
+# Motifs appliqués au texte brut (requête envoyée au fournisseur)
+_QUERY_ABBREV_RE = re.compile(
+    r"(?<![\w'’])(" + "|".join(sorted(ABBREVIATIONS, key=len, reverse=True)) + r")\.?(?![\w'’])", re.IGNORECASE
+)
+_QUERY_SUFFIX_RE = re.compile(r"\b(\d+)\s*(bis|ter|quater|b|t|q)\b", re.IGNORECASE)
+_QUERY_PUNCT_RE = re.compile(r"\s*([,;])(?:\s*[,;])*\s*")
+
+# Motifs appliqués à la forme repliée (clé canonique : [0-9a-z] et espaces uniquement)
+_KEY_DROP_RE = re.compile(r"\b\d{5}\b|\bcedex(?: \d{1,2})?\b|\bfrance\s*$")
+_KEY_POSTCODE_RE = re.compile(r"\b(\d{5})\b(?!.*\b\d{5}\b)")
+_KEY_SUFFIX_RE = re.compile(r"\b(\d+) ?(bis|ter|quater|b|t|q)\b")
+_KEY_ABBREV_RE = re.compile(r"\b(" + "|".join(sorted(ABBREVIATIONS, key=len, reverse=True)) + r")\b")
+_KEY_ABBREVIATIONS = {
+    abbr: _NON_ALNUM_RE.sub(" ", unicodedata.normalize("NFKD", full).encode("ascii", "ignore").decode())
+    for abbr, full in ABBREVIATIONS.items()
+}
+
+
+def fold_accents(text: str) -> str:
+    return _COMBINING_RE.sub("", unicodedata.normalize("NFKD", text))
+
+
+def _query_abbreviation(match: "re.Match[str]") -> str:
+    return ABBREVIATIONS[match.group(1).lower()]
+
+
+def _query_suffix(match: "re.Match[str]") -> str:
+    return f"{match.group(1)} {NUMBER_SUFFIXES[match.group(2).lower()]}"
+
+
+def _key_abbreviation(match: "re.Match[str]") -> str:
+    return _KEY_ABBREVIATIONS[match.group(1)]
+
+
+def _key_suffix(match: "re.Match[str]") -> str:
+    return f"{match.group(1)} {NUMBER_SUFFIXES[match.group(2)]}"
+
+
+def clean_query(address: str) -> str:
+    """Requête envoyée au fournisseur : abréviations développées, numéros "10B" -> "10 bis",
+    espaces et séparateurs répétés réduits. Accents, casse et code postal sont conservés.
+    """
+    text = _QUERY_ABBREV_RE.sub(_query_abbreviation, str(address))
+    text = _QUERY_SUFFIX_RE.sub(_query_suffix, text)
+    text = _QUERY_PUNCT_RE.sub(r"\1 ", text)
+    return _SPACES_RE.sub(" ", text).strip(" ,;")
+
+
+def extract_postcode(address: str) -> Optional[str]:
+    """Dernier code postal à 5 chiffres de l'adresse, s'il y en a un."""
+    match = _LAST_POSTCODE_RE.search(str(address))
+    return match.group(1) if match else None
+
+
+def canonical_key(address: str) -> str:
+    """Forme canonique d'une adresse, utilisée comme clé de cache et de dédoublonnage.
+
+    Casse, accents, ponctuation, abréviations, indices de répétition et espaces multiples
+    sont neutralisés, "cedex" et "France" sont retirés. Le dernier code postal est gardé,
+    placé en fin de clé : il distingue les communes homonymes et les mêmes voies de
+    villes différentes. "10 bis rue de la Paix  75002 PARIS" et "10B R. de la Paix, 75002
+    Paris" donnent la même clé, "1 rue de la Gare 69000" et "1 rue de la Gare 13001" non.
+    """
+    folded = _NON_ALNUM_RE.sub(" ", fold_accents(str(address)).casefold())
+    folded = _KEY_SUFFIX_RE.sub(_key_suffix, folded)
+    postcode = _KEY_POSTCODE_RE.search(folded)
+    folded = _KEY_DROP_RE.sub(" ", folded)
+    folded = _KEY_ABBREV_RE.sub(_key_abbreviation, folded)
+    if postcode:
+        folded += " " + postcode.group(1)
+    return _SPACES_RE.sub(" ", folded).strip()
+
+
+def canonical_keys(addresses: pd.Series) -> pd.Series:
+    """Équivalent vectorisé de ``canonical_key`` sur une colonne d'adresses."""
+    folded = (
+        addresses.astype("string")
+        .fillna("")
+        .str.normalize("NFKD")
+        .str.replace(_COMBINING_RE.pattern, "", regex=True)
+        .str.casefold()
+        .str.replace(_NON_ALNUM_RE, " ", regex=True)
+        .str.replace(_KEY_SUFFIX_RE, _key_suffix, regex=True)
+    )
+    postcode = folded.str.extract(_KEY_POSTCODE_RE, expand=False).fillna("")
+    return (
+        folded.str.replace(_KEY_DROP_RE, " ", regex=True)
+        .str.replace(_KEY_ABBREV_RE, _key_abbreviation, regex=True)
+        .str.cat(postcode, sep=" ")
+        .str.replace(_SPACES_RE, " ", regex=True)
+        .str.strip()
+    )
+
+
+def normalize_addresses(addresses: pd.Series) -> pd.DataFrame:
+    """Étape de normalisation d'un lot, avant tout accès au cache ou au fournisseur.
+
+    Renvoie, aligné sur ``addresses`` : ``requete`` (texte nettoyé à envoyer au
+    fournisseur), ``code_postal`` (``<NA>`` si absent) et ``cle`` (clé canonique).
+    Chaque texte distinct n'est traité qu'une fois.
+    """
+    codes, uniques = pd.factorize(addresses.astype("string").fillna(""))
+    text = pd.Series(uniques, dtype="string")
+    query = (
+        text.str.replace(_QUERY_ABBREV_RE, _query_abbreviation, regex=True)
+        .str.replace(_QUERY_SUFFIX_RE, _query_suffix, regex=True)
+        .str.replace(_QUERY_PUNCT_RE, r"\1 ", regex=True)
+        .str.replace(_SPACES_RE, " ", regex=True)
+        .str.strip(" ,;")
+    )
+    normalized = pd.DataFrame({
+        "requete": query,
+        "code_postal": text.str.extract(_LAST_POSTCODE_RE, expand=False),
+        "cle": canonical_keys(text),
+    })
+    return normalized.take(codes).set_index(addresses.index)
+
+
+@dataclass(frozen=True)
+class StructuredQuery:
+    """Adresse décomposée en champs, envoyée telle quelle aux fournisseurs qui acceptent
+    les requêtes structurées (paramètres ``street``, ``postalcode``, ``city`` et
+    ``country`` de Nominatim). ``str()`` en donne la forme texte.
+    """
+
+    street: str = ""
+    postalcode: str = ""
+    city: str = ""
+    country: str = ""
+
+    def as_dict(self) -> Dict[str, str]:
+        return {name: value for name, value in asdict(self).items() if value}
+
+    def __str__(self) -> str:
+        return " ".join(value for value in (self.street, self.postalcode, self.city, self.country) if value)
+
+
+def structured_key(query: StructuredQuery) -> str:
+    """Clé de cache d'une requête structurée : un champ canonique par position, séparés par "|".
+
+    Le "|" n'apparaît jamais dans une clé de texte libre : les deux espaces de clés ne se
+    recouvrent pas.
+    """
+    parts = [canonical_key(query.street), query.postalcode.strip(), canonical_key(query.city), canonical_key(query.country)]
+    return "|".join(parts) if any(parts) else ""
+
+
+def structured_keys(fields: pd.DataFrame) -> pd.Series:
+    """Équivalent vectorisé de ``structured_key`` (colonnes street, postalcode, city, country)."""
+    parts = [
+        canonical_keys(fields["street"]),
+        fields["postalcode"].astype("string").fillna("").str.strip(),
+        canonical_keys(fields["city"]),
+        canonical_keys(fields["country"]),
+    ]
+    keys = parts[0].str.cat(parts[1:], sep="|")
+    return keys.where(keys != "|||", "")
+
+
+def query_key(query: Any) -> str:
+    """Clé de cache d'une requête, texte libre ou structurée."""
+    if isinstance(query, StructuredQuery):
+        return structured_key(query)
+    return canonical_key(query)
@@ -1,77 +1,83 @@
+import os
 import time
-from typing import List, Optional, Tuple
+from typing import Dict, List, Optional, Tuple
 
 import pandas as pd
 import streamlit as st
-from geopy.extra.rate_limiter import RateLimiter
-from geopy.geocoders import Nominatim
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from export import MIME_TYPES, available_formats, export_results, read_results
+from geocoding import STRUCTURED_FIELDS, GeocodingService, default_address_columns, default_field_mapping
+from incremental import PreviousRun, RunDiff, diff_chunks
+from ingest import iter_chunks, read_preview
+from jobs import CHECKPOINT_EVERY, STATUS_FAILED, BatchJob, JobManager, job_id_for
+from mapview import build_deck, fit_view
+from metrics import start_metrics_server
+from scheduler import BATCH, INTERACTIVE, request_context
+from spatial import SpatialIndex
 
 APP_TITLE = "Géocodage d'adresses (latitudes & longitudes)"
 APP_DESC = (
     "Entrez une adresse unique ou importez un fichier Excel contenant une colonne d'adresses. "
     "L'application renvoie les latitudes et longitudes et affiche les résultats sur une carte."
 )
+PREVIEW_ROWS = 1000
+EXPORT_LABELS = {".csv": "CSV", ".xlsx": "Excel", ".parquet": "Parquet"}
+SPATIAL_INDEX_TTL = 300
+NO_COLUMN = "—"
 
 
 @st.cache_resource(show_spinner=False)
-def get_geocoder() -> Tuple[Nominatim, RateLimiter]:
-    geolocator = Nominatim(user_agent="as-tech-import-localisation-app")
-    geocode = RateLimiter(geolocator.geocode, min_delay_seconds=1, swallow_exceptions=False)
-    return geolocator, geocode
+def get_service() -> GeocodingService:
+    return GeocodingService()
+
+
+@st.cache_resource(show_spinner=False)
+def get_job_manager() -> JobManager:
+    return JobManager(get_service())
+
+
+@st.cache_resource(show_spinner=False)
+def start_metrics_endpoint() -> Optional[int]:
+    """Expose les métriques en HTTP si ``GEOCODE_METRICS_PORT`` est défini."""
+    port = os.environ.get("GEOCODE_METRICS_PORT")
+    if not port:
+        return None
+    start_metrics_server(get_service().metrics, int(port))
+    return int(port)
+
+
+def session_id() -> str:
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx is not None else "hors session"
 
 
-@st.cache_data(show_spinner=False)
 def geocode_single(address: str) -> Optional[Tuple[float, float, str]]:
     if not address or not address.strip():
         return None
-    _, geocode = get_geocoder()
-    location = geocode(address)
-    if location is None:
-        return None
-    return location.latitude, location.longitude, getattr(location, "address", "")
+    # Voie interactive : passe devant les lots en cours
+    with request_context(INTERACTIVE, session_id()):
+        return get_service().geocode(address).as_tuple()
 
 
-@st.cache_data(show_spinner=False)
 def geocode_batch(addresses: List[str]) -> pd.DataFrame:
-    results = []
-    _, geocode = get_geocoder()
-    for address in addresses:
-        if not address or not str(address).strip():
-            results.append({
-                "adresse": address,
-                "latitude": None,
-                "longitude": None,
-                "adresse_normalisee": None,
-                "statut": "adresse vide",
-            })
-            continue
-        try:
-            location = geocode(str(address))
-            if location is None:
-                results.append({
-                    "adresse": address,
-                    "latitude": None,
-                    "longitude": None,
-                    "adresse_normalisee": None,
-                    "statut": "introuvable",
-                })
-            else:
-                results.append({
-                    "adresse": address,
-                    "latitude": location.latitude,
-                    "longitude": location.longitude,
-                    "adresse_normalisee": getattr(location, "address", ""),
-                    "statut": "ok",
-                })
-        except Exception as exc:  # noqa: BLE001
-            results.append({
-                "adresse": address,
-                "latitude": None,
-                "longitude": None,
-                "adresse_normalisee": None,
-                "statut": f"erreur: {type(exc).__name__}",
-            })
-    return pd.DataFrame(results)
+    with request_context(BATCH, session_id()):
+        return get_service().geocode_batch(addresses)[0]
+
+
+@st.cache_resource(show_spinner=False, ttl=SPATIAL_INDEX_TTL)
+def get_spatial_index() -> SpatialIndex:
+    return SpatialIndex.from_cache(get_service().cache)
+
+
+def nearest_addresses(lat: float, lon: float, k: int = 5) -> pd.DataFrame:
+    """Adresses déjà géocodées les plus proches d'un point, sans appel réseau."""
+    return get_spatial_index().nearest(lat, lon, k)
+
+
+def addresses_within(lat: float, lon: float, radius_km: float) -> pd.DataFrame:
+    """Adresses déjà géocodées à moins de ``radius_km`` km d'un point, sans appel réseau."""
+    return get_spatial_index().within(lat, lon, radius_km)
 
 
 def ui_single():
@@ -93,111 +99,291 @@ def ui_single():
 def ui_batch():
     st.subheader("Import Excel (plusieurs adresses)")
     st.caption(
-        "Téléversez un fichier .xlsx. Vous pouvez soit fournir une colonne 'adresse', soit construire l'adresse à partir de plusieurs colonnes."
+        "Téléversez un fichier .xlsx ou .csv. Vous pouvez soit fournir une colonne 'adresse', soit construire l'adresse à partir de plusieurs colonnes."
     )
-    file = st.file_uploader("Choisir un fichier Excel .xlsx", type=["xlsx"], key="uploader_excel")
+    file = st.file_uploader("Choisir un fichier Excel .xlsx ou .csv", type=["xlsx", "csv"], key="uploader_excel")
     if file is not None:
         try:
-            df = pd.read_excel(file)
+            # Seules les premières lignes sont lues ici : le job relit le fichier par blocs
+            df = read_preview(file)
         except Exception as exc:  # noqa: BLE001
             st.error(f"Impossible de lire le fichier: {exc}")
             return
         cols_lower = {c.lower(): c for c in df.columns}
 
         st.markdown("### Construction de l'adresse")
-        st.caption(
-            "Sélectionnez les colonnes qui composent l'adresse et leur ordre. Les valeurs seront concaténées avec des espaces."
+        mode = st.radio(
+            "Mode",
+            ["Texte libre", "Requête structurée"],
+            horizontal=True,
+            key="address_mode",
+            help="En mode structuré, chaque colonne est associée à un champ (voie, code postal, ville...) "
+            "et envoyée séparément au fournisseur : moins de résultats ambigus qu'avec une adresse concaténée.",
         )
+        fields = None
+        if mode == "Requête structurée":
+            fields = ui_field_mapping(list(df.columns))
+            if not fields:
+                st.error("Associez au moins une colonne à un champ d'adresse.")
+                return
+            selected_cols = list(fields.values())
+        else:
+            st.caption(
+                "Sélectionnez les colonnes qui composent l'adresse et leur ordre. Les valeurs seront concaténées avec des espaces."
+            )
 
-        default_order = [c for c in df.columns if c.strip().lower() in ["n° rue", "n°", "numero", "numéro", "type de", "rue", "ville"]]
-        selected_cols = st.multiselect(
-            "Colonnes à concaténer (dans l'ordre)",
-            options=list(df.columns),
-            default=default_order or list(df.columns)[:4],
-            help="Exemples: N° rue, Type de, Rue, Ville",
-            key="address_cols",
-        )
+            default_order = default_address_columns(list(df.columns))
+            selected_cols = st.multiselect(
+                "Colonnes à concaténer (dans l'ordre)",
+                options=list(df.columns),
+                default=default_order or list(df.columns)[:4],
+                help="Exemples: N° rue, Type de, Rue, Ville",
+                key="address_cols",
+            )
+
+            if not selected_cols and "adresse" in cols_lower:
+                selected_cols = [cols_lower["adresse"]]
 
-        if not selected_cols and "adresse" in cols_lower:
-            selected_cols = [cols_lower["adresse"]]
+            if not selected_cols:
+                st.error("Sélectionnez au moins une colonne d'adresse ou fournissez une colonne 'adresse'.")
+                return
 
-        def build_full_address(row) -> str:
-            parts = []
-            for col in selected_cols:
-                if col in row and pd.notna(row[col]):
-                    val = str(row[col]).strip()
-                    if val:
-                        parts.append(val)
-            return " ".join(parts)
+        id_column = st.selectbox(
+            "Colonne identifiant (optionnel)",
+            [NO_COLUMN] + list(df.columns),
+            key="id_column",
+            help="Sert à apparier les lignes d'une version à l'autre du fichier. "
+            "Sans identifiant, les lignes sont comparées par position.",
+        )
+        id_column = None if id_column == NO_COLUMN else id_column
 
-        if not selected_cols:
-            st.error("Sélectionnez au moins une colonne d'adresse ou fournissez une colonne 'adresse'.")
+        manager = get_job_manager()
+        job_id = job_id_for(file.getvalue(), selected_cols, fields)
+        job = manager.get(job_id)
+        if job is not None and job.status == STATUS_FAILED:
+            st.error(f"Le géocodage a échoué : {job.error}")
+        if job is None or job.status == STATUS_FAILED:
+            previous = manager.previous_job(file.name, selected_cols, fields)
+            if previous is not None and previous != job_id:
+                diff = diff_with_previous(job_id, manager.fingerprints_path(previous), selected_cols, id_column, file)
+                st.info(
+                    f"Par rapport au dernier traitement de « {file.name} » : {diff.added} lignes ajoutées, "
+                    f"{diff.changed} modifiées, {diff.removed} supprimées, {diff.unchanged} inchangées. "
+                    "Seules les adresses nouvelles ou modifiées seront géocodées."
+                )
+            label = "Lancer le géocodage"
+            resumable = manager.checkpointed_rows(job_id)
+            if resumable:
+                st.info(
+                    f"Un géocodage interrompu de ce fichier a été retrouvé ({resumable} lignes déjà traitées). "
+                    "Il reprendra là où il s'était arrêté."
+                )
+                label = "Reprendre le géocodage"
+            if st.button(label, key="start_batch"):
+                # Le job tourne en arrière-plan : un rerun ou une fermeture d'onglet ne l'interrompt pas
+                job = manager.submit(job_id, file, file.name, selected_cols, fields, id_column)
+        if job is None or job.status == STATUS_FAILED:
+            return
+        if not job.finished:
+            ui_job_progress(job_id)
             return
+        show_batch_results(job)
+
+
+@st.cache_data(show_spinner="Comparaison avec la version précédente du fichier…", max_entries=8)
+def diff_with_previous(
+    job_id: str, previous_path: str, columns: List[str], id_column: Optional[str], _upload
+) -> RunDiff:
+    """Résumé ajoutées / modifiées / supprimées ; ``job_id`` identifie le contenu téléversé."""
+    try:
+        return diff_chunks(iter_chunks(_upload, CHECKPOINT_EVERY), columns, id_column, PreviousRun(previous_path))
+    finally:
+        _upload.seek(0)
+
+
+def ui_field_mapping(columns: List[str]) -> Dict[str, str]:
+    """Choix de la colonne de chaque champ structuré ; renvoie les champs renseignés."""
+    if not get_service().backend.supports_structured:
+        st.caption("Ce fournisseur n'accepte pas les requêtes structurées : les champs lui seront envoyés en texte.")
+    defaults = default_field_mapping(columns)
+    options = [NO_COLUMN] + columns
+    mapping = {}
+    for column, (field_name, label) in zip(st.columns(3) * 2, STRUCTURED_FIELDS.items()):
+        default = defaults.get(field_name)
+        choice = column.selectbox(
+            label, options, index=options.index(default) if default in options else 0, key=f"field_{field_name}"
+        )
+        if choice != NO_COLUMN:
+            mapping[field_name] = choice
+    return mapping
+
+
+@st.experimental_fragment(run_every=2)
+def ui_job_progress(job_id: str):
+    job = get_job_manager().get(job_id)
+    if job is None or job.finished:
+        st.rerun()
+        return
+    st.progress(job.progress)
+    resumed = f" (dont {job.rows_resumed} reprises du dernier checkpoint)" if job.rows_resumed else ""
+    total = job.rows_total if job.rows_total is not None else "?"
+    st.write(f"Géocodage {job.rows_done}/{total} lignes{resumed} — {format_eta(job)}")
+    st.caption(f"Job {job_id} — vous pouvez fermer cet onglet, le traitement continue.")
+
 
-        addresses = df.apply(build_full_address, axis=1).astype(str).fillna("").tolist()
-        original_cols_df = df[selected_cols].copy() if selected_cols else pd.DataFrame()
-        original_cols_df = original_cols_df.reset_index(drop=True)
-        original_cols_df["adresse_concatenee"] = pd.Series(addresses)
-
-        start = st.button("Lancer le géocodage", key="start_batch")
-        if start:
-            progress = st.progress(0)
-            status_area = st.empty()
-            batch_results = []
-            total = len(addresses)
-            geocoder_df = pd.DataFrame()
-            for idx, addr in enumerate(addresses, start=1):
-                status_area.write(f"Géocodage {idx}/{total}…")
-                # Traitement unitaire avec cache
-                res = geocode_single(addr)
-                if res is None:
-                    batch_results.append({
-                        "adresse": addr,
-                        "latitude": None,
-                        "longitude": None,
-                        "adresse_normalisee": None,
-                        "statut": "introuvable",
-                    })
-                else:
-                    lat, lon, normalized = res
-                    batch_results.append({
-                        "adresse": addr,
-                        "latitude": lat,
-                        "longitude": lon,
-                        "adresse_normalisee": normalized,
-                        "statut": "ok",
-                    })
-                progress.progress(min(idx / total, 1.0))
-            geocoder_df = pd.DataFrame(batch_results)
-            # Concaténer les colonnes d'origine avec les résultats
-            try:
-                final_df = pd.concat([original_cols_df, geocoder_df], axis=1)
-            except Exception:
-                final_df = geocoder_df.copy()
-
-            st.success("Terminé !")
-            st.dataframe(final_df, use_container_width=True)
-
-            valid_points = final_df.dropna(subset=["latitude", "longitude"])  # type: ignore[arg-type]
-            if not valid_points.empty:
-                st.map(valid_points.rename(columns={"latitude": "lat", "longitude": "lon"}), latitude="lat", longitude="lon")
-
-            csv = final_df.to_csv(index=False).encode("utf-8")
-            st.download_button("Télécharger CSV", data=csv, file_name="geocodage_resultats.csv", mime="text/csv")
-
-            try:
-                xlsx_buffer = pd.ExcelWriter("/tmp/geocodage_resultats.xlsx", engine="openpyxl")
-                final_df.to_excel(xlsx_buffer, index=False)
-                xlsx_buffer.close()
-                with open("/tmp/geocodage_resultats.xlsx", "rb") as f:
-                    st.download_button(
-                        "Télécharger Excel",
-                        data=f,
-                        file_name="geocodage_resultats.xlsx",
-                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                    )
-            except Exception:
-                pass
+def format_eta(job: BatchJob) -> str:
+    if not job.started_at or not job.rows_total:
+        return "estimation en cours…"
+    elapsed = time.time() - job.started_at
+    processed = job.progress * job.rows_total - job.rows_resumed
+    if elapsed < 1 or processed <= 0:
+        return "estimation en cours…"
+    rate = processed / elapsed
+    remaining = max(job.rows_total * (1 - job.progress), 0) / rate
+    minutes, seconds = divmod(int(remaining), 60)
+    hours, minutes = divmod(minutes, 60)
+    eta = f"{hours} h {minutes:02d} min" if hours else f"{minutes} min {seconds:02d} s"
+    return f"{rate:.1f} lignes/s, fin estimée dans {eta}"
+
+
+def show_batch_results(job: BatchJob):
+    st.success("Terminé !")
+    st.caption(
+        f"{job.rows_done} lignes, {job.distinct_queries} adresses distinctes : "
+        f"{job.saved_calls} appels réseau évités par le dédoublonnage."
+    )
+    if job.rows_reused:
+        st.caption(f"{job.rows_reused} lignes inchangées reprises du traitement précédent, sans géocodage.")
+    # Aperçu seulement : le fichier complet reste sur disque et est servi tel quel au téléchargement
+    st.dataframe(read_results(job.results_path, nrows=PREVIEW_ROWS), use_container_width=True)
+    if job.rows_done > PREVIEW_ROWS:
+        st.caption(f"Aperçu des {PREVIEW_ROWS} premières lignes sur {job.rows_done}.")
+
+    show_results_map(job.results_path)
+
+    columns = st.columns(len(available_formats()))
+    for column, fmt in zip(columns, available_formats()):
+        with column:
+            path = job.results_path if fmt == ".csv" else job.export_path(fmt)
+            if not os.path.exists(path):
+                # Export absent (job terminé avant cette version ou conversion en échec) :
+                # converti seulement à la demande, jamais à l'affichage de la page
+                if not st.button(f"Préparer l'export {EXPORT_LABELS[fmt]}", key=f"prepare{fmt}"):
+                    continue
+                try:
+                    with st.spinner(f"Préparation de l'export {fmt}…"):
+                        path = export_results(job.results_path, fmt)
+                except Exception as exc:  # noqa: BLE001
+                    st.error(f"Export {fmt} impossible: {exc}")
+                    continue
+            with open(path, "rb") as f:
+                st.download_button(
+                    f"Télécharger {EXPORT_LABELS[fmt]}",
+                    data=f,
+                    file_name=f"geocodage_resultats{fmt}",
+                    mime=MIME_TYPES[fmt],
+                    key=f"download{fmt}",
+                )
+
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def load_map_points(results_path: str, mtime: float) -> pd.DataFrame:
+    points = pd.read_csv(
+        results_path,
+        usecols=["latitude", "longitude", "statut"],
+        dtype={"latitude": "float64", "longitude": "float64", "statut": "category"},
+    )
+    return points.dropna(subset=["latitude", "longitude"]).reset_index(drop=True)
+
+
+def show_results_map(results_path: str):
+    points = load_map_points(results_path, os.path.getmtime(results_path))
+    if points.empty:
+        return
+    _, _, fitted_zoom = fit_view(points["latitude"].to_numpy(), points["longitude"].to_numpy())
+    zoom = st.slider(
+        "Niveau de zoom de la carte", min_value=1, max_value=18, value=fitted_zoom, key="map_zoom",
+        help="Au-delà d'un certain nombre de points, la maille d'agrégation suit ce niveau de zoom.",
+    )
+    deck, caption = build_deck(points, zoom)
+    st.pydeck_chart(deck)
+    st.caption(caption)
+
+
+def ui_proximity():
+    st.subheader("Recherche de proximité")
+    index = get_spatial_index()
+    st.caption(
+        f"Recherche locale parmi les {len(index)} adresses déjà géocodées (index rafraîchi toutes les "
+        f"{SPATIAL_INDEX_TTL // 60} minutes), sans appel au service de géocodage."
+    )
+    if not len(index):
+        st.info("Aucune adresse géocodée pour le moment.")
+        return
+    col_lat, col_lon = st.columns(2)
+    lat = col_lat.number_input("Latitude", min_value=-90.0, max_value=90.0, value=48.8566, format="%.6f")
+    lon = col_lon.number_input("Longitude", min_value=-180.0, max_value=180.0, value=2.3522, format="%.6f")
+    query = st.radio("Type de recherche", ["Plus proches", "Dans un rayon"], horizontal=True, key="proximity_mode")
+    if query == "Plus proches":
+        k = st.number_input("Nombre d'adresses", min_value=1, max_value=100, value=5)
+        results = nearest_addresses(lat, lon, int(k))
+    else:
+        radius = st.number_input("Rayon (km)", min_value=0.1, max_value=2000.0, value=5.0)
+        results = addresses_within(lat, lon, radius)
+        st.write(f"{len(results)} adresses à moins de {radius:g} km.")
+    st.dataframe(results, use_container_width=True)
+    if not results.empty:
+        points = pd.concat([
+            results[["latitude", "longitude"]],
+            pd.DataFrame({"latitude": [lat], "longitude": [lon]}),
+        ])
+        st.map(points.rename(columns={"latitude": "lat", "longitude": "lon"}), latitude="lat", longitude="lon")
+
+
+def ui_cache_stats():
+    stats = get_service().cache.stats()
+    st.markdown("---")
+    st.markdown("**Cache de géocodage**")
+    st.caption(
+        f"{int(stats['entries'])} adresses en cache — "
+        f"{int(stats['hits'])} hits / {int(stats['misses'])} misses "
+        f"({stats['hit_rate']:.0%})"
+    )
+
+
+def ui_metrics():
+    snapshot = get_service().metrics.snapshot()
+    with st.expander("Mesures du géocodage"):
+        timers = pd.DataFrame(snapshot["timers"]).T
+        timers.index = ["attente (débit/file)", "réseau", "analyse", "total"]
+        timers[["mean", "max"]] = (timers[["mean", "max"]] * 1000).round(1)
+        st.dataframe(
+            timers[["count", "mean", "max"]].rename(columns={"count": "appels", "mean": "moy. (ms)", "max": "max (ms)"}),
+            use_container_width=True,
+        )
+        counters = snapshot["counters"]
+        st.caption(
+            f"Cache : {counters.get('cache_hits', 0)} hits / {counters.get('cache_misses', 0)} misses — "
+            f"référentiel local : {counters.get('gazetteer_hits', 0)} hits"
+        )
+        st.caption(f"Taux d'erreur : {snapshot['error_rate']:.1%}")
+        if snapshot["errors"]:
+            st.write({"erreurs": snapshot["errors"], "relances": snapshot["retries"]})
+        port = start_metrics_endpoint()
+        if port:
+            st.caption(f"Export : http://localhost:{port}/metrics (Prometheus) et /metrics.json")
+
+
+def ui_gazetteer_stats():
+    gazetteer = get_service().gazetteer
+    if gazetteer is None:
+        return
+    stats = gazetteer.stats()
+    st.markdown("**Référentiel local**")
+    st.caption(
+        f"{int(stats['entries'])} adresses — {int(stats['hits'])} trouvées sans appel réseau "
+        f"({stats['hit_rate']:.0%})"
+    )
 
 
 def main():
@@ -207,18 +393,38 @@ def main():
 
     with st.sidebar:
         st.markdown("**Mode**")
-        mode = st.radio("Choisir le mode", ["Adresse unique", "Fichier Excel"], label_visibility="visible", key="mode_radio")
+        mode = st.radio(
+            "Choisir le mode",
+            ["Adresse unique", "Fichier Excel", "Recherche de proximité"],
+            label_visibility="visible",
+            key="mode_radio",
+        )
         st.markdown("---")
         st.markdown(
             "Cette application utilise le service Nominatim d'OpenStreetMap. "
             "Veuillez saisir des adresses complètes pour de meilleurs résultats."
         )
+        st.caption(f"Géocodeur : {get_service().backend.settings.label}")
+        throttle = get_service().backend.throttle
+        if throttle.current_rps != throttle.target_rps:
+            st.caption(f"Débit réduit à {throttle.current_rps:.2f} req/s suite à des refus (429) du service.")
+        queued = get_service().backend.scheduler.queued()
+        if any(queued.values()):
+            st.caption(f"En attente du géocodeur : {queued[BATCH]} requêtes de lots, {queued[INTERACTIVE]} interactives.")
+        ui_cache_stats()
+        ui_gazetteer_stats()
 
     if mode == "Adresse unique":
         ui_single()
+    elif mode == "Recherche de proximité":
+        ui_proximity()
     else:
         ui_batch()
 
+    # Affiché après le traitement de la page pour inclure les appels de ce rerun
+    with st.sidebar:
+        ui_metrics()
+
 
 if __name__ == "__main__":
     main()
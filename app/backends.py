@@ -0,0 +1,191 @@
+import contextvars
+import functools
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Any, Iterator, Optional, Sequence, Tuple
+from urllib.parse import urlparse
+
+from addresses import StructuredQuery
+from metrics import GeocodeMetrics
+from retry import PERMANENT, RATE_LIMITED, AdaptiveThrottle, RetryPolicy, classify
+from scheduler import Scheduler
+
+# Classes de geopy.geocoders, importées à la création du client
+PROVIDERS = {"nominatim": "Nominatim", "photon": "Photon"}
+# Fournisseurs qui acceptent une requête structurée (dict de champs) ; les autres reçoivent le texte
+STRUCTURED_PROVIDERS = {"nominatim"}
+
+
+@dataclass
+class BackendSettings:
+    """Paramètres d'un fournisseur de géocodage.
+
+    ``base_url`` vide = service public du fournisseur. Pour une instance auto-hébergée
+    (ex: ``http://localhost:8080``), on peut augmenter ``max_concurrency`` et
+    ``requests_per_second`` ; ``requests_per_second <= 0`` désactive la limitation.
+    """
+
+    provider: str = "nominatim"
+    base_url: str = ""
+    user_agent: str = "as-tech-import-localisation-app"
+    max_concurrency: int = 1
+    requests_per_second: float = 1.0
+    timeout: float = 10.0
+    max_retries: int = 2
+    retry_backoff: float = 1.0
+    retry_max_delay: float = 30.0
+    retry_queue_rounds: int = 2
+    retry_queue_delay: float = 5.0
+
+    @classmethod
+    def from_env(cls) -> "BackendSettings":
+        defaults = cls()
+        return cls(
+            provider=os.environ.get("GEOCODER_PROVIDER", defaults.provider).lower(),
+            base_url=os.environ.get("GEOCODER_URL", defaults.base_url),
+            user_agent=os.environ.get("GEOCODER_USER_AGENT", defaults.user_agent),
+            max_concurrency=int(os.environ.get("GEOCODER_CONCURRENCY", defaults.max_concurrency)),
+            requests_per_second=float(os.environ.get("GEOCODER_RPS", defaults.requests_per_second)),
+            timeout=float(os.environ.get("GEOCODER_TIMEOUT", defaults.timeout)),
+            max_retries=int(os.environ.get("GEOCODER_RETRIES", defaults.max_retries)),
+            retry_backoff=float(os.environ.get("GEOCODER_RETRY_BACKOFF", defaults.retry_backoff)),
+            retry_max_delay=float(os.environ.get("GEOCODER_RETRY_MAX_DELAY", defaults.retry_max_delay)),
+            retry_queue_rounds=int(os.environ.get("GEOCODER_RETRY_QUEUE_ROUNDS", defaults.retry_queue_rounds)),
+            retry_queue_delay=float(os.environ.get("GEOCODER_RETRY_QUEUE_DELAY", defaults.retry_queue_delay)),
+        )
+
+    @property
+    def retry_policy(self) -> RetryPolicy:
+        return RetryPolicy(self.max_retries + 1, self.retry_backoff, self.retry_max_delay)
+
+    @property
+    def label(self) -> str:
+        target = self.base_url or "service public"
+        return f"{self.provider} ({target}) — {self.max_concurrency} en parallèle, {self.requests_per_second:g} req/s"
+
+
+class GeocoderBackend:
+    def __init__(self, settings: BackendSettings, metrics: Optional[GeocodeMetrics] = None) -> None:
+        if settings.provider not in PROVIDERS:
+            raise ValueError(f"Fournisseur de géocodage inconnu: {settings.provider}")
+        self.settings = settings
+        self.metrics = metrics if metrics is not None else GeocodeMetrics()
+        self.throttle = AdaptiveThrottle(settings.requests_per_second)
+        self.retry_policy = settings.retry_policy
+        self.scheduler = Scheduler(settings.max_concurrency, self.throttle)
+        self._local = threading.local()
+        self._geocoder: Any = None
+        self._geocoder_lock = threading.Lock()
+
+    @property
+    def geocoder(self) -> Any:
+        """Client geopy, créé au premier appel : l'application démarre sans importer geopy."""
+        if self._geocoder is None:
+            with self._geocoder_lock:
+                if self._geocoder is None:
+                    geocoder = self._build_geocoder(self.settings)
+                    self._instrument_adapter(geocoder)
+                    self._geocoder = geocoder
+        return self._geocoder
+
+    def _instrument_adapter(self, geocoder: Any) -> None:
+        """Chronomètre la requête HTTP seule, pour la distinguer de l'analyse faite par geopy."""
+        adapter = geocoder.adapter
+        get_json = adapter.get_json
+        local = self._local
+
+        def timed_get_json(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return get_json(*args, **kwargs)
+            finally:
+                local.network = getattr(local, "network", 0.0) + time.perf_counter() - started
+
+        adapter.get_json = timed_get_json
+
+    @staticmethod
+    def _build_geocoder(settings: BackendSettings) -> Any:
+        from geopy import geocoders
+        from geopy.adapters import RequestsAdapter
+
+        kwargs = {"user_agent": settings.user_agent, "timeout": settings.timeout}
+        if RequestsAdapter.is_available:
+            # Pas de relance cachée dans urllib3 (qui rejoue les 429/503 avec Retry-After) :
+            # toutes les relances passent par notre politique ; un pool assez grand pour la concurrence
+            kwargs["adapter_factory"] = functools.partial(
+                RequestsAdapter, max_retries=0, pool_maxsize=max(settings.max_concurrency, 10)
+            )
+        if settings.base_url:
+            url = urlparse(settings.base_url)
+            kwargs["scheme"] = url.scheme or "http"
+            kwargs["domain"] = (url.netloc + url.path).rstrip("/")
+        return getattr(geocoders, PROVIDERS[settings.provider])(**kwargs)
+
+    def _provider_query(self, query: Any) -> Any:
+        if isinstance(query, StructuredQuery):
+            return query.as_dict() if self.settings.provider in STRUCTURED_PROVIDERS else str(query)
+        return query
+
+    @property
+    def supports_structured(self) -> bool:
+        return self.settings.provider in STRUCTURED_PROVIDERS
+
+    def geocode(self, query: Any) -> Any:
+        """Géocode une requête en respectant l'ordonnanceur (concurrence, priorité, débit)
+        et la politique de relance.
+
+        Les erreurs transitoires sont relancées avec backoff exponentiel et jitter ; un 429
+        ralentit en plus le débit de tout le processus. Les erreurs définitives et celles
+        qui persistent après ``max_retries`` relances sont propagées.
+        """
+        attempt = 0
+        while True:
+            queued = time.perf_counter()
+            with self.scheduler.slot():
+                started = time.perf_counter()
+                self._local.network = 0.0
+                try:
+                    location = self.geocoder.geocode(self._provider_query(query))
+                except Exception as exc:
+                    kind = classify(exc)
+                    if kind == RATE_LIMITED:
+                        self.throttle.on_rate_limited()
+                    attempt += 1
+                    if kind == PERMANENT or attempt >= self.retry_policy.max_attempts:
+                        self.metrics.record_error(exc)
+                        raise
+                    self.metrics.record_retry(exc)
+                    delay = self.retry_policy.delay(attempt - 1, exc)
+                else:
+                    self.throttle.on_success()
+                    elapsed = time.perf_counter() - started
+                    network = min(self._local.network, elapsed)
+                    self.metrics.observe_call(started - queued, network, elapsed - network)
+                    return location
+            time.sleep(delay)
+
+    def iter_geocode(self, queries: Sequence[Any]) -> Iterator[Tuple[int, Any, Optional[Exception]]]:
+        """Géocode plusieurs requêtes et renvoie ``(indice, location, erreur)`` au fil de l'eau.
+
+        Avec ``max_concurrency > 1`` les requêtes partent en parallèle dans un pool de
+        threads et les résultats arrivent dans l'ordre d'achèvement.
+        """
+        if self.settings.max_concurrency <= 1:
+            for index, query in enumerate(queries):
+                try:
+                    yield index, self.geocode(query), None
+                except Exception as exc:  # noqa: BLE001
+                    yield index, None, exc
+            return
+        with ThreadPoolExecutor(max_workers=self.settings.max_concurrency) as pool:
+            # Chaque tâche emporte le contexte de l'appelant (voie et demandeur de l'ordonnanceur)
+            futures = {
+                pool.submit(contextvars.copy_context().run, self.geocode, query): index
+                for index, query in enumerate(queries)
+            }
+            for future in as_completed(futures):
+                exc = future.exception()
+                yield futures[future], (None if exc else future.result()), exc
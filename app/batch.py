@@ -0,0 +1,61 @@
+from dataclasses import dataclass, field
+from typing import Any, List, Sequence, TypeVar
+
+import numpy as np
+import pandas as pd
+
+from addresses import normalize_addresses
+
+T = TypeVar("T")
+
+
+@dataclass
+class BatchPlan:
+    """Plan de géocodage d'un lot : une requête par clé canonique distincte.
+
+    ``unique_addresses[i]`` est la requête (texte nettoyé par ``normalize_addresses`` ou
+    ``StructuredQuery``) de la première ligne rencontrée pour la clé ``unique_keys[i]`` ;
+    ``row_to_unique[r]`` (tableau d'entiers) donne l'indice unique de la ligne ``r``
+    (``-1`` pour une adresse vide).
+    """
+
+    unique_keys: List[str] = field(default_factory=list)
+    unique_addresses: List[Any] = field(default_factory=list)
+    row_to_unique: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.intp))
+
+    @property
+    def total_rows(self) -> int:
+        return len(self.row_to_unique)
+
+    @property
+    def empty_rows(self) -> int:
+        return int((self.row_to_unique < 0).sum())
+
+    @property
+    def saved_calls(self) -> int:
+        """Nombre d'appels réseau évités grâce au dédoublonnage."""
+        return self.total_rows - self.empty_rows - len(self.unique_keys)
+
+    def scatter(self, unique_results: Sequence[T], empty: T) -> List[T]:
+        """Redistribue les résultats uniques dans l'ordre des lignes d'origine."""
+        return [unique_results[i] if i >= 0 else empty for i in self.row_to_unique]
+
+
+def plan_from_keys(keys: pd.Series, queries: pd.Series) -> BatchPlan:
+    """Plan d'un lot dont les clés canoniques (``""`` = ligne vide) sont déjà calculées ;
+    ``queries[r]`` est la requête à envoyer pour la ligne ``r``.
+    """
+    keys = keys.where(keys != "")
+    # factorize numérote les clés dans l'ordre de première apparition, -1 pour les vides
+    codes, uniques = pd.factorize(keys)
+    first = (keys.notna() & ~keys.duplicated()).to_numpy()
+    return BatchPlan(
+        unique_keys=list(uniques),
+        unique_addresses=queries[first].tolist(),
+        row_to_unique=codes,
+    )
+
+
+def plan_batch(addresses: Sequence[str]) -> BatchPlan:
+    normalized = normalize_addresses(pd.Series(list(addresses), dtype=object))
+    return plan_from_keys(normalized["cle"], normalized["requete"])
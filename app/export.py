@@ -0,0 +1,107 @@
+import importlib.util
+import os
+from collections import defaultdict
+from typing import Any, Dict, Optional
+
+import pandas as pd
+
+SUPPORTED_OUTPUTS = (".csv", ".xlsx", ".parquet")
+MIME_TYPES: Dict[str, str] = {
+    ".csv": "text/csv",
+    ".xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    ".parquet": "application/vnd.apache.parquet",
+}
+# Types d'un fichier de résultats relu : tout en texte ("06000" reste "06000", mêmes types
+# dans tous les blocs), sauf les coordonnées
+RESULT_DTYPES = defaultdict(lambda: str, {"latitude": "float64", "longitude": "float64"})
+
+
+def available_formats():
+    """Formats d'export disponibles (Parquet seulement si pyarrow est installé)."""
+    if importlib.util.find_spec("pyarrow") is None:
+        return [ext for ext in SUPPORTED_OUTPUTS if ext != ".parquet"]
+    return list(SUPPORTED_OUTPUTS)
+
+
+class ChunkWriter:
+    """Écrit un DataFrame bloc par bloc dans un fichier .csv, .xlsx ou .parquet.
+
+    Le premier bloc fixe les colonnes ; seules les lignes du bloc courant sont en mémoire
+    (sauf pour .xlsx où openpyxl en mode ``write_only`` écrit au ``close``).
+    """
+
+    def __init__(self, path: str, fmt: Optional[str] = None) -> None:
+        self.path = path
+        self.format = fmt or os.path.splitext(path)[1].lower()
+        if self.format not in SUPPORTED_OUTPUTS:
+            raise ValueError(f"Format de sortie non supporté: {self.format or path} (attendu: {', '.join(SUPPORTED_OUTPUTS)})")
+        self.rows_written = 0
+        self._handle: Optional[Any] = None
+        self._sheet: Optional[Any] = None
+
+    def write(self, chunk: pd.DataFrame) -> None:
+        if self.format == ".csv":
+            chunk.to_csv(self.path, mode="w" if self._handle is None else "a", header=self._handle is None, index=False)
+            self._handle = True
+        elif self.format == ".parquet":
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if self._handle is None:
+                # Une colonne entièrement vide dans le premier bloc serait typée "null" : on la force en
+                # texte ; les catégories (statut) varient d'un bloc à l'autre : on garde leurs valeurs
+                schema = pa.schema([
+                    f.with_type(pa.string()) if pa.types.is_null(f.type)
+                    else f.with_type(f.type.value_type) if pa.types.is_dictionary(f.type)
+                    else f
+                    for f in table.schema
+                ])
+                self._handle = pq.ParquetWriter(self.path, schema)
+            self._handle.write_table(table.cast(self._handle.schema))
+        else:
+            if self._handle is None:
+                from openpyxl import Workbook
+
+                self._handle = Workbook(write_only=True)
+                self._sheet = self._handle.create_sheet()
+                self._sheet.append([str(c) for c in chunk.columns])
+            for row in chunk.itertuples(index=False, name=None):
+                self._sheet.append([None if pd.isna(v) else v for v in row])
+        self.rows_written += len(chunk)
+
+    def close(self) -> None:
+        if self.format == ".parquet" and self._handle is not None:
+            self._handle.close()
+        elif self.format == ".xlsx" and self._handle is not None:
+            self._handle.save(self.path)
+        self._handle = None
+
+    def __enter__(self) -> "ChunkWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def read_results(path: str, **kwargs: Any) -> Any:
+    """Relit un fichier de résultats CSV avec ses types (``chunksize``/``nrows`` acceptés)."""
+    return pd.read_csv(path, dtype=RESULT_DTYPES, keep_default_na=True, **kwargs)
+
+
+def export_results(results_csv: str, fmt: str, chunk_size: int = 5000) -> str:
+    """Convertit un fichier de résultats CSV vers ``fmt`` bloc par bloc, à côté de la source.
+
+    Le fichier converti est réutilisé tant que la source n'a pas changé ; l'écriture
+    passe par un fichier temporaire pour ne jamais servir un export incomplet.
+    """
+    if fmt == ".csv":
+        return results_csv
+    target = os.path.splitext(results_csv)[0] + fmt
+    if os.path.exists(target) and os.path.getmtime(target) >= os.path.getmtime(results_csv):
+        return target
+    with ChunkWriter(target + ".tmp", fmt) as writer:
+        for chunk in read_results(results_csv, chunksize=chunk_size):
+            writer.write(chunk)
+    os.replace(target + ".tmp", target)
+    return target
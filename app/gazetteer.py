@@ -0,0 +1,105 @@
+import os
+import threading
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from addresses import canonical_keys
+from geocache import CacheEntry
+
+GAZETTEER_PATHS = os.environ.get("GEOCODE_GAZETTEER_PATH", "")
+BAN_COLUMNS = ["numero", "rep", "nom_voie", "code_postal", "nom_commune", "lon", "lat"]
+
+
+def _hash_keys(keys: pd.Series) -> np.ndarray:
+    return pd.util.hash_array(keys.to_numpy(dtype=object))
+
+
+class Gazetteer:
+    """Référentiel d'adresses local (extrait BAN) pour géocoder sans appel réseau.
+
+    Chaque adresse est indexée sous sa clé canonique avec et sans code postal
+    ("10 rue de la paix paris 75002" et "10 rue de la paix paris") : une adresse qui
+    porte un code postal n'est résolue que dans la commune correspondante. L'index ne garde
+    que des empreintes 64 bits triées, les coordonnées en float32 et les libellés sous
+    forme de catégories, ce qui permet de charger plusieurs départements en mémoire.
+    """
+
+    def __init__(self, frame: pd.DataFrame) -> None:
+        frame = frame.dropna(subset=["nom_voie", "lat", "lon"]).reset_index(drop=True)
+        number = frame["numero"].fillna("").astype(str) + frame["rep"].fillna("").astype(str)
+        street = number.str.cat(frame["nom_voie"].astype(str), sep=" ")
+        city = frame["nom_commune"].fillna("").astype(str)
+        postcode = frame["code_postal"].fillna("").astype(str)
+        with_postcode = street + " " + postcode + " " + city
+        keys = canonical_keys(street + " " + city)
+
+        hashes = np.concatenate([_hash_keys(canonical_keys(with_postcode)), _hash_keys(keys)])
+        rows = np.concatenate([np.arange(len(frame)), np.arange(len(frame))]).astype(np.int32)
+        order = np.argsort(hashes, kind="stable")
+        self._hashes = hashes[order]
+        self._rows = rows[order]
+        self._lat = frame["lat"].astype(np.float32).to_numpy()
+        self._lon = frame["lon"].astype(np.float32).to_numpy()
+        self._labels = pd.Categorical(with_postcode.str.strip())
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_ban_csv(cls, paths: Sequence[str], chunk_size: int = 200_000) -> "Gazetteer":
+        """Charge un ou plusieurs fichiers "adresses-XX.csv(.gz)" de la Base Adresse Nationale."""
+        frames: List[pd.DataFrame] = []
+        for path in paths:
+            for chunk in pd.read_csv(
+                path,
+                sep=";",
+                usecols=BAN_COLUMNS,
+                dtype={"numero": str, "rep": str, "nom_voie": str, "code_postal": str, "nom_commune": str},
+                chunksize=chunk_size,
+            ):
+                frames.append(chunk)
+        return cls(pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=BAN_COLUMNS))
+
+    @classmethod
+    def from_env(cls) -> Optional["Gazetteer"]:
+        paths = [p for p in GAZETTEER_PATHS.split(os.pathsep) if p]
+        return cls.from_ban_csv(paths) if paths else None
+
+    def __len__(self) -> int:
+        return len(self._lat)
+
+    def lookup_many(self, addresses: Sequence[str]) -> List[Optional[CacheEntry]]:
+        """Résout un lot d'adresses ; ``None`` pour celles absentes du référentiel."""
+        if not len(addresses):
+            return []
+        # La clé canonique porte déjà le code postal quand l'adresse en a un
+        hashes = _hash_keys(canonical_keys(pd.Series(list(addresses), dtype=object)))
+        positions = np.searchsorted(self._hashes, hashes)
+        positions = np.minimum(positions, max(len(self._hashes) - 1, 0))
+        found = (self._hashes[positions] == hashes) if len(self._hashes) else np.zeros(len(hashes), dtype=bool)
+        results: List[Optional[CacheEntry]] = [None] * len(hashes)
+        labels = self._labels
+        for i in np.flatnonzero(found):
+            row = self._rows[positions[i]]
+            # float32 : ~1 m de précision, on arrondit pour ne pas afficher de fausses décimales
+            lat, lon = round(float(self._lat[row]), 6), round(float(self._lon[row]), 6)
+            results[i] = CacheEntry(lat, lon, str(labels[row]), "ok")
+        hits = int(found.sum())
+        with self._lock:
+            self.hits += hits
+            self.misses += len(hashes) - hits
+        return results
+
+    def lookup(self, address: str) -> Optional[CacheEntry]:
+        return self.lookup_many([address])[0]
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,148 @@
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+import pandas as pd
+
+from addresses import query_key
+
+DEFAULT_CACHE_PATH = os.environ.get("GEOCODE_CACHE_PATH", os.path.join("data", "geocode_cache.sqlite"))
+DEFAULT_TTL_SECONDS = int(os.environ.get("GEOCODE_CACHE_TTL", str(90 * 24 * 3600)))
+DEFAULT_MAX_ENTRIES = int(os.environ.get("GEOCODE_CACHE_MAX_ENTRIES", "500000"))
+
+
+@dataclass
+class CacheEntry:
+    latitude: Optional[float]
+    longitude: Optional[float]
+    adresse_normalisee: Optional[str]
+    statut: str
+
+    def as_tuple(self) -> Optional[Tuple[float, float, str]]:
+        if self.statut != "ok":
+            return None
+        return self.latitude, self.longitude, self.adresse_normalisee or ""
+
+
+class GeocodeCache:
+    """Cache persistant (SQLite) des résultats de géocodage.
+
+    Les entrées expirent après ``ttl_seconds`` et le nombre d'entrées est borné
+    par ``max_entries`` : au-delà, les entrées les moins récemment lues sont évincées.
+    Les adresses introuvables sont aussi mémorisées pour ne pas être redemandées.
+    """
+
+    def __init__(
+        self,
+        path: str = DEFAULT_CACHE_PATH,
+        ttl_seconds: int = DEFAULT_TTL_SECONDS,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+    ) -> None:
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._counters: Dict[str, int] = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0, "writes": 0}
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS geocode_cache (
+                cle TEXT PRIMARY KEY,
+                latitude REAL,
+                longitude REAL,
+                adresse_normalisee TEXT,
+                statut TEXT NOT NULL,
+                cree_le REAL NOT NULL,
+                lu_le REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_geocode_cache_lu_le ON geocode_cache (lu_le)")
+        self._size = self._conn.execute("SELECT COUNT(*) FROM geocode_cache").fetchone()[0]
+
+    def get(self, address: Any) -> Optional[CacheEntry]:
+        key = query_key(address)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT latitude, longitude, adresse_normalisee, statut, cree_le FROM geocode_cache WHERE cle = ?",
+                (key,),
+            ).fetchone()
+            if row is None:
+                self._counters["misses"] += 1
+                return None
+            if self.ttl_seconds and now - row[4] > self.ttl_seconds:
+                self._conn.execute("DELETE FROM geocode_cache WHERE cle = ?", (key,))
+                self._size -= 1
+                self._counters["expired"] += 1
+                self._counters["misses"] += 1
+                return None
+            self._conn.execute("UPDATE geocode_cache SET lu_le = ? WHERE cle = ?", (now, key))
+            self._counters["hits"] += 1
+        return CacheEntry(row[0], row[1], row[2], row[3])
+
+    def put(self, address: Any, entry: CacheEntry) -> None:
+        key = query_key(address)
+        now = time.time()
+        with self._lock:
+            existed = self._conn.execute("SELECT 1 FROM geocode_cache WHERE cle = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO geocode_cache VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, entry.latitude, entry.longitude, entry.adresse_normalisee, entry.statut, now, now),
+            )
+            self._counters["writes"] += 1
+            if not existed:
+                self._size += 1
+            if self.max_entries and self._size > self.max_entries:
+                self._evict(self._size - self.max_entries)
+
+    def _evict(self, count: int) -> None:
+        self._conn.execute(
+            "DELETE FROM geocode_cache WHERE cle IN (SELECT cle FROM geocode_cache ORDER BY lu_le ASC LIMIT ?)",
+            (count,),
+        )
+        self._size -= count
+        self._counters["evictions"] += count
+
+    def purge_expired(self) -> int:
+        if not self.ttl_seconds:
+            return 0
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM geocode_cache WHERE cree_le < ?", (time.time() - self.ttl_seconds,)
+            )
+            self._size -= cursor.rowcount
+            self._counters["expired"] += cursor.rowcount
+        return cursor.rowcount
+
+    def points(self) -> pd.DataFrame:
+        """Coordonnées des adresses trouvées et encore valides (pour l'index spatial)."""
+        min_created = time.time() - self.ttl_seconds if self.ttl_seconds else 0
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT latitude, longitude, adresse_normalisee FROM geocode_cache "
+                "WHERE statut = 'ok' AND cree_le >= ?",
+                (min_created,),
+            ).fetchall()
+        return pd.DataFrame(rows, columns=["latitude", "longitude", "adresse_normalisee"])
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM geocode_cache")
+            self._size = 0
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            stats: Dict[str, float] = dict(self._counters)
+            stats["entries"] = self._size
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
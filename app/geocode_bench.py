@@ -0,0 +1,301 @@
+"""Banc d'essai du pipeline de géocodage, sans réseau.
+
+Exemple :
+    python app/geocode_bench.py --rows 1000 10000 100000 --duplicates 0.5 --latency 0.02 --output bench.json
+    python app/geocode_bench.py --rows 10000 --output bench_new.json --compare bench.json
+
+Un classeur synthétique est généré pour chaque taille, puis chaque étape (lecture,
+concaténation des adresses, dédoublonnage, géocodage à froid puis avec cache, job
+complet, exports) est mesurée : débit, pic mémoire (tracemalloc), taux de hit du cache
+et appels au fournisseur. Le fournisseur est simulé localement avec une latence et un
+taux d'échec configurables. Les résultats sont écrits en JSON pour comparer les versions.
+"""
+import argparse
+import hashlib
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+from geopy.exc import GeocoderTimedOut
+from geopy.location import Location
+
+from backends import BackendSettings, GeocoderBackend
+from batch import plan_batch
+from export import ChunkWriter, available_formats, export_results
+from geocache import GeocodeCache
+from geocoding import GeocodingService, build_addresses
+from ingest import iter_chunks
+from jobs import BatchJob
+
+ADDRESS_COLUMNS = ["N° rue", "Type de", "Rue", "Ville"]
+STREET_TYPES = ["rue", "avenue", "boulevard", "place", "allée", "chemin", "impasse", "quai"]
+STREET_NAMES = [
+    "de la Paix", "Victor Hugo", "des Lilas", "Jean Jaurès", "de l'Église", "Pasteur", "du Moulin",
+    "des Écoles", "de la Gare", "Gambetta", "du Général de Gaulle", "des Peupliers", "de la République",
+    "Voltaire", "des Tilleuls", "du Château", "Saint-Martin", "des Acacias", "de Verdun", "Émile Zola",
+]
+CITIES = [
+    "Paris", "Lyon", "Marseille", "Toulouse", "Nice", "Nantes", "Strasbourg", "Montpellier", "Bordeaux",
+    "Lille", "Rennes", "Reims", "Saint-Étienne", "Le Havre", "Toulon", "Grenoble", "Dijon", "Angers",
+    "Nîmes", "Villeurbanne", "Clermont-Ferrand", "Le Mans", "Aix-en-Provence", "Brest", "Tours",
+]
+MAX_NUMBER = 400
+
+
+class _FakeAdapter:
+    def __init__(self, latency: float) -> None:
+        self.latency = latency
+
+    def get_json(self, *args, **kwargs) -> Dict[str, Any]:
+        if self.latency:
+            time.sleep(self.latency)
+        return {}
+
+
+class FakeGeocoder:
+    """Fournisseur simulé : coordonnées déduites de la requête, latence et échecs aléatoires.
+
+    Les échecs sont des ``GeocoderTimedOut`` (transitoires), relancés par la politique
+    de relance comme le seraient ceux d'un vrai service.
+    """
+
+    def __init__(self, latency: float = 0.0, failure_rate: float = 0.0, seed: int = 0) -> None:
+        self.adapter = _FakeAdapter(latency)
+        self.failure_rate = failure_rate
+        self._random = random.Random(seed)
+
+    def geocode(self, query: Any) -> Optional[Location]:
+        self.adapter.get_json()
+        if self.failure_rate and self._random.random() < self.failure_rate:
+            raise GeocoderTimedOut("Délai simulé dépassé")
+        digest = int.from_bytes(hashlib.blake2b(str(query).encode("utf-8"), digest_size=8).digest(), "big")
+        latitude = 42.5 + (digest % 100_000) / 100_000 * 8.5
+        longitude = -4.5 + (digest // 100_000 % 100_000) / 100_000 * 12.5
+        return Location(str(query), (latitude, longitude), {})
+
+
+class FakeBackend(GeocoderBackend):
+    def __init__(self, settings: BackendSettings, latency: float, failure_rate: float) -> None:
+        self._fake = FakeGeocoder(latency, failure_rate)
+        super().__init__(settings)
+
+    def _build_geocoder(self, settings: BackendSettings) -> FakeGeocoder:
+        return self._fake
+
+
+def fake_service(directory: str, args: argparse.Namespace) -> GeocodingService:
+    settings = BackendSettings(
+        max_concurrency=args.concurrency,
+        requests_per_second=0,
+        retry_backoff=args.latency,
+        retry_queue_delay=0,
+    )
+    backend = FakeBackend(settings, args.latency, args.failure_rate)
+    cache = GeocodeCache(os.path.join(directory, "cache.sqlite"), max_entries=10_000_000)
+    return GeocodingService(cache, backend, gazetteer=None)
+
+
+def synthetic_frame(rows: int, duplicate_ratio: float, seed: int = 0) -> pd.DataFrame:
+    """``rows`` lignes dont une part ``duplicate_ratio`` répète des adresses déjà présentes."""
+    rng = np.random.default_rng(seed)
+    combinations = MAX_NUMBER * len(STREET_TYPES) * len(STREET_NAMES) * len(CITIES)
+    distinct = int(np.clip(round(rows * (1 - duplicate_ratio)), 1, rows))
+    if distinct > combinations:
+        raise ValueError(f"Au plus {combinations} adresses distinctes peuvent être générées.")
+    codes = rng.choice(combinations, size=distinct, replace=False)
+    picks = np.concatenate([np.arange(distinct), rng.integers(0, distinct, rows - distinct)])
+    codes = codes[rng.permutation(picks)]
+    codes, number = np.divmod(codes, MAX_NUMBER)
+    codes, street_type = np.divmod(codes, len(STREET_TYPES))
+    city, street_name = np.divmod(codes, len(STREET_NAMES))
+    return pd.DataFrame({
+        "N° rue": number + 1,
+        "Type de": np.asarray(STREET_TYPES, dtype=object)[street_type],
+        "Rue": np.asarray(STREET_NAMES, dtype=object)[street_name],
+        "Ville": np.asarray(CITIES, dtype=object)[city],
+    })
+
+
+def write_workbook(df: pd.DataFrame, path: str, chunk_size: int = 50_000) -> None:
+    with ChunkWriter(path) as writer:
+        for start in range(0, len(df), chunk_size):
+            writer.write(df.iloc[start:start + chunk_size])
+
+
+class Recorder:
+    """Mesure les étapes : durée, pic mémoire Python et évolution des compteurs du service."""
+
+    def __init__(self, rows: int) -> None:
+        self.rows = rows
+        self.results: List[Dict[str, Any]] = []
+
+    @contextmanager
+    def stage(self, name: str, service: Optional[GeocodingService] = None) -> Iterator[None]:
+        before = service.metrics.snapshot() if service is not None else None
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        started = time.perf_counter()
+        yield
+        seconds = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1] - baseline
+        result: Dict[str, Any] = {
+            "stage": name,
+            "rows": self.rows,
+            "seconds": round(seconds, 4),
+            "rows_per_s": round(self.rows / seconds, 1) if seconds else None,
+            "peak_mb": round(max(peak, 0) / 2**20, 2),
+        }
+        if service is not None:
+            result.update(_service_delta(before, service.metrics.snapshot()))
+        self.results.append(result)
+        print(
+            f"{self.rows:>9} lignes  {name:<16} {seconds:8.2f} s  "
+            f"{result['rows_per_s'] or 0:>11.0f} l/s  {result['peak_mb']:>8.1f} Mo",
+            file=sys.stderr,
+        )
+
+
+def _service_delta(before: Dict[str, Any], after: Dict[str, Any]) -> Dict[str, Any]:
+    def counter(snapshot, name):
+        return snapshot["counters"].get(name, 0)
+
+    hits = counter(after, "cache_hits") - counter(before, "cache_hits")
+    misses = counter(after, "cache_misses") - counter(before, "cache_misses")
+    return {
+        "cache_hits": hits,
+        "cache_misses": misses,
+        "cache_hit_rate": round(hits / (hits + misses), 4) if hits + misses else None,
+        "provider_calls": after["timers"]["total"]["count"] - before["timers"]["total"]["count"],
+        "provider_errors": sum(after["errors"].values()) - sum(before["errors"].values()),
+        "provider_retries": sum(after["retries"].values()) - sum(before["retries"].values()),
+    }
+
+
+def bench_size(rows: int, args: argparse.Namespace, directory: str) -> List[Dict[str, Any]]:
+    recorder = Recorder(rows)
+    source = os.path.join(directory, f"adresses_{rows}{args.format}")
+    with recorder.stage("generate"):
+        write_workbook(synthetic_frame(rows, args.duplicates, args.seed), source)
+
+    with recorder.stage("ingest"):
+        df = pd.concat(iter_chunks(source, args.chunk_size), ignore_index=True)
+    with recorder.stage("build_addresses"):
+        addresses = build_addresses(df, ADDRESS_COLUMNS)
+    with recorder.stage("plan_batch"):
+        plan_batch(addresses)
+
+    service = fake_service(os.path.join(directory, f"batch_{rows}"), args)
+    with recorder.stage("geocode_cold", service):
+        service.geocode_batch(addresses)
+    with recorder.stage("geocode_warm", service):
+        service.geocode_batch(addresses)
+    del df, addresses
+
+    # Chemin de l'interface : job par blocs avec un cache vide
+    job_dir = os.path.join(directory, f"job_{rows}")
+    os.makedirs(job_dir)
+    service = fake_service(job_dir, args)
+    job = BatchJob(f"bench{rows}", source, ADDRESS_COLUMNS, service, job_dir, args.chunk_size)
+    with recorder.stage("job", service):
+        job.run()
+    if job.error:
+        raise RuntimeError(f"Job en échec : {job.error}")
+
+    for fmt in available_formats():
+        if fmt == ".csv" or (fmt == ".xlsx" and rows > args.max_xlsx_rows):
+            continue
+        # Le job a déjà écrit ses exports au fil des blocs (compris dans l'étape "job") :
+        # on les retire pour mesurer la conversion complète depuis le CSV
+        if os.path.exists(job.export_path(fmt)):
+            os.remove(job.export_path(fmt))
+        with recorder.stage(f"export{fmt.replace('.', '_')}"):
+            export_results(job.results_path, fmt, args.chunk_size)
+    return recorder.results
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True, cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: List[Dict[str, Any]], baseline_path: str) -> None:
+    """Affiche l'évolution du débit et de la mémoire par rapport à un précédent fichier de résultats."""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {(r["rows"], r["stage"]): r for r in json.load(f)["results"]}
+    print(f"Comparaison avec {baseline_path} :", file=sys.stderr)
+    for result in results:
+        previous = baseline.get((result["rows"], result["stage"]))
+        if previous is None or not previous["rows_per_s"] or not result["rows_per_s"]:
+            continue
+        speed = result["rows_per_s"] / previous["rows_per_s"] - 1
+        memory = result["peak_mb"] - previous["peak_mb"]
+        print(
+            f"{result['rows']:>9} lignes  {result['stage']:<16} débit {speed:+7.1%}  mémoire {memory:+8.1f} Mo",
+            file=sys.stderr,
+        )
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Mesure le pipeline de géocodage avec un fournisseur simulé.")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10_000, 100_000], help="Tailles de lots à mesurer")
+    parser.add_argument("--duplicates", type=float, default=0.5, help="Part de lignes en double (défaut: 0.5)")
+    parser.add_argument("--latency", type=float, default=0.0, help="Latence simulée par appel, en secondes")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Probabilité d'échec transitoire par appel")
+    parser.add_argument("--concurrency", type=int, default=8, help="Appels simultanés au fournisseur simulé")
+    parser.add_argument("--format", choices=[".xlsx", ".csv"], default=".xlsx", help="Format du classeur généré")
+    parser.add_argument("--chunk-size", type=int, default=5000, help="Taille des blocs de lecture et d'export")
+    parser.add_argument("--max-xlsx-rows", type=int, default=200_000, help="Pas d'export Excel au-delà (trop lent)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="bench_geocodage.json", help="Fichier JSON des résultats")
+    parser.add_argument("--compare", help="Résultats précédents (JSON) à comparer")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    results: List[Dict[str, Any]] = []
+    tracemalloc.start()
+    try:
+        with tempfile.TemporaryDirectory(prefix="geocode_bench_") as directory:
+            for rows in args.rows:
+                results.extend(bench_size(rows, args, directory))
+    except (ValueError, RuntimeError, OSError) as exc:
+        print(f"Erreur: {exc}", file=sys.stderr)
+        return 1
+    finally:
+        tracemalloc.stop()
+    report = {
+        "revision": git_revision(),
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "platform": platform.platform(),
+        "parameters": {k: v for k, v in vars(args).items() if k not in ("output", "compare")},
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"Résultats écrits dans {args.output}", file=sys.stderr)
+    if args.compare:
+        compare(results, args.compare)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
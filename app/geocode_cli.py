@@ -0,0 +1,82 @@
+"""Géocodage en masse sans navigateur.
+
+Exemple :
+    python app/geocode_cli.py clients.xlsx clients_geocodes.csv --columns "N° rue" "Type de" "Rue" "Ville"
+
+Le fichier d'entrée (.xlsx, .csv, .parquet) est traité par blocs et les résultats sont
+écrits au fur et à mesure (.csv, .xlsx, .parquet). Le cache et le fournisseur de
+géocodage sont les mêmes que ceux de l'application Streamlit.
+"""
+import argparse
+import sys
+import time
+from typing import List, Optional
+
+from export import ChunkWriter
+from geocoding import GeocodingService, default_address_columns
+from ingest import iter_chunks
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Géocode un fichier d'adresses par blocs.")
+    parser.add_argument("input", help="Fichier d'entrée (.xlsx, .csv, .parquet)")
+    parser.add_argument("output", help="Fichier de sortie (.csv, .xlsx, .parquet)")
+    parser.add_argument(
+        "--columns",
+        nargs="+",
+        help="Colonnes à concaténer (dans l'ordre) pour former l'adresse. "
+        "Par défaut : N° rue, Type de, Rue, Ville si présentes, sinon 'adresse'.",
+    )
+    parser.add_argument("--chunk-size", type=int, default=5000, help="Nombre de lignes par bloc (défaut: 5000)")
+    parser.add_argument("--metrics-json", help="Écrit les mesures du géocodage (temps, erreurs, cache) dans ce fichier JSON")
+    return parser.parse_args(argv)
+
+
+def run(
+    input_path: str,
+    output_path: str,
+    columns: Optional[List[str]] = None,
+    chunk_size: int = 5000,
+    metrics_path: Optional[str] = None,
+) -> int:
+    """Géocode ``input_path`` vers ``output_path`` et renvoie le nombre de lignes écrites."""
+    service = GeocodingService()
+    started = time.monotonic()
+    saved_calls = 0
+    with ChunkWriter(output_path) as writer:
+        for chunk in iter_chunks(input_path, chunk_size):
+            if columns is None:
+                columns = default_address_columns(list(chunk.columns))
+                if not columns:
+                    raise ValueError("Aucune colonne d'adresse trouvée : précisez --columns.")
+            missing = [c for c in columns if c not in chunk.columns]
+            if missing:
+                raise ValueError(f"Colonnes absentes du fichier: {', '.join(missing)}")
+            final_df, plan = service.geocode_frame(chunk, columns)
+            writer.write(final_df)
+            saved_calls += plan.saved_calls
+            print(
+                f"{writer.rows_written} lignes géocodées ({time.monotonic() - started:.0f} s, "
+                f"{saved_calls} appels évités)",
+                file=sys.stderr,
+            )
+    stats = service.cache.stats()
+    print(f"Cache : {int(stats['hits'])} hits / {int(stats['misses'])} misses", file=sys.stderr)
+    if metrics_path:
+        with open(metrics_path, "w", encoding="utf-8") as f:
+            f.write(service.metrics.to_json())
+    return writer.rows_written
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    try:
+        run(args.input, args.output, args.columns, args.chunk_size, args.metrics_json)
+    except (ValueError, OSError) as exc:
+        print(f"Erreur: {exc}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,358 @@
+import sys
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Generator, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from addresses import StructuredQuery, clean_query, normalize_addresses, structured_keys
+from backends import BackendSettings, GeocoderBackend
+from batch import BatchPlan, plan_batch, plan_from_keys
+from gazetteer import Gazetteer
+from geocache import CacheEntry, GeocodeCache
+from retry import is_retryable
+
+EMPTY_ENTRY = CacheEntry(None, None, None, "adresse vide")
+DEFAULT_ADDRESS_COLUMNS = ["n° rue", "n°", "numero", "numéro", "type de", "rue", "ville"]
+
+# Champs d'une requête structurée et noms de colonnes reconnus pour chacun
+STRUCTURED_FIELDS = {
+    "numero": "N° de voie",
+    "type_voie": "Type de voie",
+    "voie": "Nom de voie",
+    "code_postal": "Code postal",
+    "ville": "Ville",
+    "pays": "Pays",
+}
+DEFAULT_FIELD_COLUMNS = {
+    "numero": ["n° rue", "n°", "numero", "numéro", "n° de voie"],
+    "type_voie": ["type de", "type de voie", "type voie"],
+    "voie": ["rue", "voie", "nom de voie", "nom voie"],
+    "code_postal": ["code postal", "cp", "code_postal"],
+    "ville": ["ville", "commune"],
+    "pays": ["pays"],
+}
+
+ProgressCallback = Callable[[int, int], None]
+
+
+def default_address_columns(columns: Sequence[str]) -> List[str]:
+    """Colonnes d'adresse reconnues ("N° rue", "Type de", "Rue", "Ville"...) ou, à défaut, "adresse"."""
+    detected = [c for c in columns if str(c).strip().lower() in DEFAULT_ADDRESS_COLUMNS]
+    if detected:
+        return detected
+    return [c for c in columns if str(c).strip().lower() == "adresse"]
+
+
+def default_field_mapping(columns: Sequence[str]) -> Dict[str, str]:
+    """Colonne reconnue pour chaque champ structuré (champs sans colonne reconnue omis)."""
+    by_name = {str(c).strip().lower(): c for c in columns}
+    mapping = {}
+    for field_name, candidates in DEFAULT_FIELD_COLUMNS.items():
+        found = next((by_name[name] for name in candidates if name in by_name), None)
+        if found is not None:
+            mapping[field_name] = found
+    return mapping
+
+
+def _column_text(series: pd.Series) -> pd.Series:
+    if pd.api.types.is_float_dtype(series):
+        values = series.dropna()
+        # Une colonne de numéros avec des cases vides est lue en float : 10.0 -> "10"
+        if (values == values.round()).all():
+            series = series.astype("Int64")
+    return series.astype("string").str.strip().fillna("")
+
+
+def _join_text(parts: Sequence[pd.Series]) -> pd.Series:
+    joined = parts[0]
+    for text in parts[1:]:
+        separator = pd.Series(" ", index=joined.index, dtype="string").where((joined != "") & (text != ""), "")
+        joined = joined + separator + text
+    return joined
+
+
+def build_addresses(df: pd.DataFrame, columns: Sequence[str]) -> List[str]:
+    """Concatène les colonnes d'adresse (valeurs vides ignorées), par opérations sur colonnes."""
+    if df.empty:
+        return []
+    return _join_text([_column_text(df[col]) for col in columns]).astype(object).tolist()
+
+
+def row_fingerprints(df: pd.DataFrame, columns: Sequence[str]) -> np.ndarray:
+    """Empreinte 64 bits des colonnes d'adresse de chaque ligne, sur les valeurs telles
+    qu'elles sont concaténées (10.0 et 10 donnent la même empreinte).
+    """
+    texts = pd.DataFrame({position: _column_text(df[col]) for position, col in enumerate(columns)}, index=df.index)
+    return pd.util.hash_pandas_object(texts, index=False).to_numpy()
+
+
+def frame_addresses(df: pd.DataFrame, columns: Sequence[str], fields: Optional[Mapping[str, str]] = None) -> List[str]:
+    """Adresse texte de chaque ligne, telle qu'elle figure dans les résultats."""
+    if fields:
+        return [str(query) for query in build_structured_queries(df, fields)[0]] if not df.empty else []
+    return build_addresses(df, columns)
+
+
+def build_structured_queries(df: pd.DataFrame, fields: Mapping[str, str]) -> Tuple[pd.Series, pd.Series]:
+    """Requêtes structurées d'un tableau et leurs clés de cache, à partir de ``fields``
+    (champ de ``STRUCTURED_FIELDS`` -> colonne).
+
+    Numéro, type et nom de voie forment ``street`` (abréviations développées comme pour
+    le texte libre) ; un code postal lu comme nombre retrouve son zéro initial (1000 -> "01000").
+    """
+    empty = pd.Series("", index=df.index, dtype="string")
+
+    def text(field_name: str) -> pd.Series:
+        column = fields.get(field_name)
+        return _column_text(df[column]) if column else empty
+
+    street = normalize_addresses(_join_text([text("numero"), text("type_voie"), text("voie")]))["requete"]
+    postcode = text("code_postal")
+    postcode = postcode.where(~postcode.str.fullmatch(r"\d{4}"), "0" + postcode)
+    parts = pd.DataFrame({"street": street, "postalcode": postcode, "city": text("ville"), "country": text("pays")})
+    queries = pd.Series(
+        [StructuredQuery(*row) for row in parts.astype(object).itertuples(index=False, name=None)],
+        index=df.index,
+        dtype=object,
+    )
+    return queries, structured_keys(parts)
+
+
+def location_to_entry(location) -> CacheEntry:
+    if location is None:
+        return CacheEntry(None, None, None, "introuvable")
+    return CacheEntry(location.latitude, location.longitude, getattr(location, "address", ""), "ok")
+
+
+# Liste des échecs transitoires mis de côté pour une relance en fin de job (voir ``defer_retries``)
+_deferred: ContextVar[Optional[List[Any]]] = ContextVar("geocode_deferred_retries", default=None)
+
+
+@contextmanager
+def defer_retries(pending: List[Any]) -> Iterator[List[Any]]:
+    """Dans ce bloc, ``iter_geocode`` ne relance pas lui-même les échecs transitoires : ils
+    sont rendus en erreur et leurs requêtes ajoutées à ``pending``, pour être retentées
+    une seule fois à la fin d'un job traité par blocs (``GeocodingService.retry_queue``).
+    """
+    token = _deferred.set(pending)
+    try:
+        yield pending
+    finally:
+        _deferred.reset(token)
+
+
+class ResultColumns:
+    """Résultats d'un lot en colonnes typées préallouées, une case par requête distincte.
+
+    Coordonnées en ``float64`` (NaN si absentes), statut en codes entiers d'une
+    catégorie, adresses normalisées internées : aucun objet par ligne n'est conservé.
+    La dernière case porte le résultat des lignes vides, si bien que les indices de
+    ``BatchPlan.row_to_unique`` (``-1`` pour une ligne vide) s'appliquent directement.
+    """
+
+    def __init__(self, size: int) -> None:
+        self.latitude = np.full(size + 1, np.nan)
+        self.longitude = np.full(size + 1, np.nan)
+        self.adresse_normalisee = np.full(size + 1, None, dtype=object)
+        self.statut = np.zeros(size + 1, dtype=np.int32)
+        self._statuses: Dict[str, int] = {}
+        # Case 0 des statuts = "adresse vide" : valeur des cases jamais remplies
+        self.set(size, EMPTY_ENTRY)
+
+    def set(self, index: int, entry: CacheEntry) -> None:
+        self.latitude[index] = np.nan if entry.latitude is None else entry.latitude
+        self.longitude[index] = np.nan if entry.longitude is None else entry.longitude
+        self.adresse_normalisee[index] = (
+            None if entry.adresse_normalisee is None else sys.intern(str(entry.adresse_normalisee))
+        )
+        self.statut[index] = self._statuses.setdefault(entry.statut, len(self._statuses))
+
+    def to_frame(self, addresses: Sequence[str], rows: np.ndarray) -> pd.DataFrame:
+        """Résultats ligne à ligne : ``rows[r]`` est la case de la ligne ``r``."""
+        return pd.DataFrame({
+            "adresse": np.asarray(addresses, dtype=object),
+            "latitude": self.latitude.take(rows),
+            "longitude": self.longitude.take(rows),
+            "adresse_normalisee": self.adresse_normalisee.take(rows),
+            "statut": pd.Categorical.from_codes(self.statut.take(rows), categories=list(self._statuses)),
+        })
+
+
+def results_to_frame(addresses: List[str], entries: List[CacheEntry]) -> pd.DataFrame:
+    columns = ResultColumns(len(entries))
+    for index, entry in enumerate(entries):
+        columns.set(index, entry)
+    return columns.to_frame(addresses, np.arange(len(entries)))
+
+
+class GeocodingService:
+    """Référentiel local + cache persistant + fournisseur de géocodage, sans dépendance à Streamlit.
+
+    Utilisé à la fois par l'interface (``app.py``) et par la ligne de commande
+    (``geocode_cli.py``) : les deux partagent le même fichier de cache et la même
+    configuration de fournisseur (variables d'environnement).
+    """
+
+    def __init__(
+        self,
+        cache: Optional[GeocodeCache] = None,
+        backend: Optional[GeocoderBackend] = None,
+        gazetteer: Optional[Gazetteer] = None,
+    ) -> None:
+        self.cache = cache if cache is not None else GeocodeCache()
+        self.backend = backend if backend is not None else GeocoderBackend(BackendSettings.from_env())
+        self.gazetteer = gazetteer if gazetteer is not None else Gazetteer.from_env()
+        self.metrics = self.backend.metrics
+
+    def geocode(self, address: str) -> CacheEntry:
+        """Point d'entrée unique : référentiel local, puis cache persistant, puis le fournisseur.
+
+        Les exceptions du géocodeur sont propagées et ne sont pas mises en cache.
+        """
+        if self.gazetteer is not None:
+            entry = self.gazetteer.lookup(address)
+            if entry is not None:
+                self.metrics.incr("gazetteer_hits")
+                return entry
+        entry = self.cache.get(address)
+        if entry is not None:
+            self.metrics.incr("cache_hits")
+            return entry
+        self.metrics.incr("cache_misses")
+        entry = location_to_entry(self.backend.geocode(clean_query(address)))
+        self.cache.put(address, entry)
+        return entry
+
+    def iter_geocode(self, addresses: Sequence[Any]) -> Iterator[Tuple[int, CacheEntry]]:
+        """Version lot de ``geocode`` : les adresses absentes du référentiel et du cache
+        partent ensemble vers le fournisseur, en parallèle si sa configuration le permet.
+        Les adresses sont des textes ou des ``StructuredQuery``.
+
+        Les échecs transitoires sont retentés en fin d'appel (``retry_queue_rounds``), sauf
+        dans un bloc ``defer_retries`` : ils sont alors rendus en erreur et mis de côté.
+        """
+        if self.gazetteer is not None:
+            local = self.gazetteer.lookup_many([str(address) for address in addresses])
+        else:
+            local = [None] * len(addresses)
+        misses = []
+        for index, address in enumerate(addresses):
+            if local[index] is not None:
+                self.metrics.incr("gazetteer_hits")
+                yield index, local[index]
+                continue
+            entry = self.cache.get(address)
+            if entry is None:
+                self.metrics.incr("cache_misses")
+                misses.append(index)
+            else:
+                self.metrics.incr("cache_hits")
+                yield index, entry
+        rounds = self.backend.settings.retry_queue_rounds
+        deferred = _deferred.get() if rounds else None
+        if deferred is not None:
+            yield from self._geocode_misses(addresses, misses, final=True, deferred=deferred)
+            return
+        pending = yield from self._geocode_misses(addresses, misses, final=rounds == 0)
+        yield from self._retry_rounds(addresses, pending)
+
+    def retry_queue(self, addresses: Sequence[Any]) -> Iterator[Tuple[int, CacheEntry]]:
+        """Relance en fin de job des échecs transitoires mis de côté par ``defer_retries``.
+
+        Une adresse entre-temps en cache (résolue par un autre lot, ou avant une
+        interruption de ce job) n'est pas redemandée.
+        """
+        pending = []
+        for index, address in enumerate(addresses):
+            entry = self.cache.get(address)
+            if entry is None:
+                pending.append(index)
+            else:
+                yield index, entry
+        yield from self._retry_rounds(addresses, pending)
+
+    def _retry_rounds(self, addresses: Sequence[Any], pending: List[int]) -> Iterator[Tuple[int, CacheEntry]]:
+        # Les échecs transitoires sont retentés après une pause, en ``retry_queue_rounds`` passes
+        rounds = self.backend.settings.retry_queue_rounds
+        for round_number in range(1, rounds + 1):
+            if not pending:
+                break
+            self.metrics.incr("retry_queue", len(pending))
+            time.sleep(self.backend.settings.retry_queue_delay)
+            pending = yield from self._geocode_misses(addresses, pending, final=round_number == rounds)
+
+    def _geocode_misses(
+        self, addresses: Sequence[Any], indices: List[int], final: bool, deferred: Optional[List[Any]] = None
+    ) -> Generator[Tuple[int, CacheEntry], None, List[int]]:
+        """Interroge le fournisseur pour ``indices`` ; renvoie les indices à retenter.
+
+        Avec ``deferred``, les échecs transitoires rendus en erreur y sont aussi ajoutés.
+        """
+        retry_later: List[int] = []
+        queries = [addresses[index] for index in indices]
+        for position, location, exc in self.backend.iter_geocode(queries):
+            index = indices[position]
+            if exc is not None:
+                if is_retryable(exc):
+                    if not final:
+                        retry_later.append(index)
+                        continue
+                    if deferred is not None:
+                        deferred.append(addresses[index])
+                yield index, CacheEntry(None, None, None, f"erreur: {type(exc).__name__}")
+                continue
+            entry = location_to_entry(location)
+            self.cache.put(addresses[index], entry)
+            yield index, entry
+        return retry_later
+
+    def geocode_batch(
+        self, addresses: List[str], on_progress: Optional[ProgressCallback] = None
+    ) -> Tuple[pd.DataFrame, BatchPlan]:
+        plan = plan_batch(addresses)
+        return self._geocode_plan(plan, list(addresses), on_progress), plan
+
+    def _geocode_plan(
+        self, plan: BatchPlan, addresses: List[str], on_progress: Optional[ProgressCallback]
+    ) -> pd.DataFrame:
+        total = len(plan.unique_addresses)
+        columns = ResultColumns(total)
+        for done, (index, entry) in enumerate(self.iter_geocode(plan.unique_addresses), start=1):
+            columns.set(index, entry)
+            if on_progress is not None:
+                on_progress(done, total)
+        return columns.to_frame(addresses, plan.row_to_unique)
+
+    def geocode_frame(
+        self, df: pd.DataFrame, columns: Sequence[str], on_progress: Optional[ProgressCallback] = None
+    ) -> Tuple[pd.DataFrame, BatchPlan]:
+        addresses = build_addresses(df, columns)
+        geocoder_df, plan = self.geocode_batch(addresses, on_progress)
+        return combine_with_original(df, columns, addresses, geocoder_df), plan
+
+    def geocode_structured(
+        self, df: pd.DataFrame, fields: Mapping[str, str], on_progress: Optional[ProgressCallback] = None
+    ) -> Tuple[pd.DataFrame, BatchPlan]:
+        """Comme ``geocode_frame``, mais chaque ligne part en requête structurée
+        (``fields`` : champ de ``STRUCTURED_FIELDS`` -> colonne) et est mise en cache
+        sous sa clé structurée.
+        """
+        if df.empty:
+            return combine_with_original(df, list(fields.values()), [], results_to_frame([], [])), BatchPlan()
+        queries, keys = build_structured_queries(df, fields)
+        plan = plan_from_keys(keys, queries)
+        addresses = [str(query) for query in queries]
+        geocoder_df = self._geocode_plan(plan, addresses, on_progress)
+        return combine_with_original(df, list(fields.values()), addresses, geocoder_df), plan
+
+
+def combine_with_original(
+    df: pd.DataFrame, columns: Sequence[str], addresses: List[str], geocoder_df: pd.DataFrame
+) -> pd.DataFrame:
+    """Colonnes d'adresse d'origine + adresse concaténée + résultats du géocodage."""
+    original_cols_df = df[list(columns)].reset_index(drop=True)
+    original_cols_df["adresse_concatenee"] = pd.Series(addresses, dtype=object)
+    return pd.concat([original_cols_df, geocoder_df], axis=1)
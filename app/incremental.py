@@ -0,0 +1,135 @@
+import hashlib
+import json
+import os
+import time
+from dataclasses import dataclass
+from typing import Any, Iterable, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from geocoding import row_fingerprints
+
+FINGERPRINTS_FILE = "empreintes.csv"
+RESULT_COLUMNS = ["latitude", "longitude", "adresse_normalisee", "statut"]
+FINGERPRINT_COLUMNS = ["ligne", "identifiant", "empreinte"] + RESULT_COLUMNS
+
+
+def dataset_id_for(filename: str, columns: Sequence[str], fields: Optional[Mapping[str, str]] = None) -> str:
+    """Identifiant d'un fichier suivi d'une version à l'autre : même nom + mêmes colonnes
+    (+ même correspondance de champs), quel que soit son contenu.
+    """
+    digest = hashlib.sha1(os.path.basename(filename).encode("utf-8"))
+    digest.update(("\x1e" + "\x1f".join(map(str, columns))).encode("utf-8"))
+    if fields:
+        digest.update(("\x1e" + "\x1f".join(f"{k}={v}" for k, v in sorted(fields.items()))).encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def _reference_path(jobs_dir: str, dataset_id: str) -> str:
+    return os.path.join(jobs_dir, "fichiers", f"{dataset_id}.json")
+
+
+def read_reference(jobs_dir: str, dataset_id: str) -> Optional[str]:
+    """Job du dernier traitement terminé de ce fichier, s'il y en a un."""
+    path = _reference_path(jobs_dir, dataset_id)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f).get("job_id")
+
+
+def write_reference(jobs_dir: str, dataset_id: str, job_id: str) -> None:
+    path = _reference_path(jobs_dir, dataset_id)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump({"job_id": job_id, "mis_a_jour": time.time()}, f)
+    os.replace(path + ".tmp", path)
+
+
+def fingerprint_frame(
+    df: pd.DataFrame, columns: Sequence[str], id_column: Optional[str], first_row: int
+) -> pd.DataFrame:
+    """Numéro de ligne, identifiant (colonne choisie, sinon vide) et empreinte de chaque ligne."""
+    identifiers = (
+        df[id_column].astype("string").str.strip().fillna("")
+        if id_column
+        else pd.Series("", index=df.index, dtype="string")
+    )
+    return pd.DataFrame({
+        "ligne": np.arange(first_row, first_row + len(df)),
+        "identifiant": identifiers.to_numpy(dtype=object),
+        "empreinte": row_fingerprints(df, columns),
+    })
+
+
+@dataclass
+class RunDiff:
+    added: int = 0
+    changed: int = 0
+    removed: int = 0
+    unchanged: int = 0
+
+
+class PreviousRun:
+    """Empreintes et résultats du dernier traitement d'un fichier.
+
+    Une ligne dont l'empreinte figure dans ce traitement reprend ses coordonnées sans
+    passer par le géocodage, quelle que soit sa position ; les lignes en erreur sont
+    toujours recalculées. Pour le résumé ajoutées / modifiées / supprimées, les lignes
+    sont appariées par identifiant si une colonne identifiant a été choisie aux deux
+    traitements, sinon par numéro de ligne.
+    """
+
+    def __init__(self, path: str) -> None:
+        frame = pd.read_csv(
+            path,
+            dtype={"identifiant": str, "empreinte": "uint64", "adresse_normalisee": str, "statut": str},
+            keep_default_na=False,
+            na_values={"latitude": [""], "longitude": [""]},
+        )
+        self.rows = frame[["ligne", "identifiant", "empreinte"]]
+        reusable = frame[~frame["statut"].str.startswith("erreur")].drop_duplicates("empreinte")
+        self._fingerprints = pd.Index(reusable["empreinte"].to_numpy())
+        self._results = reusable[RESULT_COLUMNS].reset_index(drop=True)
+        self._results["adresse_normalisee"] = self._results["adresse_normalisee"].replace("", None)
+
+    def lookup(self, fingerprints: np.ndarray) -> Tuple[np.ndarray, pd.DataFrame]:
+        """Masque des lignes déjà connues et leurs résultats (alignés sur les lignes connues)."""
+        positions = self._fingerprints.get_indexer(fingerprints)
+        found = positions >= 0
+        return found, self._results.iloc[positions[found]].reset_index(drop=True)
+
+    def diff(self, current: pd.DataFrame) -> RunDiff:
+        """Compare les empreintes ``current`` (voir ``fingerprint_frame``) à ce traitement."""
+        key = "identifiant" if (current["identifiant"] != "").any() and (self.rows["identifiant"] != "").any() else "ligne"
+        previous = self.rows.drop_duplicates(key).set_index(key)["empreinte"]
+        now = current.drop_duplicates(key).set_index(key)["empreinte"]
+        common = now.index.intersection(previous.index)
+        changed = int((now.loc[common] != previous.loc[common]).sum())
+        return RunDiff(
+            added=len(now) - len(common),
+            changed=changed,
+            removed=len(previous) - len(common),
+            unchanged=len(common) - changed,
+        )
+
+
+def diff_chunks(
+    chunks: Iterable[pd.DataFrame], columns: Sequence[str], id_column: Optional[str], previous: PreviousRun
+) -> RunDiff:
+    """Résumé des différences d'un fichier (lu par blocs) avec le traitement précédent."""
+    frames = []
+    first_row = 0
+    for chunk in chunks:
+        frames.append(fingerprint_frame(chunk, columns, id_column, first_row))
+        first_row += len(chunk)
+    current = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=FINGERPRINT_COLUMNS[:3])
+    return previous.diff(current)
+
+
+def reused_results(stored: pd.DataFrame, addresses: Sequence[Any]) -> pd.DataFrame:
+    """Résultats repris du traitement précédent, au format de ``results_to_frame``."""
+    frame = stored.reset_index(drop=True).copy()
+    frame.insert(0, "adresse", pd.Series(list(addresses), dtype=object))
+    return frame
@@ -0,0 +1,119 @@
+import csv
+import io
+import os
+from typing import IO, Iterator, List, Optional, Sequence, Union
+
+import pandas as pd
+
+SUPPORTED_INPUTS = (".xlsx", ".csv", ".parquet")
+
+Source = Union[str, IO[bytes]]
+
+
+def file_format(name: str) -> str:
+    ext = os.path.splitext(str(name))[1].lower()
+    if ext not in SUPPORTED_INPUTS:
+        raise ValueError(f"Format non supporté: {ext or name} (attendu: {', '.join(SUPPORTED_INPUTS)})")
+    return ext
+
+
+def _source_format(source: Source, fmt: Optional[str]) -> str:
+    if fmt:
+        return fmt
+    return file_format(source if isinstance(source, str) else getattr(source, "name", ""))
+
+
+def sniff_delimiter(sample: Union[str, bytes]) -> str:
+    if isinstance(sample, bytes):
+        sample = sample.decode("utf-8", errors="replace")
+    try:
+        return csv.Sniffer().sniff(sample, delimiters=",;\t|").delimiter
+    except csv.Error:
+        return ","
+
+
+def _read_sample(source: Source, size: int = 64 * 1024) -> bytes:
+    if isinstance(source, str):
+        with open(source, "rb") as f:
+            return f.read(size)
+    position = source.tell()
+    sample = source.read(size)
+    source.seek(position)
+    return sample
+
+
+def _iter_xlsx(source: Source, chunk_size: int) -> Iterator[pd.DataFrame]:
+    from openpyxl import load_workbook
+
+    # read_only : les lignes sont lues à la demande, sans charger toute la feuille
+    workbook = load_workbook(source, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = [str(c) if c is not None else f"Unnamed: {i}" for i, c in enumerate(header)]
+        width = len(columns)
+        buffer: List[Sequence] = []
+        for row in rows:
+            if all(v is None for v in row):
+                continue
+            row = tuple(row[:width]) + (None,) * (width - len(row))
+            buffer.append(row)
+            if len(buffer) >= chunk_size:
+                yield pd.DataFrame(buffer, columns=columns)
+                buffer = []
+        if buffer:
+            yield pd.DataFrame(buffer, columns=columns)
+    finally:
+        workbook.close()
+
+
+def iter_chunks(source: Source, chunk_size: int = 5000, fmt: Optional[str] = None) -> Iterator[pd.DataFrame]:
+    """Lit un fichier .xlsx, .csv ou .parquet par blocs de ``chunk_size`` lignes.
+
+    ``source`` est un chemin ou un fichier binaire ouvert (ex: fichier téléversé) ;
+    dans ce cas ``fmt`` peut préciser l'extension si le nom ne suffit pas.
+    """
+    ext = _source_format(source, fmt)
+    if ext == ".csv":
+        delimiter = sniff_delimiter(_read_sample(source))
+        # Tout en texte : pas d'inférence de type par bloc ("06000" reste "06000", et une
+        # colonne a le même type dans tous les blocs) ; les cellules vides restent NaN
+        yield from pd.read_csv(source, chunksize=chunk_size, sep=delimiter, dtype=str, keep_default_na=True)
+    elif ext == ".parquet":
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(source).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    else:
+        yield from _iter_xlsx(source, chunk_size)
+
+
+def read_preview(source: Source, nrows: int = 100, fmt: Optional[str] = None) -> pd.DataFrame:
+    """Premières lignes du fichier, pour choisir les colonnes sans tout charger."""
+    chunk = next(iter_chunks(source, nrows, fmt), None)
+    if not isinstance(source, str):
+        source.seek(0)
+    return chunk if chunk is not None else pd.DataFrame()
+
+
+def count_rows(path: str) -> Optional[int]:
+    """Nombre de lignes de données, estimé sans lire le contenu quand c'est possible."""
+    ext = file_format(path)
+    if ext == ".parquet":
+        import pyarrow.parquet as pq
+
+        return pq.ParquetFile(path).metadata.num_rows
+    if ext == ".xlsx":
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(path, read_only=True)
+        try:
+            max_row = workbook.active.max_row
+        finally:
+            workbook.close()
+        return max_row - 1 if max_row else None
+    with open(path, "rb") as f:
+        lines = sum(chunk.count(b"\n") for chunk in iter(lambda: f.read(io.DEFAULT_BUFFER_SIZE * 64), b""))
+    return max(lines - 1, 0)
@@ -0,0 +1,496 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict
+from typing import Any, Dict, List, Mapping, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from addresses import StructuredQuery
+from export import ChunkWriter, available_formats, export_results, read_results
+from geocache import CacheEntry
+from geocoding import GeocodingService, combine_with_original, defer_retries, frame_addresses
+from incremental import (
+    FINGERPRINT_COLUMNS,
+    FINGERPRINTS_FILE,
+    RESULT_COLUMNS,
+    PreviousRun,
+    dataset_id_for,
+    fingerprint_frame,
+    read_reference,
+    reused_results,
+    write_reference,
+)
+from ingest import count_rows, file_format, iter_chunks
+from scheduler import BATCH, request_context
+
+JOBS_DIR = os.environ.get("GEOCODE_JOBS_DIR", os.path.join("data", "jobs"))
+CHECKPOINT_EVERY = int(os.environ.get("GEOCODE_CHECKPOINT_EVERY", "500"))
+
+STATUS_PENDING = "en attente"
+STATUS_RUNNING = "en cours"
+STATUS_DONE = "terminé"
+STATUS_FAILED = "échec"
+
+
+def job_id_for(content: bytes, columns: Sequence[str], fields: Optional[Mapping[str, str]] = None) -> str:
+    """Identifiant stable d'un lot : même fichier + mêmes colonnes (+ même correspondance
+    de champs en mode structuré) = même job."""
+    digest = hashlib.sha1(content)
+    digest.update("\x1f".join(map(str, columns)).encode("utf-8"))
+    if fields:
+        digest.update(("\x1e" + "\x1f".join(f"{k}={v}" for k, v in sorted(fields.items()))).encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def read_state(directory: str) -> Dict[str, Any]:
+    path = os.path.join(directory, "job.json")
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+class BatchJob:
+    """Géocodage d'un fichier exécuté hors du cycle de rerun de Streamlit.
+
+    Le fichier est lu par blocs de ``checkpoint_every`` lignes ; chaque bloc géocodé est
+    ajouté à ``resultats.csv`` puis l'état (lignes traitées, taille du fichier de
+    résultats) est enregistré dans ``job.json``. Une relance du même job repart du
+    dernier bloc enregistré. Avec ``fields`` (champ -> colonne), les lignes partent en
+    requêtes structurées au lieu d'être concaténées.
+
+    Les exports .xlsx et .parquet sont écrits au fil des blocs, à côté de ``resultats.csv``,
+    et prêts dès la fin du job (après une reprise, ils sont reconvertis depuis le CSV).
+
+    Les échecs transitoires de tous les blocs sont mis de côté (liste enregistrée avec
+    l'état) et retentés une seule fois, après le dernier bloc ; les lignes corrigées sont
+    alors reportées dans ``resultats.csv`` et ``empreintes.csv``.
+
+    L'empreinte et le résultat de chaque ligne sont aussi écrits dans ``empreintes.csv`` ;
+    avec ``previous`` (empreintes d'un traitement précédent du même fichier), les lignes
+    inchangées reprennent leur résultat sans être géocodées.
+    """
+
+    def __init__(
+        self,
+        job_id: str,
+        source_path: str,
+        columns: Sequence[str],
+        service: GeocodingService,
+        directory: str,
+        checkpoint_every: int = CHECKPOINT_EVERY,
+        fields: Optional[Mapping[str, str]] = None,
+        id_column: Optional[str] = None,
+        previous: Optional[str] = None,
+    ) -> None:
+        self.job_id = job_id
+        self.source_path = source_path
+        self.columns = list(columns)
+        self.fields = dict(fields) if fields else None
+        self.id_column = id_column
+        self.previous = previous
+        self.service = service
+        self.directory = directory
+        self.checkpoint_every = max(checkpoint_every, 1)
+        self.status = STATUS_PENDING
+        self.rows_total: Optional[int] = None
+        self.rows_done = 0
+        self.rows_resumed = 0
+        self.rows_reused = 0
+        self.saved_calls = 0
+        self.distinct_queries = 0
+        self.deferred: List[Any] = []
+        self.retry_phase = False
+        self.error: Optional[str] = None
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._chunk_progress = 0.0
+
+    @property
+    def results_path(self) -> str:
+        return os.path.join(self.directory, "resultats.csv")
+
+    @property
+    def fingerprints_path(self) -> str:
+        return os.path.join(self.directory, FINGERPRINTS_FILE)
+
+    def export_path(self, fmt: str) -> str:
+        """Fichier de résultats au format ``fmt`` ; n'existe qu'une fois le job terminé."""
+        return os.path.splitext(self.results_path)[0] + fmt
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (STATUS_DONE, STATUS_FAILED)
+
+    @property
+    def progress(self) -> float:
+        if self.status == STATUS_DONE:
+            return 1.0
+        if not self.rows_total:
+            return 0.0
+        return min((self.rows_done + self._chunk_progress) / self.rows_total, 1.0)
+
+    def run(self) -> None:
+        self.status = STATUS_RUNNING
+        self.started_at = time.time()
+        try:
+            with request_context(BATCH, self.job_id):
+                self._run()
+        except Exception as exc:  # noqa: BLE001
+            self.error = f"{type(exc).__name__}: {exc}"
+            self.status = STATUS_FAILED
+        self.finished_at = time.time()
+        self._write_state()
+
+    def restore(self, state: Mapping[str, Any]) -> None:
+        """Reprend statut et compteurs enregistrés dans ``job.json``."""
+        self.status = state.get("statut", self.status)
+        self.rows_total = self.rows_done = state.get("lignes_traitees", 0)
+        self.rows_reused = state.get("lignes_reprises", 0)
+        self.saved_calls = state.get("appels_evites", 0)
+        self.distinct_queries = state.get("adresses_distinctes", 0)
+        self.error = state.get("erreur")
+        self.finished_at = state.get("mis_a_jour")
+
+    def _run(self) -> None:
+        self.rows_total = count_rows(self.source_path)
+        state = read_state(self.directory)
+        results_size = state.get("taille_resultats", 0)
+        if os.path.exists(self.results_path) and results_size:
+            # Les lignes écrites après le dernier checkpoint sont écartées puis recalculées ;
+            # en phase de relance, tous les blocs sont écrits et les fichiers ont pu être réécrits
+            if not state.get("phase_relances"):
+                _truncate(self.results_path, results_size)
+                _truncate(self.fingerprints_path, state.get("taille_empreintes", 0))
+            self.deferred = [_load_query(query) for query in state.get("relances_en_attente", [])]
+            self.rows_resumed = self.rows_done = state.get("lignes_traitees", 0)
+            self.rows_reused = state.get("lignes_reprises", 0)
+            self.saved_calls = state.get("appels_evites", 0)
+            self.distinct_queries = state.get("adresses_distinctes", 0)
+        else:
+            for path in (self.results_path, self.fingerprints_path):
+                if os.path.exists(path):
+                    os.remove(path)
+        previous = PreviousRun(self.previous) if self.previous and os.path.exists(self.previous) else None
+        # Un export incrémental doit contenir toutes les lignes : seulement pour un job parti de zéro
+        exports = {} if self.rows_done else {
+            fmt: ChunkWriter(self.export_path(fmt) + ".tmp", fmt) for fmt in available_formats() if fmt != ".csv"
+        }
+        completed = False
+        try:
+            with defer_retries(self.deferred):
+                self._process(previous, exports)
+            patched = self._drain_retry_queue()
+            completed = True
+        finally:
+            for writer in exports.values():
+                writer.close()
+                # Job en échec ou interrompu : une reprise reconvertit les exports depuis le CSV
+                if not completed and os.path.exists(writer.path):
+                    os.remove(writer.path)
+        # Des lignes corrigées après coup : les exports écrits au fil des blocs sont périmés
+        self._finish_exports({} if patched else exports)
+        self.rows_total = self.rows_done
+        self.status = STATUS_DONE
+
+    def _process(self, previous: Optional[PreviousRun], exports: Dict[str, ChunkWriter]) -> None:
+        seen = 0
+        for chunk in iter_chunks(self.source_path, self.checkpoint_every):
+            start = seen
+            seen += len(chunk)
+            if seen <= self.rows_done:
+                continue
+            chunk = chunk.iloc[max(self.rows_done - start, 0):]
+            fingerprints = fingerprint_frame(chunk, self.columns, self.id_column, start + max(self.rows_done - start, 0))
+            final_df = self._geocode_chunk(chunk, fingerprints, previous)
+            final_df.to_csv(
+                self.results_path, mode="a", header=not os.path.exists(self.results_path), index=False
+            )
+            pd.concat([fingerprints, final_df[RESULT_COLUMNS]], axis=1)[FINGERPRINT_COLUMNS].to_csv(
+                self.fingerprints_path, mode="a", header=not os.path.exists(self.fingerprints_path), index=False
+            )
+            for fmt, writer in list(exports.items()):
+                try:
+                    writer.write(final_df)
+                except Exception:  # noqa: BLE001
+                    # Bloc incompatible avec le schéma du premier (types mixtes) : reconverti en fin de job
+                    writer.close()
+                    del exports[fmt]
+            self.rows_done += len(chunk)
+            self._chunk_progress = 0.0
+            self._write_state()
+
+    def _drain_retry_queue(self) -> bool:
+        """Relance les échecs transitoires mis de côté pendant tout le job ; renvoie True si
+        des lignes ont été corrigées dans les fichiers de résultats."""
+        queries = list(dict.fromkeys(self.deferred))
+        if not queries:
+            return False
+        self.retry_phase = True
+        self._write_state()
+        resolved: Dict[str, CacheEntry] = {}
+        for index, entry in self.service.retry_queue(queries):
+            if not entry.statut.startswith("erreur"):
+                resolved[str(queries[index])] = entry
+        if resolved:
+            self._patch_results(resolved)
+        self.deferred.clear()
+        self.retry_phase = False
+        self._write_state()
+        return bool(resolved)
+
+    def _patch_results(self, resolved: Dict[str, CacheEntry]) -> None:
+        """Reporte les relances réussies dans les lignes en erreur de ``resultats.csv`` et
+        d'``empreintes.csv``, réécrits bloc par bloc puis remplacés : l'opération peut être
+        rejouée sans risque après une interruption."""
+        chunk_size = 10 * self.checkpoint_every
+        fixed: List[pd.DataFrame] = []
+        offset = 0
+        with _Rewrite(self.results_path) as rewrite:
+            for chunk in read_results(self.results_path, chunksize=chunk_size):
+                chunk.index = pd.RangeIndex(offset, offset + len(chunk))
+                mask = chunk["adresse"].isin(resolved.keys()) & chunk["statut"].fillna("").str.startswith("erreur")
+                if mask.any():
+                    entries = [resolved[address] for address in chunk.loc[mask, "adresse"]]
+                    chunk.loc[mask, RESULT_COLUMNS] = [
+                        [e.latitude, e.longitude, e.adresse_normalisee, e.statut] for e in entries
+                    ]
+                    fixed.append(chunk.loc[mask, RESULT_COLUMNS])
+                offset += len(chunk)
+                rewrite.write(chunk)
+        if not fixed:
+            return
+        # empreintes.csv suit l'ordre des lignes de resultats.csv : corrigé par position
+        corrections = pd.concat(fixed)
+        offset = 0
+        with _Rewrite(self.fingerprints_path) as rewrite:
+            for chunk in pd.read_csv(self.fingerprints_path, dtype=str, keep_default_na=False, chunksize=chunk_size):
+                chunk.index = pd.RangeIndex(offset, offset + len(chunk))
+                rows = corrections.index[(corrections.index >= offset) & (corrections.index < offset + len(chunk))]
+                if len(rows):
+                    chunk.loc[rows, RESULT_COLUMNS] = corrections.loc[rows].astype(object).where(
+                        corrections.loc[rows].notna(), ""
+                    ).astype(str).to_numpy()
+                offset += len(chunk)
+                rewrite.write(chunk)
+
+    def _finish_exports(self, exports: Dict[str, ChunkWriter]) -> None:
+        for fmt in available_formats():
+            if fmt == ".csv":
+                continue
+            target = self.export_path(fmt)
+            if fmt in exports:
+                os.replace(target + ".tmp", target)
+                continue
+            if os.path.exists(target + ".tmp"):
+                os.remove(target + ".tmp")
+            try:
+                export_results(self.results_path, fmt)
+            except Exception:  # noqa: BLE001
+                # Export facultatif : la page propose alors de le préparer et affiche l'erreur
+                pass
+
+    def _geocode_chunk(
+        self, chunk: pd.DataFrame, fingerprints: pd.DataFrame, previous: Optional[PreviousRun]
+    ) -> pd.DataFrame:
+        if previous is None:
+            found = np.zeros(len(chunk), dtype=bool)
+        else:
+            found, stored = previous.lookup(fingerprints["empreinte"].to_numpy())
+        parts = []
+        todo = chunk[~found]
+        if len(todo):
+            on_progress = self._on_chunk_progress(len(chunk))
+            if self.fields:
+                geocoded, plan = self.service.geocode_structured(todo, self.fields, on_progress)
+            else:
+                geocoded, plan = self.service.geocode_frame(todo, self.columns, on_progress)
+            geocoded.index = todo.index
+            parts.append(geocoded)
+            self.saved_calls += plan.saved_calls
+            self.distinct_queries += len(plan.unique_keys)
+        if found.any():
+            known = chunk[found]
+            addresses = frame_addresses(known, self.columns, self.fields)
+            reused = combine_with_original(known, self.columns, addresses, reused_results(stored, addresses))
+            reused.index = known.index
+            parts.append(reused)
+            self.rows_reused += int(found.sum())
+        return pd.concat(parts).loc[chunk.index].reset_index(drop=True)
+
+    def _on_chunk_progress(self, chunk_rows: int):
+        def on_progress(done: int, total: int) -> None:
+            self._chunk_progress = chunk_rows * done / total if total else 0.0
+
+        return on_progress
+
+    def _write_state(self) -> None:
+        state = {
+            "job_id": self.job_id,
+            "colonnes": self.columns,
+            "champs": self.fields,
+            "statut": self.status,
+            "lignes_traitees": self.rows_done,
+            "taille_resultats": os.path.getsize(self.results_path) if os.path.exists(self.results_path) else 0,
+            "taille_empreintes": (
+                os.path.getsize(self.fingerprints_path) if os.path.exists(self.fingerprints_path) else 0
+            ),
+            "lignes_reprises": self.rows_reused,
+            "appels_evites": self.saved_calls,
+            "adresses_distinctes": self.distinct_queries,
+            "relances_en_attente": [_dump_query(query) for query in self.deferred],
+            "phase_relances": self.retry_phase,
+            "erreur": self.error,
+            "mis_a_jour": time.time(),
+        }
+        path = os.path.join(self.directory, "job.json")
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(state, f, ensure_ascii=False)
+        os.replace(path + ".tmp", path)
+
+
+def _dump_query(query: Any) -> Any:
+    return asdict(query) if isinstance(query, StructuredQuery) else query
+
+
+def _load_query(value: Any) -> Any:
+    return StructuredQuery(**value) if isinstance(value, dict) else value
+
+
+class _Rewrite:
+    """Réécriture d'un CSV bloc par bloc dans un fichier temporaire, qui remplace
+    l'original à la sortie du bloc ``with`` (et est supprimé en cas d'erreur)."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.tmp = path + ".tmp"
+        self._header = True
+
+    def write(self, chunk: pd.DataFrame) -> None:
+        chunk.to_csv(self.tmp, mode="w" if self._header else "a", header=self._header, index=False)
+        self._header = False
+
+    def __enter__(self) -> "_Rewrite":
+        return self
+
+    def __exit__(self, exc_type, *exc_info) -> None:
+        if exc_type is None and not self._header:
+            os.replace(self.tmp, self.path)
+        elif os.path.exists(self.tmp):
+            os.remove(self.tmp)
+
+
+def _truncate(path: str, size: int) -> None:
+    if os.path.exists(path):
+        with open(path, "r+b") as f:
+            f.truncate(size)
+
+
+class JobManager:
+    """Registre des jobs du processus, exécutés par un pool de threads en arrière-plan."""
+
+    def __init__(self, service: GeocodingService, jobs_dir: str = JOBS_DIR, max_workers: int = 2) -> None:
+        self.service = service
+        self.jobs_dir = jobs_dir
+        self._jobs: Dict[str, BatchJob] = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="geocode-job")
+
+    def get(self, job_id: str) -> Optional[BatchJob]:
+        """Job du registre ; un job terminé lors d'un précédent démarrage est relu depuis ``job.json``."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                job = self._load_finished(job_id)
+            return job
+
+    def checkpointed_rows(self, job_id: str) -> int:
+        """Lignes déjà traitées d'un job interrompu (0 s'il n'a jamais tourné ou s'est terminé)."""
+        state = read_state(os.path.join(self.jobs_dir, job_id))
+        if state.get("statut") == STATUS_DONE:
+            return 0
+        return state.get("lignes_traitees", 0)
+
+    def fingerprints_path(self, job_id: str) -> str:
+        return os.path.join(self.jobs_dir, job_id, FINGERPRINTS_FILE)
+
+    def previous_job(
+        self, filename: str, columns: Sequence[str], fields: Optional[Mapping[str, str]] = None
+    ) -> Optional[str]:
+        """Dernier job terminé d'un fichier de même nom et mêmes colonnes, si ses empreintes existent."""
+        job_id = read_reference(self.jobs_dir, dataset_id_for(filename, columns, fields))
+        if job_id is None or not os.path.exists(self.fingerprints_path(job_id)):
+            return None
+        return job_id
+
+    def submit(
+        self,
+        job_id: str,
+        upload: Any,
+        filename: str,
+        columns: Sequence[str],
+        fields: Optional[Mapping[str, str]] = None,
+        id_column: Optional[str] = None,
+    ) -> BatchJob:
+        """Lance (ou reprend depuis son checkpoint) le job ; sans effet s'il tourne déjà.
+
+        ``upload`` est le fichier téléversé : il est copié une fois dans le dossier du job,
+        qui le relit ensuite par blocs. Si une version précédente du même fichier a été
+        traitée, ses lignes inchangées sont reprises sans géocodage.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None and not job.finished:
+                return job
+            directory = os.path.join(self.jobs_dir, job_id)
+            os.makedirs(directory, exist_ok=True)
+            source_path = os.path.join(directory, "source" + file_format(filename))
+            if not os.path.exists(source_path):
+                upload.seek(0)
+                with open(source_path + ".tmp", "wb") as f:
+                    shutil.copyfileobj(upload, f)
+                os.replace(source_path + ".tmp", source_path)
+            dataset_id = dataset_id_for(filename, columns, fields)
+            previous = self.previous_job(filename, columns, fields)
+            job = BatchJob(
+                job_id,
+                source_path,
+                columns,
+                self.service,
+                directory,
+                fields=fields,
+                id_column=id_column,
+                previous=self.fingerprints_path(previous) if previous and previous != job_id else None,
+            )
+            self._jobs[job_id] = job
+            self._pool.submit(self._run, job, dataset_id)
+        return job
+
+    def _load_finished(self, job_id: str) -> Optional[BatchJob]:
+        directory = os.path.join(self.jobs_dir, job_id)
+        state = read_state(directory)
+        if state.get("statut") != STATUS_DONE:
+            return None
+        sources = [name for name in os.listdir(directory) if name.startswith("source.") and not name.endswith(".tmp")]
+        job = BatchJob(
+            job_id,
+            os.path.join(directory, sources[0] if sources else "source.csv"),
+            state.get("colonnes", []),
+            self.service,
+            directory,
+            fields=state.get("champs"),
+        )
+        job.restore(state)
+        self._jobs[job_id] = job
+        return job
+
+    def _run(self, job: BatchJob, dataset_id: str) -> None:
+        job.run()
+        if job.status == STATUS_DONE:
+            write_reference(self.jobs_dir, dataset_id, job.job_id)
@@ -0,0 +1,131 @@
+import math
+import os
+from typing import TYPE_CHECKING, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+if TYPE_CHECKING:
+    import pydeck as pdk
+
+# Au-delà, les points ne sont plus envoyés un par un au navigateur mais agrégés en grille
+MAP_MAX_POINTS = int(os.environ.get("GEOCODE_MAP_MAX_POINTS", 20_000))
+# Cellules d'agrégation par tuile de 256 px : ~8 px par cellule à l'écran
+CELLS_PER_TILE = 32
+METERS_PER_DEGREE = 111_320.0
+
+STATUS_COLORS: Dict[str, List[int]] = {
+    "ok": [34, 139, 34, 200],
+    "adresse vide": [160, 160, 160, 200],
+    "introuvable": [255, 140, 0, 200],
+    "erreur": [220, 20, 60, 200],
+}
+OTHER_COLOR = [70, 130, 180, 200]
+
+
+def status_family(statut: pd.Series) -> pd.Series:
+    """Regroupe "erreur: GeocoderTimedOut", "erreur: ..." sous "erreur"."""
+    return statut.astype("string").fillna("inconnu").str.split(":", n=1).str[0].str.strip()
+
+
+def fit_view(latitudes: np.ndarray, longitudes: np.ndarray) -> Tuple[float, float, int]:
+    """Centre et niveau de zoom englobant tous les points (approximation Web Mercator)."""
+    lat_min, lat_max = float(latitudes.min()), float(latitudes.max())
+    lon_min, lon_max = float(longitudes.min()), float(longitudes.max())
+    span = max(lat_max - lat_min, lon_max - lon_min, 1e-3)
+    zoom = int(np.clip(math.floor(math.log2(360 / span)), 1, 16))
+    return (lat_min + lat_max) / 2, (lon_min + lon_max) / 2, zoom
+
+
+def cell_degrees_for_zoom(zoom: int) -> float:
+    return 360.0 / (2 ** zoom * CELLS_PER_TILE)
+
+
+def aggregate_grid(points: pd.DataFrame, cell_degrees: float) -> pd.DataFrame:
+    """Agrège les points par cellule de grille : barycentre, effectif et statut majoritaire."""
+    rows = np.floor(points["latitude"].to_numpy() / cell_degrees).astype(np.int64)
+    cols = np.floor(points["longitude"].to_numpy() / cell_degrees).astype(np.int64)
+    cells = pd.DataFrame({
+        "cell": rows * (int(360 / cell_degrees) + 1) + cols,
+        "latitude": points["latitude"].to_numpy(),
+        "longitude": points["longitude"].to_numpy(),
+        "statut": points["statut"].to_numpy(),
+    })
+    grouped = cells.groupby("cell", sort=False)
+    aggregated = grouped.agg(latitude=("latitude", "mean"), longitude=("longitude", "mean"), count=("latitude", "size"))
+    majority = (
+        cells.groupby(["cell", "statut"], sort=False, observed=True).size()
+        .reset_index(name="n")
+        .sort_values("n", ascending=False)
+        .drop_duplicates("cell")
+        .set_index("cell")["statut"]
+    )
+    aggregated["statut"] = majority
+    return aggregated.reset_index(drop=True)
+
+
+def downsample(points: pd.DataFrame, max_points: int, seed: int = 0) -> pd.DataFrame:
+    """Échantillon stratifié par statut, pour garder visibles les statuts minoritaires."""
+    if len(points) <= max_points:
+        return points
+    fraction = max_points / len(points)
+    samples = [
+        group.sample(max(1, int(len(group) * fraction)), random_state=seed)
+        for _, group in points.groupby("statut", observed=True)
+    ]
+    return pd.concat(samples, ignore_index=True)
+
+
+def _with_colors(frame: pd.DataFrame) -> pd.DataFrame:
+    frame = frame.copy()
+    frame["color"] = [STATUS_COLORS.get(s, OTHER_COLOR) for s in frame["statut"]]
+    return frame
+
+
+def build_deck(points: pd.DataFrame, zoom: int, max_points: int = MAP_MAX_POINTS) -> Tuple["pdk.Deck", str]:
+    """Carte pydeck des résultats, colorés par statut.
+
+    Jusqu'à ``max_points`` les points sont envoyés tels quels ; au-delà ils sont agrégés
+    côté serveur dans une grille dont la maille dépend de ``zoom``, et seules les cellules
+    (échantillonnées si elles restent trop nombreuses) partent vers le navigateur.
+    Renvoie la carte et une phrase décrivant ce qui est affiché.
+    """
+    import pydeck as pdk
+
+    points = points.assign(statut=status_family(points["statut"]))
+    lat, lon, fitted_zoom = fit_view(points["latitude"].to_numpy(), points["longitude"].to_numpy())
+    view = pdk.ViewState(latitude=lat, longitude=lon, zoom=min(zoom, fitted_zoom + 2))
+    if len(points) <= max_points:
+        layer = pdk.Layer(
+            "ScatterplotLayer",
+            _with_colors(points[["latitude", "longitude", "statut"]]),
+            get_position=["longitude", "latitude"],
+            get_fill_color="color",
+            get_radius=4,
+            radius_units="pixels",
+            pickable=True,
+        )
+        tooltip = {"text": "{statut}"}
+        caption = f"{len(points)} points."
+    else:
+        cell_degrees = cell_degrees_for_zoom(zoom)
+        cells = aggregate_grid(points, cell_degrees)
+        total_cells = len(cells)
+        cells = downsample(cells, max_points)
+        # Rayon proportionnel à la racine de l'effectif, borné par la demi-maille
+        half_cell = cell_degrees * METERS_PER_DEGREE / 2
+        cells["radius"] = half_cell * np.sqrt(cells["count"] / cells["count"].max()).clip(lower=0.2)
+        layer = pdk.Layer(
+            "ScatterplotLayer",
+            _with_colors(cells),
+            get_position=["longitude", "latitude"],
+            get_fill_color="color",
+            get_radius="radius",
+            radius_units="meters",
+            radius_min_pixels=2,
+            pickable=True,
+        )
+        tooltip = {"text": "{count} adresses — {statut}"}
+        sampled = f", {len(cells)} affichées" if len(cells) < total_cells else ""
+        caption = f"{len(points)} points agrégés en {total_cells} cellules de {cell_degrees:.4g}°{sampled}."
+    return pdk.Deck(layers=[layer], initial_view_state=view, tooltip=tooltip, map_style=None), caption
@@ -0,0 +1,142 @@
+import json
+import threading
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List
+
+PHASES = ("wait", "network", "parse", "total")
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    def __init__(self) -> None:
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self.buckets = [0] * len(BUCKETS)
+
+    def observe(self, value: float) -> None:
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                self.buckets[i] += 1
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "mean": round(self.sum / self.count, 6) if self.count else 0.0,
+            "max": round(self.max, 6),
+        }
+
+
+class GeocodeMetrics:
+    """Mesures du chemin de géocodage, partagées par tous les threads du processus.
+
+    Chaque appel au fournisseur est découpé en attente (limiteur de débit et file de
+    concurrence), réseau (requête HTTP) et analyse de la réponse ; les compteurs suivent
+    les hits/misses du cache et du référentiel local et les erreurs par type d'exception.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._timers = {phase: Histogram() for phase in PHASES}
+        self._counters: Dict[str, int] = defaultdict(int)
+        self._errors: Dict[str, int] = defaultdict(int)
+        self._retries: Dict[str, int] = defaultdict(int)
+
+    def observe_call(self, wait: float, network: float, parse: float) -> None:
+        with self._lock:
+            self._timers["wait"].observe(wait)
+            self._timers["network"].observe(network)
+            self._timers["parse"].observe(parse)
+            self._timers["total"].observe(wait + network + parse)
+
+    def incr(self, counter: str, amount: int = 1) -> None:
+        with self._lock:
+            self._counters[counter] += amount
+
+    def record_error(self, exc: BaseException) -> None:
+        with self._lock:
+            self._errors[type(exc).__name__] += 1
+
+    def record_retry(self, exc: BaseException) -> None:
+        with self._lock:
+            self._retries[type(exc).__name__] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            timers = {phase: hist.as_dict() for phase, hist in self._timers.items()}
+            counters = dict(self._counters)
+            errors = dict(self._errors)
+            retries = dict(self._retries)
+        calls = timers["total"]["count"]
+        failed = sum(errors.values())
+        attempts = calls + failed
+        return {
+            "timers": timers,
+            "counters": counters,
+            "errors": errors,
+            "retries": retries,
+            "error_rate": failed / attempts if attempts else 0.0,
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.snapshot(), ensure_ascii=False)
+
+    def to_prometheus(self) -> str:
+        """Format texte d'exposition Prometheus."""
+        with self._lock:
+            timers = {phase: (hist.count, hist.sum, list(hist.buckets)) for phase, hist in self._timers.items()}
+            counters = dict(self._counters)
+            errors = dict(self._errors)
+            retries = dict(self._retries)
+        lines: List[str] = [
+            "# HELP geocode_phase_seconds Durée des appels au géocodeur par phase.",
+            "# TYPE geocode_phase_seconds histogram",
+        ]
+        for phase, (count, total, buckets) in timers.items():
+            for bound, value in zip(BUCKETS, buckets):
+                lines.append(f'geocode_phase_seconds_bucket{{phase="{phase}",le="{bound}"}} {value}')
+            lines.append(f'geocode_phase_seconds_bucket{{phase="{phase}",le="+Inf"}} {count}')
+            lines.append(f'geocode_phase_seconds_sum{{phase="{phase}"}} {total:.6f}')
+            lines.append(f'geocode_phase_seconds_count{{phase="{phase}"}} {count}')
+        lines += ["# HELP geocode_events_total Événements du chemin de géocodage.", "# TYPE geocode_events_total counter"]
+        for name, value in sorted(counters.items()):
+            lines.append(f'geocode_events_total{{event="{name}"}} {value}')
+        lines += ["# HELP geocode_errors_total Appels en échec après relances, par type d'exception.", "# TYPE geocode_errors_total counter"]
+        for name, value in sorted(errors.items()):
+            lines.append(f'geocode_errors_total{{type="{name}"}} {value}')
+        lines += ["# HELP geocode_retries_total Relances par type d'exception.", "# TYPE geocode_retries_total counter"]
+        for name, value in sorted(retries.items()):
+            lines.append(f'geocode_retries_total{{type="{name}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+
+def start_metrics_server(metrics: GeocodeMetrics, port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Expose ``/metrics`` (Prometheus) et ``/metrics.json`` dans un thread de fond."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:  # noqa: N802
+            if self.path == "/metrics":
+                body, content_type = metrics.to_prometheus(), "text/plain; version=0.0.4; charset=utf-8"
+            elif self.path == "/metrics.json":
+                body, content_type = metrics.to_json(), "application/json"
+            else:
+                self.send_error(404)
+                return
+            payload = body.encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args) -> None:
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name="geocode-metrics", daemon=True).start()
+    return server
@@ -0,0 +1,124 @@
+import random
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Optional
+
+TRANSIENT = "transitoire"
+RATE_LIMITED = "limite de débit"
+PERMANENT = "définitive"
+
+
+def classify(exc: BaseException) -> str:
+    """Sépare les erreurs qui valent une relance de celles qui échoueront à nouveau.
+
+    Délais, indisponibilités (503, connexion refusée) et erreurs serveur génériques sont
+    transitoires ; 429 signale une limite de débit ; requête invalide, authentification,
+    quota épuisé ou erreur de configuration sont définitives.
+    """
+    # Import local : geopy n'est chargé qu'au premier appel réel au fournisseur
+    from geopy.exc import (
+        GeocoderQuotaExceeded,
+        GeocoderRateLimited,
+        GeocoderServiceError,
+        GeocoderTimedOut,
+        GeocoderUnavailable,
+    )
+
+    if isinstance(exc, GeocoderRateLimited):
+        return RATE_LIMITED
+    if isinstance(exc, (GeocoderTimedOut, GeocoderUnavailable)):
+        return TRANSIENT
+    if isinstance(exc, GeocoderQuotaExceeded):
+        return PERMANENT
+    if type(exc) is GeocoderServiceError:
+        return TRANSIENT
+    return PERMANENT
+
+
+def is_retryable(exc: BaseException) -> bool:
+    return classify(exc) != PERMANENT
+
+
+@dataclass
+class RetryPolicy:
+    """Relances immédiates avec backoff exponentiel et jitter complet.
+
+    Le délai avant la relance ``n`` est tiré uniformément dans
+    ``[0, min(max_delay, base_delay * 2**n)]`` ; un ``Retry-After`` envoyé avec un 429
+    est respecté s'il est plus long.
+    """
+
+    max_attempts: int = 3
+    base_delay: float = 1.0
+    max_delay: float = 30.0
+
+    def delay(self, attempt: int, exc: Optional[BaseException] = None) -> float:
+        ceiling = min(self.max_delay, self.base_delay * (2 ** attempt))
+        delay = random.uniform(0, ceiling)
+        retry_after = getattr(exc, "retry_after", None)
+        if retry_after:
+            delay = max(delay, min(float(retry_after), self.max_delay))
+        return delay
+
+
+class AdaptiveThrottle:
+    """Limiteur de débit partagé qui ralentit sur 429 et réaccélère ensuite (AIMD).
+
+    Chaque 429 divise le débit courant par deux (sans descendre sous ``min_rps``) ;
+    après ``recovery_after`` succès consécutifs il remonte de 25 % jusqu'au débit
+    configuré. Sans limite configurée (``requests_per_second <= 0``), le premier 429
+    part du débit observé sur les dernières requêtes, et la limite est levée une fois
+    revenue au double de ce débit.
+    """
+
+    def __init__(self, requests_per_second: float, min_rps: float = 0.2, recovery_after: int = 20) -> None:
+        self.target_rps = requests_per_second if requests_per_second > 0 else 0.0
+        self.current_rps = self.target_rps
+        self.min_rps = min_rps
+        self.recovery_after = recovery_after
+        self._ceiling = self.target_rps
+        self._successes = 0
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+        self._recent: Deque[float] = deque(maxlen=64)
+
+    @property
+    def interval(self) -> float:
+        return 1.0 / self.current_rps if self.current_rps > 0 else 0.0
+
+    def wait(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+            self._recent.append(slot)
+        if slot > now:
+            time.sleep(slot - now)
+
+    def _observed_rps(self) -> float:
+        if len(self._recent) < 2 or self._recent[-1] <= self._recent[0]:
+            return 1.0
+        return (len(self._recent) - 1) / (self._recent[-1] - self._recent[0])
+
+    def on_rate_limited(self) -> None:
+        with self._lock:
+            self._successes = 0
+            if self.current_rps <= 0:
+                observed = self._observed_rps()
+                self._ceiling = observed * 2
+                self.current_rps = observed
+            self.current_rps = max(self.current_rps / 2, self.min_rps)
+
+    def on_success(self) -> None:
+        with self._lock:
+            if self.current_rps <= 0 or self.current_rps >= self._ceiling:
+                return
+            self._successes += 1
+            if self._successes < self.recovery_after:
+                return
+            self._successes = 0
+            self.current_rps = min(self.current_rps * 1.25, self._ceiling)
+            if self.target_rps == 0 and self.current_rps >= self._ceiling:
+                self.current_rps = 0.0
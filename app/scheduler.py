@@ -0,0 +1,95 @@
+import threading
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Deque, Dict, Iterator, Optional, Tuple
+
+from retry import AdaptiveThrottle
+
+INTERACTIVE = "interactif"
+BATCH = "lot"
+# Ordre de priorité : une voie n'est servie que si les précédentes sont vides
+LANES = (INTERACTIVE, BATCH)
+DEFAULT_OWNER = "défaut"
+
+_request: ContextVar[Tuple[str, str]] = ContextVar("geocode_request", default=(BATCH, DEFAULT_OWNER))
+
+
+@contextmanager
+def request_context(lane: str, owner: str) -> Iterator[None]:
+    """Voie et demandeur (session, job...) des appels au fournisseur faits dans ce bloc.
+
+    Le contexte suit le code appelant, y compris dans les threads lancés par
+    ``GeocoderBackend.iter_geocode``.
+    """
+    if lane not in LANES:
+        raise ValueError(f"Voie inconnue: {lane}")
+    token = _request.set((lane, owner))
+    try:
+        yield
+    finally:
+        _request.reset(token)
+
+
+def current_request() -> Tuple[str, str]:
+    return _request.get()
+
+
+class Scheduler:
+    """Ordonnanceur des appels au fournisseur, partagé par tout le processus.
+
+    Il remplace un simple sémaphore : au plus ``max_concurrency`` appels en cours, et
+    quand une place se libère elle va à la voie la plus prioritaire qui attend (une
+    recherche interactive passe devant les lots). Dans une voie, les demandeurs sont
+    servis à tour de rôle, un appel chacun : deux lots qui tournent en même temps se
+    partagent le débit à parts égales, quelle que soit leur taille. L'appel élu attend
+    ensuite son créneau auprès du limiteur de débit.
+    """
+
+    def __init__(self, max_concurrency: int, throttle: AdaptiveThrottle) -> None:
+        self.max_concurrency = max(max_concurrency, 1)
+        self.throttle = throttle
+        self._cond = threading.Condition()
+        self._active = 0
+        self._queues: Dict[str, "OrderedDict[str, Deque[object]]"] = {lane: OrderedDict() for lane in LANES}
+
+    def _head(self) -> Optional[object]:
+        for lane in LANES:
+            owners = self._queues[lane]
+            if owners:
+                return next(iter(owners.values()))[0]
+        return None
+
+    def _dequeue(self, lane: str, owner: str) -> None:
+        owners = self._queues[lane]
+        tickets = owners.pop(owner)
+        tickets.popleft()
+        if tickets:
+            # Le demandeur repasse en fin de tour
+            owners[owner] = tickets
+
+    @contextmanager
+    def slot(self, lane: Optional[str] = None, owner: Optional[str] = None) -> Iterator[None]:
+        """Réserve une place pour un appel (voie et demandeur du contexte courant par défaut)."""
+        if lane is None or owner is None:
+            lane, owner = current_request()
+        ticket = object()
+        with self._cond:
+            self._queues[lane].setdefault(owner, deque()).append(ticket)
+            while self._active >= self.max_concurrency or self._head() is not ticket:
+                self._cond.wait()
+            self._dequeue(lane, owner)
+            self._active += 1
+            self._cond.notify_all()
+        try:
+            self.throttle.wait()
+            yield
+        finally:
+            with self._cond:
+                self._active -= 1
+                self._cond.notify_all()
+
+    def queued(self) -> Dict[str, int]:
+        """Nombre d'appels en attente par voie."""
+        with self._cond:
+            return {lane: sum(len(t) for t in owners.values()) for lane, owners in self._queues.items()}
@@ -0,0 +1,113 @@
+import math
+from typing import Dict, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from geocache import GeocodeCache
+
+EARTH_RADIUS_KM = 6371.0088
+DEFAULT_CELL_DEGREES = 0.25
+# Au-delà, parcourir toutes les cellules coûte plus cher qu'un calcul vectorisé sur tous les points
+MAX_SCANNED_CELLS = 4096
+
+
+def haversine_km(lat: float, lon: float, latitudes: np.ndarray, longitudes: np.ndarray) -> np.ndarray:
+    lat1, lon1 = math.radians(lat), math.radians(lon)
+    lat2, lon2 = np.radians(latitudes), np.radians(longitudes)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+class SpatialIndex:
+    """Index en grille (cellules de ``cell_degrees`` degrés) sur des points géocodés.
+
+    Les requêtes de rayon ne calculent la distance haversine que pour les points des
+    cellules qui recoupent le cercle ; le plus proche voisin élargit le rayon jusqu'à
+    trouver ``k`` points.
+    """
+
+    def __init__(
+        self,
+        latitudes: Sequence[float],
+        longitudes: Sequence[float],
+        labels: Sequence[str],
+        cell_degrees: float = DEFAULT_CELL_DEGREES,
+    ) -> None:
+        self.cell_degrees = cell_degrees
+        self.n_lat = int(math.ceil(180 / cell_degrees)) + 1
+        self.n_lon = int(math.ceil(360 / cell_degrees))
+        latitudes = np.asarray(latitudes, dtype=np.float64)
+        longitudes = np.asarray(longitudes, dtype=np.float64)
+        keys = self._cell_rows(latitudes) * self.n_lon + self._cell_cols(longitudes)
+        order = np.argsort(keys, kind="stable")
+        self.latitudes = latitudes[order]
+        self.longitudes = longitudes[order]
+        self.labels = np.asarray(labels, dtype=object)[order]
+        unique_keys, starts, counts = np.unique(keys[order], return_index=True, return_counts=True)
+        self._cells: Dict[int, Tuple[int, int]] = {
+            int(k): (int(s), int(s + c)) for k, s, c in zip(unique_keys, starts, counts)
+        }
+
+    @classmethod
+    def from_cache(cls, cache: GeocodeCache, cell_degrees: float = DEFAULT_CELL_DEGREES) -> "SpatialIndex":
+        points = cache.points().drop_duplicates(subset=["adresse_normalisee"])
+        return cls(points["latitude"], points["longitude"], points["adresse_normalisee"], cell_degrees)
+
+    def __len__(self) -> int:
+        return len(self.latitudes)
+
+    def _cell_rows(self, latitudes):
+        return np.clip(np.floor((latitudes + 90) / self.cell_degrees), 0, self.n_lat - 1).astype(np.int64)
+
+    def _cell_cols(self, longitudes):
+        return np.floor((longitudes + 180) / self.cell_degrees).astype(np.int64) % self.n_lon
+
+    def _candidates(self, lat: float, lon: float, radius_km: float) -> np.ndarray:
+        dlat = math.degrees(radius_km / EARTH_RADIUS_KM)
+        lat_lo, lat_hi = max(lat - dlat, -90.0), min(lat + dlat, 90.0)
+        cos_lat = math.cos(math.radians(max(abs(lat_lo), abs(lat_hi))))
+        dlon = 180.0 if cos_lat < 1e-9 else min(dlat / cos_lat, 180.0)
+        rows = range(int(self._cell_rows(np.float64(lat_lo))), int(self._cell_rows(np.float64(lat_hi))) + 1)
+        if dlon >= 180.0:
+            cols = range(self.n_lon)
+        else:
+            first = int(math.floor((lon - dlon + 180) / self.cell_degrees))
+            last = int(math.floor((lon + dlon + 180) / self.cell_degrees))
+            cols = [c % self.n_lon for c in range(first, min(last, first + self.n_lon - 1) + 1)]
+        if len(rows) * len(cols) > MAX_SCANNED_CELLS:
+            return np.arange(len(self))
+        slices = [self._cells.get(r * self.n_lon + c) for r in rows for c in cols]
+        ranges = [np.arange(start, end) for start, end in filter(None, slices)]
+        return np.concatenate(ranges) if ranges else np.empty(0, dtype=np.int64)
+
+    def _frame(self, indices: np.ndarray, distances: np.ndarray) -> pd.DataFrame:
+        order = np.argsort(distances, kind="stable")
+        indices, distances = indices[order], distances[order]
+        return pd.DataFrame({
+            "adresse": self.labels[indices],
+            "latitude": self.latitudes[indices],
+            "longitude": self.longitudes[indices],
+            "distance_km": np.round(distances, 3),
+        })
+
+    def within(self, lat: float, lon: float, radius_km: float) -> pd.DataFrame:
+        """Points à moins de ``radius_km`` km, du plus proche au plus lointain."""
+        candidates = self._candidates(lat, lon, radius_km)
+        distances = haversine_km(lat, lon, self.latitudes[candidates], self.longitudes[candidates])
+        keep = distances <= radius_km
+        return self._frame(candidates[keep], distances[keep])
+
+    def nearest(self, lat: float, lon: float, k: int = 5) -> pd.DataFrame:
+        """Les ``k`` points les plus proches."""
+        k = min(k, len(self))
+        radius_km = self.cell_degrees * 111.0
+        while k > 0:
+            candidates = self._candidates(lat, lon, radius_km)
+            distances = haversine_km(lat, lon, self.latitudes[candidates], self.longitudes[candidates])
+            keep = distances <= radius_km
+            if keep.sum() >= k or len(candidates) == len(self):
+                # Tout point plus proche que le k-ième est forcément dans ce rayon
+                return self._frame(candidates, distances).head(k)
+            radius_km *= 2
+        return self._frame(np.empty(0, dtype=np.int64), np.empty(0))
@@ -0,0 +1,9 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Les deux applications importent leurs modules par leur nom, depuis leur propre dossier
+for path in (os.path.join(ROOT, "app"), os.path.join(ROOT, "Downloads", "ia_eloquence", "ia_eloquence")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
@@ -0,0 +1,77 @@
+import pandas as pd
+import pytest
+
+from addresses import canonical_key, canonical_keys, clean_query, extract_postcode
+from batch import plan_batch
+
+SAME_KEY = [
+    ("10 bis rue de la Paix  75002 PARIS", "10B R. de la Paix, 75002 Paris"),
+    ("12 av. du Gal Leclerc 69003 Lyon", "12 avenue du Général Leclerc, 69003 LYON"),
+    ("3 bd St-Michel 75005 Paris Cedex 05", "3 boulevard Saint Michel 75005 Paris"),
+    ("5 place de l'Église 67000 Strasbourg, France", "5 pl. de l'eglise 67000 strasbourg"),
+    ("8 rue Pasteur 06000 Nice", "8 rue  Pasteur,, 06000 Nice FRANCE"),
+]
+
+DIFFERENT_KEYS = [
+    # Communes homonymes
+    ("1 rue de la République 93200 Saint-Denis", "1 rue de la République 97400 Saint-Denis"),
+    # Même voie, ville absente, codes postaux différents
+    ("1 rue de la Gare 69000", "1 rue de la Gare 13001"),
+    ("1 rue de la Gare 59000 Lille", "1 rue de la Gare 69000"),
+    ("10 bis rue de la Paix Paris", "10 ter rue de la Paix Paris"),
+]
+
+
+@pytest.mark.parametrize("left, right", SAME_KEY)
+def test_equivalent_addresses_share_a_key(left, right):
+    assert canonical_key(left) == canonical_key(right)
+
+
+@pytest.mark.parametrize("left, right", DIFFERENT_KEYS)
+def test_distinct_addresses_keep_distinct_keys(left, right):
+    assert canonical_key(left) != canonical_key(right)
+
+
+@pytest.mark.parametrize("address, expected", [
+    ("10 bis rue de la Paix 75002 PARIS", "10 bis rue de la paix paris 75002"),
+    ("1 rue de la Gare 13001", "1 rue de la gare 13001"),
+    ("12 av Foch 75116 Paris Cedex 16 France", "12 avenue foch paris 75116"),
+    ("Rue de l'Église", "rue de l eglise"),
+    ("", ""),
+])
+def test_canonical_key(address, expected):
+    assert canonical_key(address) == expected
+
+
+def test_vectorized_keys_match_scalar_keys():
+    addresses = [left for left, _ in SAME_KEY + DIFFERENT_KEYS] + [right for _, right in SAME_KEY + DIFFERENT_KEYS]
+    series = pd.Series(addresses + [None], dtype=object)
+    assert canonical_keys(series).tolist() == [canonical_key(a) for a in addresses] + [""]
+
+
+@pytest.mark.parametrize("address, expected", [
+    ("10B av. Foch 75116 Paris", "10 bis avenue Foch 75116 Paris"),
+    ("Rue X ,, ; 06000   Nice", "Rue X, 06000 Nice"),
+])
+def test_clean_query_keeps_postcode_and_case(address, expected):
+    assert clean_query(address) == expected
+
+
+@pytest.mark.parametrize("address, expected", [
+    ("1 rue X 75001 Paris 75002", "75002"),
+    ("BP 123456 Paris", None),
+    ("06000 Nice", "06000"),
+])
+def test_extract_postcode(address, expected):
+    assert extract_postcode(address) == expected
+
+
+def test_plan_batch_does_not_merge_streets_of_different_postcodes():
+    plan = plan_batch(["1 rue de la Gare 59000 Lille", "1 rue de la Gare 69000", "1 rue de la Gare 13001"])
+    assert list(plan.row_to_unique) == [0, 1, 2]
+
+
+def test_plan_batch_merges_equivalent_rows():
+    plan = plan_batch(["10 bis rue de la Paix 75002 PARIS", "10B R. de la Paix, 75002 Paris", ""])
+    assert list(plan.row_to_unique) == [0, 0, -1]
+    assert plan.saved_calls == 1
@@ -0,0 +1,180 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+pytest.importorskip("geopy")
+
+from backends import BackendSettings, GeocoderBackend  # noqa: E402
+from retry import PERMANENT, TRANSIENT, classify  # noqa: E402
+
+
+class StandIn(ThreadingHTTPServer):
+    """Faux Nominatim local : compte les requêtes en vol et peut répondre par des erreurs."""
+
+    daemon_threads = True
+
+    def __init__(self) -> None:
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.lock = threading.Lock()
+        self.delay = 0.0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.arrivals = []
+        # Codes HTTP renvoyés aux premières requêtes, puis 200
+        self.failures = []
+        # Requête -> code HTTP renvoyé à chaque fois
+        self.errors_for = {}
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: StandIn
+
+    def do_GET(self) -> None:  # noqa: N802
+        query = parse_qs(urlparse(self.path).query).get("q", [""])[0]
+        server = self.server
+        with server.lock:
+            server.arrivals.append(time.monotonic())
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+            status = server.failures.pop(0) if server.failures else server.errors_for.get(query, 200)
+        try:
+            time.sleep(server.delay)
+            if status != 200:
+                self.send_response(status)
+                if status == 429:
+                    self.send_header("Retry-After", "0")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            body = json.dumps([{"lat": "48.85", "lon": "2.35", "display_name": query, "place_id": 1}]).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+@pytest.fixture
+def stand_in():
+    server = StandIn()
+    thread = threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def make_backend(server: StandIn, **overrides) -> GeocoderBackend:
+    settings = dict(
+        base_url=server.url, max_concurrency=1, requests_per_second=0, timeout=5,
+        max_retries=2, retry_backoff=0.01, retry_max_delay=0.05,
+    )
+    settings.update(overrides)
+    return GeocoderBackend(BackendSettings(**settings))
+
+
+def test_iter_geocode_runs_up_to_max_concurrency_in_parallel(stand_in):
+    # Réponses lentes et client déjà créé : les 4 appels se recouvrent même sur une machine chargée
+    stand_in.delay = 0.25
+    backend = make_backend(stand_in, max_concurrency=4)
+    backend.geocoder
+    queries = [f"{i} rue de la Paix Paris" for i in range(12)]
+
+    results = list(backend.iter_geocode(queries))
+
+    assert sorted(index for index, _, _ in results) == list(range(12))
+    assert all(exc is None and location.address == queries[index] for index, location, exc in results)
+    assert stand_in.max_in_flight == 4
+
+
+def test_iter_geocode_is_sequential_with_concurrency_one(stand_in):
+    stand_in.delay = 0.02
+    backend = make_backend(stand_in)
+
+    results = list(backend.iter_geocode(["a", "b", "c"]))
+
+    assert [index for index, _, _ in results] == [0, 1, 2]
+    assert stand_in.max_in_flight == 1
+
+
+def test_requests_per_second_spaces_calls(stand_in):
+    backend = make_backend(stand_in, max_concurrency=4, requests_per_second=20)
+    backend.geocode("connexion")
+
+    list(backend.iter_geocode([str(i) for i in range(6)]))
+
+    arrivals = stand_in.arrivals[1:]
+    gaps = [b - a for a, b in zip(arrivals, arrivals[1:])]
+    assert len(arrivals) == 6
+    # 20 req/s : un créneau toutes les 50 ms, malgré 4 appels autorisés en parallèle
+    assert arrivals[-1] - arrivals[0] >= 5 * 0.05 * 0.9
+    assert min(gaps) >= 0.03
+
+
+def test_rate_limited_call_is_retried_and_slows_the_throttle(stand_in):
+    stand_in.failures = [429, 429]
+    backend = make_backend(stand_in, requests_per_second=10, max_retries=3)
+
+    location = backend.geocode("1 rue de la Paix")
+
+    assert location.address == "1 rue de la Paix"
+    assert len(stand_in.arrivals) == 3
+    assert backend.metrics.snapshot()["retries"] == {"GeocoderRateLimited": 2}
+    assert backend.throttle.current_rps == pytest.approx(2.5)
+
+
+def test_rate_limit_without_configured_limit_starts_throttling(stand_in):
+    stand_in.failures = [429]
+    backend = make_backend(stand_in, requests_per_second=0)
+
+    backend.geocode("x")
+
+    assert backend.throttle.current_rps > 0
+
+
+def test_transient_errors_give_up_after_max_retries(stand_in):
+    stand_in.failures = [503] * 10
+    backend = make_backend(stand_in, max_retries=2)
+
+    with pytest.raises(Exception) as excinfo:
+        backend.geocode("x")
+
+    # geopy traduit un 503 en GeocoderTimedOut
+    assert classify(excinfo.value) == TRANSIENT
+    assert len(stand_in.arrivals) == 3
+    assert sum(backend.metrics.snapshot()["retries"].values()) == 2
+
+
+def test_permanent_errors_are_not_retried(stand_in):
+    stand_in.errors_for = {"bad": 400}
+    backend = make_backend(stand_in, max_retries=3)
+
+    with pytest.raises(Exception) as excinfo:
+        backend.geocode("bad")
+
+    assert classify(excinfo.value) == PERMANENT
+    assert len(stand_in.arrivals) == 1
+
+
+def test_iter_geocode_reports_errors_per_query(stand_in):
+    stand_in.errors_for = {"bad": 400}
+    backend = make_backend(stand_in, max_concurrency=3)
+
+    results = {index: (location, exc) for index, location, exc in backend.iter_geocode(["ok", "bad", "fine"])}
+
+    assert results[0][1] is None and results[2][1] is None
+    assert results[1][0] is None and type(results[1][1]).__name__ == "GeocoderQueryError"
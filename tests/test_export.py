@@ -0,0 +1,36 @@
+import pandas as pd
+import pytest
+
+from export import export_results, read_results
+
+pytest.importorskip("pyarrow")
+
+
+@pytest.fixture
+def results_csv(tmp_path):
+    path = tmp_path / "resultats.csv"
+    pd.DataFrame({
+        "CP": ["06000", "01000", None, "75002"],
+        "adresse": ["a", "b", "c", "d"],
+        "latitude": [43.7, None, 48.8, 48.87],
+        "longitude": [7.26, None, 2.3, 2.33],
+        "statut": ["ok", "non trouvé", "ok", "ok"],
+    }).to_csv(path, index=False)
+    return str(path)
+
+
+def test_read_results_keeps_postcodes_as_text(results_csv):
+    frame = read_results(results_csv)
+    assert frame["CP"].tolist()[:2] == ["06000", "01000"]
+    assert pd.isna(frame["CP"].iloc[2])
+    assert frame["latitude"].dtype == "float64"
+
+
+@pytest.mark.parametrize("fmt", [".parquet", ".xlsx"])
+def test_export_keeps_postcodes_across_chunks(results_csv, fmt):
+    # Blocs de 2 lignes : le 2e bloc ne contient qu'un code postal, sans zéro initial à deviner
+    path = export_results(results_csv, fmt, chunk_size=2)
+    exported = pd.read_parquet(path) if fmt == ".parquet" else pd.read_excel(path, dtype={"CP": str})
+    assert exported["CP"].tolist()[:2] == ["06000", "01000"]
+    assert exported["CP"].iloc[3] == "75002"
+    assert exported["latitude"].iloc[0] == pytest.approx(43.7)
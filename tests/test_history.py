@@ -0,0 +1,40 @@
+import json
+
+import pytest
+
+pytest.importorskip("streamlit")
+
+from utils.history import HistoryStore  # noqa: E402
+
+
+@pytest.fixture
+def legacy(tmp_path):
+    path = tmp_path / "historique.json"
+    path.write_text(json.dumps([
+        {"date": "2024-01-01 10:00:00", "transcription": "bonjour", "score": 80, "mots_parasites": ["euh"], "nb_fautes": 1},
+        {"date": "2024-01-02 10:00:00", "transcription": "salut", "score": 90, "mots_parasites": [], "nb_fautes": 0},
+    ]), encoding="utf-8")
+    return path
+
+
+def test_legacy_history_stays_visible_to_logged_in_users(tmp_path, legacy):
+    store = HistoryStore(str(tmp_path / "historique.sqlite"), legacy_json=str(legacy))
+    store.add({"date": "2024-02-01 10:00:00", "score": 70}, user="a@exemple.fr")
+    store.add({"date": "2024-02-02 10:00:00", "score": 60}, user="b@exemple.fr")
+
+    assert [s["score"] for s in store.last(user="a@exemple.fr")] == [70, 90, 80]
+    assert store.scores("a@exemple.fr")["score"].tolist() == [80, 90, 70]
+    assert store.count() == 4
+
+
+def test_legacy_file_is_imported_only_once(tmp_path, legacy):
+    db = str(tmp_path / "historique.sqlite")
+    content = legacy.read_text(encoding="utf-8")
+    first = HistoryStore(db, legacy_json=str(legacy))
+    # Une autre session avait lu le fichier avant qu'il ne soit renommé
+    legacy.write_text(content, encoding="utf-8")
+    second = HistoryStore(db, legacy_json=None)
+
+    assert second.migrate_json(str(legacy)) == 0
+    assert first.count() == 2
+    assert not legacy.exists()
@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from incremental import FINGERPRINT_COLUMNS, PreviousRun, diff_chunks, fingerprint_frame
+
+COLUMNS = ["rue", "ville"]
+
+
+def write_run(path, df, results, id_column=None):
+    """Empreintes et résultats d'un traitement, au format écrit par ``BatchJob``."""
+    fingerprints = fingerprint_frame(df, COLUMNS, id_column, 0)
+    frame = pd.concat([fingerprints, pd.DataFrame(results, columns=FINGERPRINT_COLUMNS[3:])], axis=1)
+    frame[FINGERPRINT_COLUMNS].to_csv(path, index=False)
+    return PreviousRun(str(path))
+
+
+@pytest.fixture
+def first_run():
+    return pd.DataFrame({
+        "id": ["a", "b", "c", "d"],
+        "rue": ["1 rue de la Paix", "2 rue Pasteur", "3 rue Foch", "4 rue Hoche"],
+        "ville": ["Paris", "Nice", "Lyon", "Lille"],
+    })
+
+
+RESULTS = [
+    (48.86, 2.33, "1 Rue de la Paix, Paris", "ok"),
+    (43.70, 7.26, "2 Rue Pasteur, Nice", "ok"),
+    (None, None, None, "erreur: GeocoderTimedOut"),
+    (None, None, None, "non trouvé"),
+]
+
+
+def test_lookup_reuses_results_of_unchanged_rows(tmp_path, first_run):
+    previous = write_run(tmp_path / "empreintes.csv", first_run, RESULTS)
+    # Lignes déplacées : l'empreinte ne dépend pas de la position
+    current = first_run.iloc[[1, 0, 3]]
+
+    found, stored = previous.lookup(fingerprint_frame(current, COLUMNS, None, 0)["empreinte"].to_numpy())
+
+    assert found.tolist() == [True, True, True]
+    assert stored["adresse_normalisee"].tolist()[:2] == ["2 Rue Pasteur, Nice", "1 Rue de la Paix, Paris"]
+    assert stored["statut"].tolist() == ["ok", "ok", "non trouvé"]
+    assert np.isnan(stored["latitude"].iloc[2])
+
+
+def test_lookup_recomputes_errors_and_changed_rows(tmp_path, first_run):
+    previous = write_run(tmp_path / "empreintes.csv", first_run, RESULTS)
+    current = first_run.copy()
+    current.loc[0, "rue"] = "1 bis rue de la Paix"
+
+    found, stored = previous.lookup(fingerprint_frame(current, COLUMNS, None, 0)["empreinte"].to_numpy())
+
+    # Ligne modifiée et ligne en erreur au traitement précédent : à géocoder
+    assert found.tolist() == [False, True, False, True]
+    assert len(stored) == 2
+
+
+def test_diff_by_row_number(tmp_path, first_run):
+    previous = write_run(tmp_path / "empreintes.csv", first_run, RESULTS)
+    current = pd.concat([first_run.iloc[:3], pd.DataFrame({"id": ["e", "f"], "rue": ["5 rue X", "6 rue Y"], "ville": ["Caen", "Metz"]})])
+    current.iloc[1, 1] = "2 avenue Pasteur"
+
+    diff = diff_chunks([current.iloc[:2], current.iloc[2:]], COLUMNS, None, previous)
+
+    assert (diff.added, diff.changed, diff.removed, diff.unchanged) == (1, 2, 0, 2)
+
+
+def test_diff_by_identifier(tmp_path, first_run):
+    previous = write_run(tmp_path / "empreintes.csv", first_run, RESULTS, id_column="id")
+    current = first_run.iloc[[3, 2, 0]].copy()
+    current.loc[current["id"] == "c", "ville"] = "Villeurbanne"
+    current = pd.concat([current, pd.DataFrame({"id": ["z"], "rue": ["9 rue Z"], "ville": ["Pau"]})])
+
+    diff = diff_chunks([current], COLUMNS, "id", previous)
+
+    assert (diff.added, diff.changed, diff.removed, diff.unchanged) == (1, 1, 1, 2)
@@ -0,0 +1,137 @@
+import json
+import os
+from collections import Counter
+
+import pandas as pd
+import pytest
+
+pytest.importorskip("geopy")
+
+from geopy.exc import GeocoderTimedOut  # noqa: E402
+from geopy.location import Location  # noqa: E402
+
+from backends import BackendSettings, GeocoderBackend  # noqa: E402
+from geocache import GeocodeCache  # noqa: E402
+from geocoding import GeocodingService  # noqa: E402
+from jobs import STATUS_DONE, STATUS_FAILED, BatchJob, JobManager  # noqa: E402
+
+
+class FlakyGeocoder:
+    """Les requêtes contenant "instable" échouent (délai dépassé) à leurs ``failures`` premiers appels."""
+
+    def __init__(self, failures: int) -> None:
+        self.adapter = self
+        self.failures = failures
+        self.calls = []
+        self._attempts = Counter()
+
+    def get_json(self, *args, **kwargs):
+        return {}
+
+    def geocode(self, query):
+        self.calls.append(str(query))
+        self._attempts[str(query)] += 1
+        if "instable" in str(query) and self._attempts[str(query)] <= self.failures:
+            raise GeocoderTimedOut("délai")
+        return Location(str(query), (45.0, 5.0), {})
+
+
+class FlakyBackend(GeocoderBackend):
+    def __init__(self, settings, geocoder):
+        self._fake = geocoder
+        super().__init__(settings)
+
+    def _build_geocoder(self, settings):
+        return self._fake
+
+
+@pytest.fixture
+def job_factory(tmp_path):
+    source = tmp_path / "adresses.csv"
+    pd.DataFrame({"adresse": [
+        "1 rue A 06000 Nice", "2 rue instable 75002 Paris",
+        "3 rue C 69003 Lyon", "4 rue D 13001 Marseille",
+        "5 rue instable 59000 Lille", "6 rue F 01000 Bourg",
+    ]}).to_csv(source, index=False)
+
+    def make(failures, rounds=2):
+        geocoder = FlakyGeocoder(failures)
+        settings = BackendSettings(requests_per_second=0, max_retries=0, retry_queue_rounds=rounds, retry_queue_delay=0)
+        service = GeocodingService(GeocodeCache(str(tmp_path / "cache.sqlite")), FlakyBackend(settings, geocoder), gazetteer=None)
+        directory = tmp_path / "job"
+        directory.mkdir(exist_ok=True)
+        return BatchJob("test", str(source), ["adresse"], service, str(directory), checkpoint_every=2), geocoder
+
+    return make
+
+
+def test_transient_failures_are_retried_once_after_the_last_chunk(job_factory):
+    job, geocoder = job_factory(failures=1)
+
+    job.run()
+
+    assert job.status == STATUS_DONE, job.error
+    # Relances après le premier appel du dernier bloc, et non à la fin de chaque bloc
+    last_chunk_first_call = geocoder.calls.index("5 rue instable 59000 Lille")
+    retries = [i for i, query in enumerate(geocoder.calls) if "instable" in query][2:]
+    assert len(retries) == 2 and min(retries) > last_chunk_first_call
+    assert job.service.metrics.snapshot()["counters"]["retry_queue"] == 2
+
+    results = pd.read_csv(job.results_path, dtype={"CP": str})
+    assert results["statut"].tolist() == ["ok"] * 6
+    fingerprints = pd.read_csv(job.fingerprints_path)
+    assert fingerprints["statut"].tolist() == ["ok"] * 6
+    assert fingerprints["latitude"].tolist() == [45.0] * 6
+    with open(os.path.join(job.directory, "job.json"), encoding="utf-8") as f:
+        state = json.load(f)
+    assert state["relances_en_attente"] == [] and not state["phase_relances"]
+
+
+def test_exports_are_rebuilt_after_patching(job_factory):
+    pytest.importorskip("pyarrow")
+    job, _ = job_factory(failures=1)
+
+    job.run()
+
+    assert pd.read_parquet(job.export_path(".parquet"))["statut"].tolist() == ["ok"] * 6
+
+
+def test_rows_stay_in_error_when_retries_are_exhausted(job_factory):
+    job, geocoder = job_factory(failures=10, rounds=2)
+
+    job.run()
+
+    statuses = pd.read_csv(job.results_path)["statut"].tolist()
+    assert statuses[1] == statuses[4] == "erreur: GeocoderTimedOut"
+    assert statuses.count("ok") == 4
+    # Un appel par bloc, puis deux passes de relance
+    assert sum("instable" in query for query in geocoder.calls) == 2 * 3
+
+
+def test_failed_job_leaves_no_partial_exports(job_factory):
+    pytest.importorskip("pyarrow")
+    job, _ = job_factory(failures=0)
+
+    def crash():
+        raise RuntimeError("coupure")
+
+    job._drain_retry_queue = crash
+    job.run()
+
+    assert job.status == STATUS_FAILED
+    assert not [name for name in os.listdir(job.directory) if name.endswith(".tmp")]
+
+
+def test_finished_job_is_reloaded_after_a_restart(job_factory):
+    job, _ = job_factory(failures=0)
+    job.run()
+
+    # Nouveau processus : registre vide, seul le dossier du job subsiste
+    manager = JobManager(job.service, jobs_dir=os.path.dirname(job.directory))
+    job_id = os.path.basename(job.directory)
+    reloaded = manager.get(job_id)
+
+    assert manager.checkpointed_rows(job_id) == 0
+    assert reloaded is not None and reloaded.finished and reloaded.status == STATUS_DONE
+    assert reloaded.rows_done == 6 and reloaded.progress == 1.0
+    assert os.path.exists(reloaded.results_path)
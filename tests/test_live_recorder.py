@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from utils.live_recorder import RingBuffer, VoiceActivityDetector
+
+RATE = 16000
+
+
+def test_ring_buffer_keeps_chronological_order_before_wrapping():
+    buffer = RingBuffer(5)
+    buffer.write(np.array([1, 2], dtype=np.float32))
+    buffer.write(np.array([3], dtype=np.float32))
+    assert buffer.snapshot().tolist() == [1, 2, 3]
+
+
+def test_ring_buffer_keeps_the_most_recent_samples():
+    buffer = RingBuffer(5)
+    buffer.write(np.arange(1, 4, dtype=np.float32))
+    buffer.write(np.arange(4, 8, dtype=np.float32))
+    assert buffer.snapshot().tolist() == [3, 4, 5, 6, 7]
+    assert buffer.written == 7
+
+
+def test_ring_buffer_write_larger_than_capacity():
+    buffer = RingBuffer(4)
+    buffer.write(np.array([9], dtype=np.float32))
+    buffer.write(np.arange(10, dtype=np.float32))
+    assert buffer.snapshot().tolist() == [6, 7, 8, 9]
+
+
+def tone(seconds, amplitude=0.3):
+    t = np.arange(int(seconds * RATE)) / RATE
+    return (amplitude * np.sin(2 * np.pi * 220 * t)).astype(np.float32)
+
+
+def silence(seconds):
+    return np.zeros(int(seconds * RATE), dtype=np.float32)
+
+
+def feed_in_frames(detector, signal, frame=960):
+    # Trames de 20 ms à 48 kHz ramenées à 16 kHz : la taille ne tombe pas sur les blocs
+    for start in range(0, len(signal), frame):
+        detector.feed(signal[start:start + frame])
+
+
+def test_vad_reports_long_pauses_between_speech_only():
+    detector = VoiceActivityDetector(RATE)
+    signal = np.concatenate([silence(2.0), tone(1.0), silence(2.0), tone(0.5), silence(0.5), tone(0.5), silence(3.0)])
+    feed_in_frames(detector, signal)
+
+    # Le silence initial (avant toute parole) et final (sans reprise) ne comptent pas
+    assert detector.long_pauses == [pytest.approx(2.0, abs=0.05)]
+    assert detector.speech_seconds == pytest.approx(2.0, abs=0.05)
+    assert not detector.speaking
+
+
+def test_vad_ignores_background_noise_below_the_floor():
+    detector = VoiceActivityDetector(RATE)
+    feed_in_frames(detector, tone(1.0, amplitude=1e-4))
+    assert detector.speech_seconds == 0
+    assert not detector.spoken
@@ -0,0 +1,95 @@
+import threading
+import time
+
+import pytest
+
+from retry import AdaptiveThrottle
+from scheduler import BATCH, DEFAULT_OWNER, INTERACTIVE, Scheduler, current_request, request_context
+
+
+def run_in_order(scheduler, tickets):
+    """Met en file ``tickets`` (voie, demandeur, nom) pendant que la seule place est occupée,
+    puis la libère : renvoie l'ordre dans lequel l'ordonnanceur les a servis."""
+    served = []
+    threads = []
+    holder = scheduler.slot(BATCH, "occupant")
+    holder.__enter__()
+    for lane, owner, name in tickets:
+        def call(lane=lane, owner=owner, name=name):
+            with scheduler.slot(lane, owner):
+                served.append(name)
+
+        waiting = sum(scheduler.queued().values())
+        thread = threading.Thread(target=call)
+        thread.start()
+        threads.append(thread)
+        # Chaque ticket est en file avant le suivant : l'ordre d'arrivée est connu
+        deadline = time.monotonic() + 2
+        while sum(scheduler.queued().values()) == waiting and time.monotonic() < deadline:
+            time.sleep(0.001)
+    holder.__exit__(None, None, None)
+    for thread in threads:
+        thread.join(2)
+    return served
+
+
+@pytest.fixture
+def scheduler():
+    return Scheduler(1, AdaptiveThrottle(0))
+
+
+def test_interactive_lane_is_served_before_batches(scheduler):
+    served = run_in_order(scheduler, [
+        (BATCH, "job", "lot 1"),
+        (BATCH, "job", "lot 2"),
+        (INTERACTIVE, "session", "recherche"),
+    ])
+    assert served == ["recherche", "lot 1", "lot 2"]
+
+
+def test_owners_of_a_lane_take_turns(scheduler):
+    served = run_in_order(scheduler, [
+        (BATCH, "gros", "g1"),
+        (BATCH, "gros", "g2"),
+        (BATCH, "gros", "g3"),
+        (BATCH, "petit", "p1"),
+        (BATCH, "petit", "p2"),
+    ])
+    assert served == ["g1", "p1", "g2", "p2", "g3"]
+
+
+def test_concurrency_limit_is_respected():
+    scheduler = Scheduler(2, AdaptiveThrottle(0))
+    lock = threading.Lock()
+    active = []
+    peak = []
+
+    def call():
+        with scheduler.slot(BATCH, "job"):
+            with lock:
+                active.append(1)
+                peak.append(len(active))
+            time.sleep(0.01)
+            with lock:
+                active.pop()
+
+    threads = [threading.Thread(target=call) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(2)
+    assert len(peak) == 8 and max(peak) == 2
+    assert scheduler.queued() == {INTERACTIVE: 0, BATCH: 0}
+
+
+def test_request_context_sets_lane_and_owner():
+    assert current_request() == (BATCH, DEFAULT_OWNER)
+    with request_context(INTERACTIVE, "session-1"):
+        assert current_request() == (INTERACTIVE, "session-1")
+    assert current_request() == (BATCH, DEFAULT_OWNER)
+
+
+def test_request_context_rejects_unknown_lane():
+    with pytest.raises(ValueError):
+        with request_context("urgent", "x"):
+            pass
@@ -0,0 +1,79 @@
+import sys
+import threading
+import time
+import types
+
+import pytest
+
+from utils import text_analysis
+from utils.text_analysis import FILLERS, FILLERS_SHORT, PhraseMatcher, TextEngine, get_text_engine, tokenize
+
+
+def test_tokenize_strips_elisions_and_keeps_compound_words():
+    words = [word for word, _, _ in tokenize("J'ai vu qu’aujourd'hui l'arc-en-ciel, peut-être.")]
+    assert words == ["ai", "vu", "aujourd'hui", "arc-en-ciel", "peut-être"]
+
+
+def test_tokenize_positions_point_into_the_text():
+    text = "Euh, l'idée"
+    assert [text[start:end] for _, start, end in tokenize(text)] == ["Euh", "idée"]
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("euh je pense que", ["euh"]),
+    ("En fait, du coup on va dire que", ["en fait", "du coup", "on va dire"]),
+    ("Euh... EUH, euh", ["euh", "euh", "euh"]),
+    ("enfantin, dommage, coupure", []),
+    ("en gros c'est bon", ["en gros"]),
+    ("", []),
+])
+def test_phrase_matcher_finds_single_and_multi_word_fillers(text, expected):
+    matcher = PhraseMatcher(["euh", "en fait", "du coup", "en gros", "on va dire"])
+    assert [m.expression for m in matcher.find(text)] == expected
+
+
+def test_phrase_matcher_reports_nested_and_overlapping_phrases():
+    matcher = PhraseMatcher(["va", "on va dire", "dire que", "a b c", "b"])
+    found = [(m.expression, m.start, m.end) for m in matcher.find("on va dire que a b c")]
+    assert found == [
+        ("on va dire", 0, 10), ("va", 3, 5), ("dire que", 6, 14), ("a b c", 15, 20), ("b", 17, 18),
+    ]
+
+
+def test_phrase_matcher_follows_failure_links():
+    # "a a b" : le premier "a" ne mène pas à "a b", le second si
+    matcher = PhraseMatcher(["a b", "a a c"])
+    assert [(m.expression, m.start) for m in matcher.find("a a b")] == [("a b", 2)]
+
+
+def test_filler_counts():
+    engine = TextEngine(fillers=["euh", "du coup"])
+    assert engine.filler_counts("Euh du coup, euh voilà") == {"euh": 2, "du coup": 1}
+
+
+def test_each_page_keeps_its_own_filler_list():
+    text = "Euh, enfin, donc quoi, hein, genre voilà"
+    assert [m.expression for m in get_text_engine().fillers(text)] == ["euh", "enfin", "donc", "quoi", "voilà"]
+    assert [m.expression for m in get_text_engine(FILLERS_SHORT).fillers(text)] == ["euh", "donc", "hein", "voilà"]
+    assert get_text_engine(FILLERS) is get_text_engine()
+
+
+def test_spell_checker_is_built_once_under_concurrent_access(monkeypatch):
+    built = []
+
+    class SlowSpellChecker:
+        def __init__(self, language):
+            time.sleep(0.05)
+            built.append(language)
+
+    monkeypatch.setitem(sys.modules, "spellchecker", types.SimpleNamespace(SpellChecker=SlowSpellChecker))
+    monkeypatch.setattr(text_analysis, "_spell_checkers", {})
+    engine = TextEngine(language="xx")
+
+    threads = [threading.Thread(target=lambda: engine.spell) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert built == ["xx"]